@@ -0,0 +1,299 @@
+"""Engine requests run on worker threads, with results handed back to Tk.
+
+The GUI must not block its main loop on a search, and Tk widgets may only be
+touched from the thread running that loop. AsyncEngine takes requests,
+runs them against an EnginePool on its own threads and queues the results;
+the GUI drains that queue from a window.after() poll, so callbacks always
+run on the Tk thread. A newer request of the same kind, or a position
+change, cancels older ones and stops their search in the engine. With an
+EvaluationCache attached, evaluations of positions already searched to the
+same depth are answered from it without touching an engine.
+
+Analysis requests stream: the engine searches until cancelled, and each
+batch of info lines that arrives between two polls reaches the Tk thread
+as one AnalysisUpdate holding the latest line for every MultiPV slot.
+
+Ponder requests search the position after the reply the engine expects,
+while the opponent is still thinking. ponderhit() turns such a search into
+the engine's move search once that reply is played; its result is held back
+until then, and any other move simply cancels it.
+"""
+from typing import Callable, Dict, List, NamedTuple, Optional
+import queue
+import threading
+
+from engine_pool import EngineError, EnginePool
+from eval_cache import EvaluationCache
+
+class SearchResult(NamedTuple):
+    fen: str
+    best_move: Optional[str]
+    ponder: Optional[str]
+    evaluation: Optional[Dict]  # White-relative {'type': 'cp' | 'mate', 'value': n}
+    error: Optional[str] = None
+
+class AnalysisUpdate(NamedTuple):
+    fen: str
+    # Latest info per MultiPV line, best first: 'depth', 'score' (White-
+    # relative), 'pv' (UCI moves) and whatever else the engine sent
+    lines: List[Dict]
+
+class EngineRequest:
+    def __init__(self, kind: str, fen: str, depth: Optional[int],
+                 callback: Optional[Callable[[SearchResult], None]],
+                 on_update: Optional[Callable[[AnalysisUpdate], None]] = None, multipv: int = 1):
+        self.kind = kind
+        self.fen = fen
+        self.depth = depth
+        self.callback = callback
+        self.on_update = on_update
+        self.multipv = multipv
+        self.lines = {}  # multipv -> latest info; only touched on the Tk thread
+        self.cancelled = False
+        self.engine = None  # Set while an engine is searching for this request
+        # Ponder requests: whether the move came, whether the engine has been
+        # told, and a result that came before the move did
+        self.ponder = False
+        self.ponder_hit = False
+        self.hit_sent = False
+        self.held_result = None
+        self.searching = False  # The engine has reported on this search
+
+class AsyncEngine:
+    def __init__(self, pool: EnginePool, cache: Optional[EvaluationCache] = None):
+        self.pool = pool
+        self.cache = cache
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        self._latest = {}  # kind -> most recent request
+        self._lock = threading.Lock()
+        self._workers = [threading.Thread(target=self._work, daemon=True, name=f'engine-worker-{i}')
+                         for i in range(pool.size)]
+        for worker in self._workers:
+            worker.start()
+
+    def request_move(self, fen: str, callback: Callable[[SearchResult], None],
+                     depth: Optional[int] = None) -> EngineRequest:
+        return self._submit('move', fen, depth, callback)
+
+    def request_evaluation(self, fen: str, callback: Callable[[SearchResult], None],
+                           depth: Optional[int] = None) -> EngineRequest:
+        return self._submit('evaluation', fen, depth, callback)
+
+    def request_analysis(self, fen: str, on_update: Callable[[AnalysisUpdate], None],
+                         multipv: int = 1, depth: Optional[int] = None,
+                         callback: Optional[Callable[[SearchResult], None]] = None) -> EngineRequest:
+        # Search until cancelled (or to `depth`), reporting as it goes;
+        # callback only runs if the search finishes by itself
+        request = EngineRequest('analysis', fen, depth, callback, on_update, multipv)
+        return self._submit_request(request)
+
+    def request_ponder(self, fen: str, callback: Callable[[SearchResult], None],
+                       depth: Optional[int] = None) -> EngineRequest:
+        # A move search on `fen` (the position after the expected reply) that
+        # only counts once ponderhit(fen) is called; callback runs after that
+        request = EngineRequest('move', fen, depth or self.pool.depth, callback)
+        request.ponder = True
+        return self._submit_request(request)
+
+    def ponderhit(self, fen: str) -> bool:
+        # Called with the position after the opponent's move. If a ponder
+        # search is on exactly that position it becomes the move search and
+        # True is returned; otherwise the caller cancels and asks afresh.
+        with self._lock:
+            request = self._latest.get('move')
+            if request is None or not request.ponder or request.ponder_hit or request.fen != fen:
+                return False
+            request.ponder_hit = True
+            if request.held_result is not None:
+                self._results.put((request, request.held_result))
+                request.held_result = None
+            elif request.engine is not None and request.searching:
+                # Before the first info line the engine may not have seen the
+                # go command yet; on_info sends ponderhit then instead
+                self._send_ponderhit(request)
+        return True
+
+    def _send_ponderhit(self, request: EngineRequest):
+        # Caller holds self._lock
+        request.hit_sent = True
+        try:
+            request.engine.ponderhit()
+        except EngineError:
+            pass
+
+    def _submit(self, kind: str, fen: str, depth: Optional[int],
+                callback: Callable[[SearchResult], None]) -> EngineRequest:
+        return self._submit_request(EngineRequest(kind, fen, depth or self.pool.depth, callback))
+
+    def _submit_request(self, request: EngineRequest) -> EngineRequest:
+        kind, fen = request.kind, request.fen
+        with self._lock:
+            previous = self._latest.get(kind)
+            if previous is not None:
+                self._cancel(previous)
+            self._latest[kind] = request
+
+        cached = self.cache.get(fen, request.depth) if self.cache is not None and kind == 'evaluation' else None
+        if cached is not None:
+            best = cached.pop('best', None)
+            self._results.put((request, SearchResult(fen, best, None, cached)))
+        else:
+            self._requests.put(request)
+        return request
+
+    def cancel(self, kind: Optional[str] = None):
+        # Drop outstanding requests (all kinds by default), e.g. because the
+        # position they were asked about is gone
+        with self._lock:
+            for request_kind, request in list(self._latest.items()):
+                if kind is None or request_kind == kind:
+                    self._cancel(request)
+                    del self._latest[request_kind]
+
+    def _cancel(self, request: EngineRequest):
+        # Caller holds self._lock
+        request.cancelled = True
+        if request.engine is not None:
+            try:
+                request.engine.stop()
+            except EngineError:
+                pass
+
+    def _work(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                return
+            if request.cancelled:
+                continue
+            try:
+                with self.pool.engine() as engine:
+                    with self._lock:
+                        if request.cancelled:
+                            continue
+                        request.engine = engine
+                    try:
+                        engine.set_fen_position(request.fen)
+                        if request.kind == 'analysis':
+                            best, ponder, evaluation = self._stream(engine, request)
+                        elif request.ponder:
+                            best, ponder, evaluation = self._ponder(engine, request)
+                        else:
+                            best, ponder, evaluation = self._search(engine, request)
+                    finally:
+                        with self._lock:
+                            request.engine = None
+                result = SearchResult(request.fen, best, ponder, evaluation)
+                # A completed move search scored the position just as well
+                if self.cache is not None and not request.cancelled and request.depth:
+                    self.cache.put(request.fen, request.depth, dict(evaluation, best=best))
+            except EngineError as e:
+                result = SearchResult(request.fen, None, None, None, str(e))
+            with self._lock:
+                if request.cancelled:
+                    continue
+                if request.ponder and not request.ponder_hit:
+                    # Finished (a forced mate, say) before the reply was played
+                    request.held_result = result
+                    continue
+            self._results.put((request, result))
+
+    def _search(self, engine, request: EngineRequest):
+        def on_info(info: Dict):
+            # A cancel that came after request.engine was set but before the
+            # engine had the go command stopped nothing; stop it now
+            if request.cancelled:
+                engine.stop()
+
+        return engine.analyse(request.depth, on_info)
+
+    def _ponder(self, engine, request: EngineRequest):
+        with self._lock:
+            # A hit before the search started makes it an ordinary one
+            ponder = not request.ponder_hit
+            request.hit_sent = not ponder
+
+        def on_info(info: Dict):
+            if request.cancelled:
+                engine.stop()
+                return
+            with self._lock:
+                request.searching = True
+                if request.ponder_hit and not request.hit_sent:
+                    self._send_ponderhit(request)
+
+        return engine.analyse(request.depth, on_info, ponder=ponder)
+
+    def _stream(self, engine, request: EngineRequest):
+        white_to_move = request.fen.split()[1] == 'w'
+        cached = False
+
+        def on_info(info: Dict):
+            nonlocal cached
+            if request.cancelled:
+                # Also catches a cancel that came before the search started,
+                # when the engine had nothing to stop yet
+                engine.stop()
+                return
+            if 'score' in info and info.get('pv'):
+                if not white_to_move:
+                    info = dict(info, score={'type': info['score']['type'], 'value': -info['score']['value']})
+                # Once the main line is as deep as an evaluation request would
+                # search, it serves as that evaluation for later lookups
+                if (self.cache is not None and not cached and info.get('multipv', 1) == 1
+                        and 'bound' not in info and info.get('depth', 0) >= self.pool.depth):
+                    self.cache.put(request.fen, self.pool.depth, dict(info['score'], best=info['pv'][0]))
+                    cached = True
+                self._results.put((request, info))
+
+        if request.multipv > 1:
+            engine.set_option('MultiPV', request.multipv)
+        try:
+            command = f"go depth {request.depth}" if request.depth else "go infinite"
+            best, ponder, info = engine.go(command, on_info)
+        finally:
+            if request.multipv > 1:
+                engine.set_option('MultiPV', 1)
+        score = info.get('score', {'type': 'cp', 'value': 0})
+        if not white_to_move:
+            score = {'type': score['type'], 'value': -score['value']}
+        return best, ponder, score
+
+    def dispatch_results(self):
+        # Run callbacks for finished requests; call this on the Tk thread.
+        # Analysis info is folded into one update per request and poll.
+        updated = []
+        while True:
+            try:
+                request, result = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if request.cancelled:
+                continue
+            if not isinstance(result, SearchResult):
+                request.lines[result.get('multipv', 1)] = result
+                if request not in updated:
+                    updated.append(request)
+                continue
+            self._send_updates(updated)
+            updated = []
+            with self._lock:
+                if request.cancelled:
+                    continue
+                if self._latest.get(request.kind) is request:
+                    del self._latest[request.kind]
+            if request.callback:
+                request.callback(result)
+        self._send_updates(updated)
+
+    def _send_updates(self, requests: List[EngineRequest]):
+        for request in requests:
+            if not request.cancelled:
+                lines = [request.lines[multipv] for multipv in sorted(request.lines)]
+                request.on_update(AnalysisUpdate(request.fen, lines))
+
+    def close(self):
+        self.cancel()
+        for _ in self._workers:
+            self._requests.put(None)
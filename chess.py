@@ -1,11 +1,15 @@
 from enum import Enum
-from typing import List, Tuple, Optional
-import tkinter as tk
-from tkinter import messagebox
-from stockfish import Stockfish
-import threading
+from typing import Dict, List, Tuple, Optional, NamedTuple
+import argparse
+import random
+import re
 import time
-import os
+import sys
+
+# The rules below import nothing beyond the standard library, so headless
+# workers can use them cheaply; the GUI (gui.py) and the engine modules are
+# only loaded by the commands that need them
+_started = time.perf_counter()
 
 class PieceType(Enum):
     PAWN = 'p'
@@ -15,27 +19,250 @@ class PieceType(Enum):
     QUEEN = 'q'
     KING = 'k'
 
+    # Members are singletons, so hash by identity; Enum's default hashes the
+    # name in Python on every dict lookup
+    __hash__ = object.__hash__
+
 class Color(Enum):
     WHITE = 'w'
     BLACK = 'b'
 
+    __hash__ = object.__hash__
+
+class GameStatus(Enum):
+    ONGOING = 'ongoing'
+    CHECK = 'check'
+    CHECKMATE = 'checkmate'
+    STALEMATE = 'stalemate'
+    INSUFFICIENT_MATERIAL = 'insufficient_material'
+    FIFTY_MOVES = 'fifty_moves'
+    REPETITION = 'repetition'
+
+    @property
+    def is_game_over(self) -> bool:
+        return self not in (GameStatus.ONGOING, GameStatus.CHECK)
+
+    @property
+    def is_draw(self) -> bool:
+        return self.is_game_over and self != GameStatus.CHECKMATE
+
+# Int codes carried by every Piece for the hot paths. A piece's code,
+# color_code * 6 + type_code, is also its bitboard index.
+WHITE, BLACK = 0, 1
+PAWN, ROOK, KNIGHT, BISHOP, QUEEN, KING = range(6)
+
 class Piece:
-    def __init__(self, color: Color, piece_type: PieceType):
-        self.color = color
-        self.type = piece_type
-        self.has_moved = False
+    # Immutable flyweight: Piece(color, type) always returns one of twelve
+    # shared instances, so boards and undo records hold references and never
+    # copy pieces. color/type stay Enums for callers; the *_code ints are
+    # what move generation compares.
+    __slots__ = ('color', 'type', 'color_code', 'type_code', 'code', 'name')
+    _instances: Dict[Tuple[Color, PieceType], 'Piece'] = {}
+
+    def __new__(cls, color: Color, piece_type: PieceType):
+        piece = cls._instances.get((color, piece_type))
+        if piece is None:
+            piece = object.__new__(cls)
+            color_code = list(Color).index(color)
+            type_code = list(PieceType).index(piece_type)
+            for name, value in (('color', color), ('type', piece_type), ('color_code', color_code),
+                                ('type_code', type_code), ('code', color_code * 6 + type_code),
+                                ('name', f"{color.value}{piece_type.value}")):
+                object.__setattr__(piece, name, value)
+            cls._instances[color, piece_type] = piece
+        return piece
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Piece is immutable")
+
+    def __reduce__(self):
+        # Unpickling and copy.copy go back through the flyweights
+        return Piece, (self.color, self.type)
 
     def __str__(self):
-        return f"{self.color.value}{self.type.value}"
+        return self.name
+
+    def __repr__(self):
+        return f"Piece({self.color}, {self.type})"
+
+PROMOTION_TYPES = [PieceType.QUEEN, PieceType.ROOK, PieceType.BISHOP, PieceType.KNIGHT]
+
+# Pieces carry no per-square state, so promotions reuse these instead of
+# allocating a new Piece on every push
+PROMOTION_PIECES = {
+    (color, piece_type): Piece(color, piece_type)
+    for color in Color for piece_type in PROMOTION_TYPES
+}
+
+class Move(NamedTuple):
+    start_row: int
+    start_col: int
+    end_row: int
+    end_col: int
+    promotion: Optional[PieceType] = None
+
+    def uci(self) -> str:
+        # Long algebraic form as used by UCI engines, e.g. 'e2e4' or 'e7e8q'
+        promotion = self.promotion.value if self.promotion else ''
+        return (f"{chr(self.start_col + ord('a'))}{8 - self.start_row}"
+                f"{chr(self.end_col + ord('a'))}{8 - self.end_row}{promotion}")
+
+# Piece, origin file and rank (for disambiguation), target, promotion
+SAN_PATTERN = re.compile(r'^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(=?[NBRQ])?$')
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# Castling rights, one bit per KQkq flag
+CASTLE_WHITE_KINGSIDE = 1
+CASTLE_WHITE_QUEENSIDE = 2
+CASTLE_BLACK_KINGSIDE = 4
+CASTLE_BLACK_QUEENSIDE = 8
+CASTLE_ALL = 15
+CASTLE_KINGSIDE = {Color.WHITE: CASTLE_WHITE_KINGSIDE, Color.BLACK: CASTLE_BLACK_KINGSIDE}
+CASTLE_QUEENSIDE = {Color.WHITE: CASTLE_WHITE_QUEENSIDE, Color.BLACK: CASTLE_BLACK_QUEENSIDE}
+
+# Rights lost when a move starts or ends on a king or rook home square
+CASTLING_RIGHTS_LOST = [0] * 64
+CASTLING_RIGHTS_LOST[7 * 8 + 4] = CASTLE_WHITE_KINGSIDE | CASTLE_WHITE_QUEENSIDE
+CASTLING_RIGHTS_LOST[7 * 8 + 7] = CASTLE_WHITE_KINGSIDE
+CASTLING_RIGHTS_LOST[7 * 8 + 0] = CASTLE_WHITE_QUEENSIDE
+CASTLING_RIGHTS_LOST[0 * 8 + 4] = CASTLE_BLACK_KINGSIDE | CASTLE_BLACK_QUEENSIDE
+CASTLING_RIGHTS_LOST[0 * 8 + 7] = CASTLE_BLACK_KINGSIDE
+CASTLING_RIGHTS_LOST[0 * 8 + 0] = CASTLE_BLACK_QUEENSIDE
+
+# Bitboard tables. Bit (row * 8 + col) stands for board[row][col], so bit 0 is
+# a8 and bit 63 is h1. Built once at import and shared by both board backends.
+BB_PIECE_INDEX = {
+    (color, piece_type): color_index * 6 + type_index
+    for color_index, color in enumerate(Color)
+    for type_index, piece_type in enumerate(PieceType)
+}
+
+# Direction is positive when stepping along it increases the bit index
+BB_DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+def _build_step_targets(offsets: List[Tuple[int, int]]) -> List[Tuple[int, ...]]:
+    table = []
+    for square in range(64):
+        row, col = divmod(square, 8)
+        table.append(tuple((row + drow) * 8 + col + dcol for drow, dcol in offsets
+                           if 0 <= row + drow < 8 and 0 <= col + dcol < 8))
+    return table
+
+def _build_ray_targets(drow: int, dcol: int) -> List[Tuple[int, ...]]:
+    # Squares along the ray in order, nearest first
+    table = []
+    for square in range(64):
+        row, col = divmod(square, 8)
+        ray = []
+        row, col = row + drow, col + dcol
+        while 0 <= row < 8 and 0 <= col < 8:
+            ray.append(row * 8 + col)
+            row, col = row + drow, col + dcol
+        table.append(tuple(ray))
+    return table
+
+def _build_pawn_pushes(drow: int, start_row: int) -> List[Tuple[int, ...]]:
+    # Single push, then the double push from the starting rank
+    table = []
+    for square in range(64):
+        row, col = divmod(square, 8)
+        if not 0 <= row + drow < 8:
+            table.append(())
+        elif row == start_row:
+            table.append(((row + drow) * 8 + col, (row + 2 * drow) * 8 + col))
+        else:
+            table.append(((row + drow) * 8 + col,))
+    return table
+
+def _masks(table: List[Tuple[int, ...]]) -> List[int]:
+    return [sum(1 << target for target in targets) for targets in table]
+
+# Move geometry per square, built once at import: target squares as tuples
+# for walking the mailbox, and the same sets as bitboards (BB_*)
+KNIGHT_TARGETS = _build_step_targets([
+    (-2, -1), (-2, 1), (-1, -2), (-1, 2),
+    (1, -2), (1, 2), (2, -1), (2, 1)
+])
+KING_TARGETS = _build_step_targets(
+    [(drow, dcol) for drow in (-1, 0, 1) for dcol in (-1, 0, 1) if drow or dcol]
+)
+# Squares a pawn of the given color attacks, or pushes to, from each square
+PAWN_CAPTURES = {
+    Color.WHITE: _build_step_targets([(-1, -1), (-1, 1)]),
+    Color.BLACK: _build_step_targets([(1, -1), (1, 1)]),
+}
+PAWN_PUSHES = {
+    Color.WHITE: _build_pawn_pushes(-1, 6),
+    Color.BLACK: _build_pawn_pushes(1, 1),
+}
+# RAY_TARGETS[i][square] walks BB_DIRECTIONS[i]; the first four are rook
+# directions, the last four bishop directions
+RAY_TARGETS = [_build_ray_targets(*direction) for direction in BB_DIRECTIONS]
+ROOK_RAY_TARGETS = RAY_TARGETS[:4]
+BISHOP_RAY_TARGETS = RAY_TARGETS[4:]
+
+BB_KNIGHT_ATTACKS = _masks(KNIGHT_TARGETS)
+BB_KING_ATTACKS = _masks(KING_TARGETS)
+BB_PAWN_ATTACKS = {color: _masks(table) for color, table in PAWN_CAPTURES.items()}
+BB_RAYS = {direction: _masks(table) for direction, table in zip(BB_DIRECTIONS, RAY_TARGETS)}
+BB_ALL = (1 << 64) - 1
+
+# Zobrist keys, from a fixed seed so a position hashes the same in every
+# process and run
+_zobrist_random = random.Random(0x5EED5)
+ZOBRIST_PIECES = [[_zobrist_random.getrandbits(64) for _ in range(64)] for _ in range(12)]
+ZOBRIST_CASTLING = [_zobrist_random.getrandbits(64) for _ in range(16)]
+ZOBRIST_EN_PASSANT = [_zobrist_random.getrandbits(64) for _ in range(8)]
+ZOBRIST_BLACK_TO_MOVE = _zobrist_random.getrandbits(64)
+# (ray table, positive) pairs for each slider
+BB_ROOK_RAYS = [(BB_RAYS[d], d[0] * 8 + d[1] > 0) for d in BB_DIRECTIONS[:4]]
+BB_BISHOP_RAYS = [(BB_RAYS[d], d[0] * 8 + d[1] > 0) for d in BB_DIRECTIONS[4:]]
+
+def _iter_bits(bb: int):
+    while bb:
+        lsb = bb & -bb
+        yield lsb.bit_length() - 1
+        bb ^= lsb
+
+def _slider_attacks(square: int, occupied: int, rays: List[Tuple[List[int], bool]]) -> int:
+    attacks = 0
+    for table, positive in rays:
+        ray = table[square]
+        blockers = ray & occupied
+        if blockers:
+            # Cut the ray off behind the nearest blocker
+            if positive:
+                first = (blockers & -blockers).bit_length() - 1
+            else:
+                first = blockers.bit_length() - 1
+            ray ^= table[first]
+        attacks |= ray
+    return attacks
 
 class ChessBoard:
-    def __init__(self):
+    def __new__(cls, backend: str = 'mailbox'):
+        # ChessBoard(backend='bitboard') hands back the bitboard implementation
+        if cls is ChessBoard:
+            if backend not in BOARD_BACKENDS:
+                raise ValueError(f"Unknown board backend: {backend!r}")
+            cls = BOARD_BACKENDS[backend]
+        return super().__new__(cls)
+
+    backend = 'mailbox'
+
+    def __init__(self, backend: str = 'mailbox'):
+        # `backend` only matters to __new__; the class it picked names itself
         self.board = self.initialize_board()
         self.current_player = Color.WHITE
-        self.move_history = []
-        self.last_move = None  # For en passant
+        self.castling_rights = CASTLE_ALL
+        self.en_passant = None  # Square a pawn can capture onto en passant
+        self.halfmove_clock = 0  # Plies since the last capture or pawn move
+        self.fullmove_number = 1
+        self._undo_stack = []
         self.white_king_pos = (7, 4)
         self.black_king_pos = (0, 4)
+        self._rebuild_derived_state()
 
     def initialize_board(self) -> List[List[Optional[Piece]]]:
         board = [[None for _ in range(8)] for _ in range(8)]
@@ -57,6 +284,129 @@ class ChessBoard:
         
         return board
 
+    @classmethod
+    def from_fen(cls, fen: str, backend: str = 'mailbox') -> 'ChessBoard':
+        fields = fen.split()
+        if len(fields) < 4:
+            raise ValueError(f"Incomplete FEN: {fen!r}")
+        placement, side, castling, en_passant = fields[:4]
+        try:
+            halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+            fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+        except ValueError:
+            raise ValueError(f"Bad move counters in FEN: {fen!r}") from None
+        if halfmove_clock < 0 or fullmove_number < 1:
+            raise ValueError(f"Bad move counters in FEN: {fen!r}")
+
+        game = cls(backend)
+        board = [[None for _ in range(8)] for _ in range(8)]
+        ranks = placement.split('/')
+        if len(ranks) != 8:
+            raise ValueError(f"FEN needs 8 ranks: {fen!r}")
+        kings = {}
+        for row, rank in enumerate(ranks):
+            col = 0
+            previous = ''
+            for symbol in rank:
+                # A rank that runs past the h-file is rejected, not truncated
+                step = int(symbol) if symbol.isdigit() else 1
+                if col + step > 8:
+                    raise ValueError(f"Rank {8 - row} does not cover 8 squares: {fen!r}")
+                if symbol.isdigit():
+                    if previous.isdigit():
+                        raise ValueError(f"Rank {8 - row} has adjacent digits: {fen!r}")
+                    previous = symbol
+                    col += step
+                    continue
+                previous = symbol
+                color = Color.WHITE if symbol.isupper() else Color.BLACK
+                piece_type = PieceType(symbol.lower())
+                board[row][col] = Piece(color, piece_type)
+                if piece_type == PieceType.KING:
+                    if color in kings:
+                        raise ValueError(f"More than one {color.name.lower()} king: {fen!r}")
+                    kings[color] = (row, col)
+                col += 1
+            if col != 8:
+                raise ValueError(f"Rank {8 - row} does not cover 8 squares: {fen!r}")
+        if len(kings) != 2:
+            raise ValueError(f"FEN needs one king per side: {fen!r}")
+
+        if side not in ('w', 'b'):
+            raise ValueError(f"Bad side to move {side!r}")
+        rights = 0
+        if castling != '-':
+            flags = {'K': CASTLE_WHITE_KINGSIDE, 'Q': CASTLE_WHITE_QUEENSIDE,
+                     'k': CASTLE_BLACK_KINGSIDE, 'q': CASTLE_BLACK_QUEENSIDE}
+            for flag in castling:
+                if flag not in flags:
+                    raise ValueError(f"Bad castling field {castling!r}")
+                rights |= flags[flag]
+
+        game.board = board
+        game.current_player = Color(side)
+        game.castling_rights = rights
+        game.en_passant = None
+        if en_passant != '-':
+            col = ord(en_passant[0]) - ord('a')
+            row = 8 - int(en_passant[1:])
+            if not (0 <= col < 8 and row in (2, 5)):
+                raise ValueError(f"Bad en passant square {en_passant!r}")
+            game.en_passant = (row, col)
+        game.halfmove_clock = halfmove_clock
+        game.fullmove_number = fullmove_number
+        game.white_king_pos = kings[Color.WHITE]
+        game.black_king_pos = kings[Color.BLACK]
+        game._rebuild_derived_state()
+        return game
+
+    def copy(self) -> 'ChessBoard':
+        # Independent board in the same position, history included. Pieces
+        # are shared flyweights, so only the containers are duplicated.
+        board = object.__new__(type(self))
+        board.__dict__.update(self.__dict__)
+        board.board = [row[:] for row in self.board]
+        board._undo_stack = self._undo_stack[:]
+        board._key_history = self._key_history[:]
+        board._key_counts = dict(self._key_counts)
+        self._copy_attack_state(board)
+        return board
+
+    def _copy_attack_state(self, board: 'ChessBoard'):
+        board._attack_counts = {color: counts[:] for color, counts in self._attack_counts.items()}
+        board._attack_masks = dict(self._attack_masks)
+        board._piece_attacks = self._piece_attacks[:]
+
+    def to_fen(self) -> str:
+        # All six FEN fields: placement, side, castling, en passant and clocks
+        ranks = []
+        for row in range(8):
+            rank = []
+            empty = 0
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece is None:
+                    empty += 1
+                    continue
+                if empty > 0:
+                    rank.append(str(empty))
+                    empty = 0
+                symbol = piece.type.value
+                rank.append(symbol.upper() if piece.color_code == WHITE else symbol)
+            if empty > 0:
+                rank.append(str(empty))
+            ranks.append(''.join(rank))
+
+        castling = ''.join(flag for flag, right in (
+            ('K', CASTLE_WHITE_KINGSIDE), ('Q', CASTLE_WHITE_QUEENSIDE),
+            ('k', CASTLE_BLACK_KINGSIDE), ('q', CASTLE_BLACK_QUEENSIDE))
+            if self.castling_rights & right) or '-'
+        en_passant = '-'
+        if self.en_passant:
+            en_passant = f"{chr(self.en_passant[1] + ord('a'))}{8 - self.en_passant[0]}"
+        return (f"{'/'.join(ranks)} {self.current_player.value} {castling} {en_passant} "
+                f"{self.halfmove_clock} {self.fullmove_number}")
+
     def display_board(self):
         print('   a b c d e f g h')
         print('  ─────────────────')
@@ -78,18 +428,18 @@ class ChessBoard:
             return []
 
         moves = []
-        if piece.type == PieceType.PAWN:
+        if piece.type_code == PAWN:
             moves.extend(self._get_pawn_moves(row, col))
-        elif piece.type == PieceType.ROOK:
+        elif piece.type_code == ROOK:
             moves.extend(self._get_rook_moves(row, col))
-        elif piece.type == PieceType.KNIGHT:
+        elif piece.type_code == KNIGHT:
             moves.extend(self._get_knight_moves(row, col))
-        elif piece.type == PieceType.BISHOP:
+        elif piece.type_code == BISHOP:
             moves.extend(self._get_bishop_moves(row, col))
-        elif piece.type == PieceType.QUEEN:
+        elif piece.type_code == QUEEN:
             moves.extend(self._get_rook_moves(row, col))
             moves.extend(self._get_bishop_moves(row, col))
-        elif piece.type == PieceType.KING:
+        elif piece.type_code == KING:
             moves.extend(self._get_king_moves(row, col, checking_check))
 
         # Only check for moves causing check if we're not already checking for check
@@ -99,208 +449,435 @@ class ChessBoard:
 
     def _get_pawn_moves(self, row: int, col: int) -> List[Tuple[int, int]]:
         moves = []
-        piece = self.board[row][col]
-        direction = 1 if piece.color == Color.BLACK else -1
+        board = self.board
+        piece = board[row][col]
+        square = row * 8 + col
 
-        # Forward move
-        if 0 <= row + direction < 8 and self.board[row + direction][col] is None:
-            moves.append((row + direction, col))
-            # Double move from starting position
-            if ((piece.color == Color.WHITE and row == 6) or 
-                (piece.color == Color.BLACK and row == 1)):
-                if self.board[row + 2*direction][col] is None:
-                    moves.append((row + 2*direction, col))
+        # Forward moves; the double push only if the single push is free
+        for target in PAWN_PUSHES[piece.color][square]:
+            if board[target >> 3][target & 7] is not None:
+                break
+            moves.append((target >> 3, target & 7))
 
         # Captures
-        for dcol in [-1, 1]:
-            if 0 <= col + dcol < 8 and 0 <= row + direction < 8:
-                target = self.board[row + direction][col + dcol]
-                if target and target.color != piece.color:
-                    moves.append((row + direction, col + dcol))
+        for target in PAWN_CAPTURES[piece.color][square]:
+            occupant = board[target >> 3][target & 7]
+            if occupant and occupant.color_code != piece.color_code:
+                moves.append((target >> 3, target & 7))
 
         # En passant
-        if self.last_move:
-            last_piece = self.board[self.last_move[2]][self.last_move[3]]
-            if (last_piece and last_piece.type == PieceType.PAWN and 
-                abs(self.last_move[0] - self.last_move[2]) == 2 and
-                row == self.last_move[2] and
-                abs(col - self.last_move[3]) == 1):
-                moves.append((row + direction, self.last_move[3]))
+        direction = 1 if piece.color_code == BLACK else -1
+        if (self.en_passant and self.en_passant[0] == row + direction and
+            abs(col - self.en_passant[1]) == 1):
+            moves.append(self.en_passant)
 
         return moves
 
     def _get_rook_moves(self, row: int, col: int) -> List[Tuple[int, int]]:
-        moves = []
-        directions = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-        piece = self.board[row][col]
+        return self._get_slider_moves(row, col, ROOK_RAY_TARGETS)
 
-        for drow, dcol in directions:
-            current_row, current_col = row + drow, col + dcol
-            while 0 <= current_row < 8 and 0 <= current_col < 8:
-                target = self.board[current_row][current_col]
-                if target is None:
-                    moves.append((current_row, current_col))
-                elif target.color != piece.color:
-                    moves.append((current_row, current_col))
-                    break
-                else:
-                    break
-                current_row += drow
-                current_col += dcol
+    def _get_knight_moves(self, row: int, col: int) -> List[Tuple[int, int]]:
+        return self._get_step_moves(row, col, KNIGHT_TARGETS)
 
-        return moves
+    def _get_bishop_moves(self, row: int, col: int) -> List[Tuple[int, int]]:
+        return self._get_slider_moves(row, col, BISHOP_RAY_TARGETS)
 
-    def _get_knight_moves(self, row: int, col: int) -> List[Tuple[int, int]]:
-        moves = []
-        piece = self.board[row][col]
-        knight_moves = [
-            (-2, -1), (-2, 1), (-1, -2), (-1, 2),
-            (1, -2), (1, 2), (2, -1), (2, 1)
-        ]
+    def _get_king_moves(self, row: int, col: int, checking_check: bool = False) -> List[Tuple[int, int]]:
+        moves = self._get_step_moves(row, col, KING_TARGETS)
 
-        for drow, dcol in knight_moves:
-            new_row, new_col = row + drow, col + dcol
-            if 0 <= new_row < 8 and 0 <= new_col < 8:
-                target = self.board[new_row][new_col]
-                if target is None or target.color != piece.color:
-                    moves.append((new_row, new_col))
+        # Only check castling if we're not in the check-detection phase
+        if not checking_check:
+            for target in _iter_bits(self._castling_targets(row, self.board[row][col])):
+                moves.append(divmod(target, 8))
 
         return moves
 
-    def _get_bishop_moves(self, row: int, col: int) -> List[Tuple[int, int]]:
+    def _get_step_moves(self, row: int, col: int, table: List[Tuple[int, ...]]) -> List[Tuple[int, int]]:
+        board = self.board
+        color_code = board[row][col].color_code
         moves = []
-        directions = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
-        piece = self.board[row][col]
+        for target in table[row * 8 + col]:
+            occupant = board[target >> 3][target & 7]
+            if occupant is None or occupant.color_code != color_code:
+                moves.append((target >> 3, target & 7))
+        return moves
 
-        for drow, dcol in directions:
-            current_row, current_col = row + drow, col + dcol
-            while 0 <= current_row < 8 and 0 <= current_col < 8:
-                target = self.board[current_row][current_col]
-                if target is None:
-                    moves.append((current_row, current_col))
-                elif target.color != piece.color:
-                    moves.append((current_row, current_col))
-                    break
+    def _get_slider_moves(self, row: int, col: int, rays: List[List[Tuple[int, ...]]]) -> List[Tuple[int, int]]:
+        # Walk each ray up to the first piece, which may be captured if it is
+        # the opponent's
+        board = self.board
+        color_code = board[row][col].color_code
+        square = row * 8 + col
+        moves = []
+        for table in rays:
+            for target in table[square]:
+                occupant = board[target >> 3][target & 7]
+                if occupant is None:
+                    moves.append((target >> 3, target & 7))
                 else:
+                    if occupant.color_code != color_code:
+                        moves.append((target >> 3, target & 7))
                     break
-                current_row += drow
-                current_col += dcol
-
         return moves
 
-    def _get_king_moves(self, row: int, col: int, checking_check: bool = False) -> List[Tuple[int, int]]:
-        moves = []
-        piece = self.board[row][col]
-        
-        # Normal moves
-        for drow in [-1, 0, 1]:
-            for dcol in [-1, 0, 1]:
-                if drow == 0 and dcol == 0:
-                    continue
-                new_row, new_col = row + drow, col + dcol
-                if 0 <= new_row < 8 and 0 <= new_col < 8:
-                    target = self.board[new_row][new_col]
-                    if target is None or target.color != piece.color:
-                        moves.append((new_row, new_col))
-
-        # Only check castling if we're not in the check-detection phase
-        if not checking_check and not piece.has_moved:
-            # Kingside castling
-            if (self.board[row][7] and 
-                self.board[row][7].type == PieceType.ROOK and 
-                not self.board[row][7].has_moved and
-                all(self.board[row][c] is None for c in range(5, 7)) and
-                not self.is_in_check(piece.color) and
-                not any(self.is_square_attacked(row, c, piece.color) for c in range(5, 7))):
-                moves.append((row, 6))
-            
-            # Queenside castling
-            if (self.board[row][0] and 
-                self.board[row][0].type == PieceType.ROOK and 
-                not self.board[row][0].has_moved and
-                all(self.board[row][c] is None for c in range(1, 4)) and
-                not self.is_in_check(piece.color) and
-                not any(self.is_square_attacked(row, c, piece.color) for c in range(2, 4))):
-                moves.append((row, 2))
-
-        return moves
+    def _castling_targets(self, row: int, king: Piece) -> int:
+        targets = 0
+        rights = self.castling_rights
+        if not rights & (CASTLE_KINGSIDE[king.color] | CASTLE_QUEENSIDE[king.color]):
+            return targets
+        if self.is_in_check(king.color):
+            return targets
+
+        # Kingside castling
+        rook = self.board[row][7]
+        if (rights & CASTLE_KINGSIDE[king.color] and
+            rook and rook.color == king.color and
+            rook.type_code == ROOK and
+            all(self.board[row][c] is None for c in range(5, 7)) and
+            not any(self.is_square_attacked(row, c, king.color) for c in range(5, 7))):
+            targets |= 1 << (row * 8 + 6)
+
+        # Queenside castling
+        rook = self.board[row][0]
+        if (rights & CASTLE_QUEENSIDE[king.color] and
+            rook and rook.color == king.color and
+            rook.type_code == ROOK and
+            all(self.board[row][c] is None for c in range(1, 4)) and
+            not any(self.is_square_attacked(row, c, king.color) for c in range(2, 4))):
+            targets |= 1 << (row * 8 + 2)
+
+        return targets
 
     def _move_causes_check(self, start_row: int, start_col: int, end_row: int, end_col: int) -> bool:
-        # Make temporary move
-        piece = self.board[start_row][start_col]
-        captured_piece = self.board[end_row][end_col]
-        self.board[end_row][end_col] = piece
-        self.board[start_row][start_col] = None
-
-        # Store original king position
-        original_king_pos = None
-        if piece.type == PieceType.KING:
-            if piece.color == Color.WHITE:
-                original_king_pos = self.white_king_pos
-                self.white_king_pos = (end_row, end_col)
+        color = self.board[start_row][start_col].color
+        self.push(Move(start_row, start_col, end_row, end_col))
+        in_check = self.is_in_check(color)
+        self.pop()
+        return in_check
+
+    def generate_legal_moves(self) -> List[Move]:
+        # Every legal move for the side to move. Computed once per position
+        # and shared, so callers must not modify the list.
+        if self._legal_moves is None:
+            self._legal_moves = self._generate_legal_moves(self.current_player)
+        return self._legal_moves
+
+    def status(self) -> GameStatus:
+        # Outcome of the current position, worked out once until the next move
+        if self._status is None:
+            in_check = self.is_in_check(self.current_player)
+            if not self.generate_legal_moves():
+                self._status = GameStatus.CHECKMATE if in_check else GameStatus.STALEMATE
+            elif self._insufficient_material():
+                self._status = GameStatus.INSUFFICIENT_MATERIAL
+            elif self.halfmove_clock >= 100:
+                self._status = GameStatus.FIFTY_MOVES
+            elif self.is_repetition(3):
+                self._status = GameStatus.REPETITION
             else:
-                original_king_pos = self.black_king_pos
-                self.black_king_pos = (end_row, end_col)
+                self._status = GameStatus.CHECK if in_check else GameStatus.ONGOING
+        return self._status
 
-        # Check if the move results in check
-        in_check = self.is_in_check(piece.color)
+    def _insufficient_material(self) -> bool:
+        # Neither side can ever mate: bare kings, a lone knight or bishop, or
+        # only bishops, all on squares of one colour
+        minors = []
+        for row in range(8):
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece is None or piece.type_code == KING:
+                    continue
+                if piece.type_code in (PAWN, ROOK, QUEEN):
+                    return False
+                minors.append((piece.type, (row + col) % 2))
+        if len(minors) <= 1:
+            return True
+        return (all(piece_type == PieceType.BISHOP for piece_type, _ in minors)
+                and len({shade for _, shade in minors}) == 1)
+
+    def _generate_legal_moves(self, color: Color) -> List[Move]:
+        # Checkers and pins are worked out once, then each piece's pseudo-legal
+        # targets are masked down instead of trying every move on the board
+        enemy = Color.BLACK if color == Color.WHITE else Color.WHITE
+        king_row, king_col = self.white_king_pos if color == Color.WHITE else self.black_king_pos
+        king_square = king_row * 8 + king_col
+        checkers = self.attack_count(king_row, king_col, enemy)
+        check_mask, pins, king_danger = self._find_checks_and_pins(color, king_square)
+        if not checkers:
+            check_mask = BB_ALL
+        king_danger |= self.attacks(enemy)
 
-        # Undo move
-        self.board[start_row][start_col] = piece
-        self.board[end_row][end_col] = captured_piece
-        
-        # Restore king position if king was moved
-        if original_king_pos:
-            if piece.color == Color.WHITE:
-                self.white_king_pos = original_king_pos
+        moves = []
+        for square in self._own_squares(color):
+            row, col = divmod(square, 8)
+            piece = self.board[row][col]
+            if piece.type_code == KING:
+                targets = self._piece_targets(row, col, piece) & ~king_danger
+                if not checkers:
+                    targets |= self._castling_targets(row, piece)
+            elif checkers > 1:
+                continue  # Double check: only the king may move
             else:
-                self.black_king_pos = original_king_pos
+                targets = self._piece_targets(row, col, piece)
+                if piece.type_code == PAWN:
+                    if self.en_passant:
+                        # En passant can uncover the king along the rank, so it
+                        # is tried on the board rather than masked
+                        ep_row, ep_col = self.en_passant
+                        if targets >> (ep_row * 8 + ep_col) & 1:
+                            targets &= ~(1 << (ep_row * 8 + ep_col))
+                            if not self._move_causes_check(row, col, ep_row, ep_col):
+                                moves.append(Move(row, col, ep_row, ep_col))
+                    targets &= check_mask & pins.get(square, BB_ALL)
+                    if row == (1 if color == Color.WHITE else 6):
+                        for target in _iter_bits(targets):
+                            for promotion in PROMOTION_TYPES:
+                                moves.append(Move(row, col, target >> 3, target & 7, promotion))
+                        continue
+                else:
+                    targets &= check_mask & pins.get(square, BB_ALL)
 
-        return in_check
+            for target in _iter_bits(targets):
+                moves.append(Move(row, col, target >> 3, target & 7))
+        return moves
+
+    def _own_squares(self, color: Color) -> List[int]:
+        return [row * 8 + col for row in range(8) for col in range(8)
+                if self.board[row][col] and self.board[row][col].color == color]
+
+    def _piece_targets(self, row: int, col: int, piece: Piece) -> int:
+        # Pseudo-legal target squares as a bitboard, castling excluded
+        if piece.type_code == PAWN:
+            moves = self._get_pawn_moves(row, col)
+        elif piece.type_code == ROOK:
+            moves = self._get_rook_moves(row, col)
+        elif piece.type_code == KNIGHT:
+            moves = self._get_knight_moves(row, col)
+        elif piece.type_code == BISHOP:
+            moves = self._get_bishop_moves(row, col)
+        elif piece.type_code == QUEEN:
+            moves = self._get_rook_moves(row, col) + self._get_bishop_moves(row, col)
+        else:
+            moves = self._get_king_moves(row, col, checking_check=True)
+        targets = 0
+        for target_row, target_col in moves:
+            targets |= 1 << (target_row * 8 + target_col)
+        return targets
+
+    def _find_checks_and_pins(self, color: Color, king_square: int) -> Tuple[int, dict, int]:
+        # Returns (check_mask, pins, king_danger):
+        #   check_mask  - checker squares plus the squares between a slider and
+        #                 the king; a non-king move must land on one of them
+        #   pins        - pinned piece square -> squares it may still move to
+        #   king_danger - squares shadowed by the king on a checking slider's
+        #                 line, which the attack map cannot see past the king
+        board = self.board
+        check_mask = 0
+        king_danger = 0
+        pins = {}
+
+        for target in KNIGHT_TARGETS[king_square]:
+            piece = board[target >> 3][target & 7]
+            if piece and piece.color != color and piece.type_code == KNIGHT:
+                check_mask |= 1 << target
+        for target in PAWN_CAPTURES[color][king_square]:
+            piece = board[target >> 3][target & 7]
+            if piece and piece.color != color and piece.type_code == PAWN:
+                check_mask |= 1 << target
+
+        for index, table in enumerate(RAY_TARGETS):
+            slider_type = ROOK if index < 4 else BISHOP
+            ray = 0
+            blocker = None
+            for square in table[king_square]:
+                ray |= 1 << square
+                piece = board[square >> 3][square & 7]
+                if piece is not None:
+                    if piece.color == color:
+                        if blocker is not None:
+                            break
+                        blocker = square
+                    else:
+                        if piece.type_code == QUEEN or piece.type_code == slider_type:
+                            if blocker is None:
+                                check_mask |= ray
+                                drow, dcol = BB_DIRECTIONS[index]
+                                king_danger |= BB_RAYS[-drow, -dcol][king_square]
+                            else:
+                                pins[blocker] = ray
+                        break
+        return check_mask, pins, king_danger
 
     def is_in_check(self, color: Color) -> bool:
         king_pos = self.white_king_pos if color == Color.WHITE else self.black_king_pos
         return self.is_square_attacked(king_pos[0], king_pos[1], color)
 
     def is_square_attacked(self, row: int, col: int, color: Color) -> bool:
-        # Check for attacks from all opposing pieces
-        for r in range(8):
-            for c in range(8):
-                piece = self.board[r][c]
-                if piece and piece.color != color:
-                    # Pass checking_check=True to avoid infinite recursion
-                    moves = self.get_piece_moves(r, c, checking_check=True)
-                    if (row, col) in moves:
-                        return True
-        return False
+        # Attacked by the side opposing `color`; read straight off the attack map
+        enemy = Color.BLACK if color == Color.WHITE else Color.WHITE
+        return self._attack_counts[enemy][row * 8 + col] > 0
+
+    def attacks(self, color: Color) -> int:
+        # Bitboard (bit row * 8 + col) of every square `color` attacks,
+        # including squares held by its own pieces
+        return self._attack_masks[color]
+
+    def attack_count(self, row: int, col: int, color: Color) -> int:
+        # Number of `color` pieces attacking the square
+        return self._attack_counts[color][row * 8 + col]
 
     def is_checkmate(self, color: Color) -> bool:
+        if color == self.current_player:
+            return self.status() == GameStatus.CHECKMATE
         if not self.is_in_check(color):
             return False
 
         # Check if any move can get out of check
-        for row in range(8):
-            for col in range(8):
-                piece = self.board[row][col]
-                if piece and piece.color == color:
-                    moves = self.get_piece_moves(row, col)
-                    if moves:
-                        return False
-        return True
+        return not self._has_legal_move(color)
 
     def is_stalemate(self, color: Color) -> bool:
+        if color == self.current_player:
+            return self.status() == GameStatus.STALEMATE
         if self.is_in_check(color):
             return False
 
         # Check if any legal moves are available
+        return not self._has_legal_move(color)
+
+    def _has_legal_move(self, color: Color) -> bool:
+        return bool(self._generate_legal_moves(color))
+
+    def _set_piece(self, row: int, col: int, piece: Optional[Piece]):
+        # Single choke point for board writes, so the attack maps (and any
+        # backend-specific representation) stay in step with self.board
+        square = row * 8 + col
+        old = self.board[row][col]
+
+        # Sliders looking at this square see further or less far once its
+        # occupancy changes; a capture leaves their rays alone
+        sliders = self._sliders_seeing(row, col) if (old is None) != (piece is None) else ()
+        for slider in sliders:
+            self._remove_attacks(slider)
+        if old is not None:
+            self._remove_attacks(square)
+
+        self.board[row][col] = piece
+        if old is not None:
+            self.zobrist_key ^= ZOBRIST_PIECES[old.code][square]
+        if piece is not None:
+            self.zobrist_key ^= ZOBRIST_PIECES[piece.code][square]
+
+        if piece is not None:
+            self._add_attacks(square, piece)
+        for slider in sliders:
+            self._add_attacks(slider, self.board[slider >> 3][slider & 7])
+
+    def _rebuild_derived_state(self):
+        # Recompute the attack maps and Zobrist key from scratch after
+        # self.board and the side/castling/en passant state were filled in
+        self.zobrist_key = self._compute_zobrist_key()
+        self._key_history = [self.zobrist_key]
+        self._key_counts = {self.zobrist_key: 1}
+        self._legal_moves = None
+        self._status = None
+        self._rebuild_attack_state()
+
+    def _rebuild_attack_state(self):
+        self._attack_counts = {Color.WHITE: [0] * 64, Color.BLACK: [0] * 64}
+        self._attack_masks = {Color.WHITE: 0, Color.BLACK: 0}
+        self._piece_attacks = [0] * 64
         for row in range(8):
             for col in range(8):
                 piece = self.board[row][col]
-                if piece and piece.color == color:
-                    moves = self.get_piece_moves(row, col)
-                    if moves:
-                        return False
-        return True
+                if piece:
+                    self._add_attacks(row * 8 + col, piece)
+
+    def _compute_zobrist_key(self) -> int:
+        key = ZOBRIST_CASTLING[self.castling_rights] ^ self._en_passant_zobrist()
+        if self.current_player == Color.BLACK:
+            key ^= ZOBRIST_BLACK_TO_MOVE
+        for row in range(8):
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece:
+                    key ^= ZOBRIST_PIECES[piece.code][row * 8 + col]
+        return key
+
+    def _en_passant_zobrist(self) -> int:
+        # The en passant file only counts when the side to move has a pawn
+        # next to the one that just advanced, so otherwise identical
+        # positions hash the same
+        if not self.en_passant:
+            return 0
+        ep_row, ep_col = self.en_passant
+        pawn_row = 3 if ep_row == 2 else 4
+        for col in (ep_col - 1, ep_col + 1):
+            if 0 <= col < 8:
+                piece = self.board[pawn_row][col]
+                if piece and piece.type_code == PAWN and piece.color == self.current_player:
+                    return ZOBRIST_EN_PASSANT[ep_col]
+        return 0
+
+    def is_repetition(self, count: int = 3) -> bool:
+        # Has the current position occurred `count` times? One dict lookup,
+        # since the key history is counted as moves are pushed and popped
+        return self._key_counts.get(self.zobrist_key, 0) >= count
+
+    def _add_attacks(self, square: int, piece: Piece):
+        attacks = self._compute_attacks(square, piece)
+        self._piece_attacks[square] = attacks
+        counts = self._attack_counts[piece.color]
+        for target in _iter_bits(attacks):
+            counts[target] += 1
+        self._attack_masks[piece.color] |= attacks
+
+    def _remove_attacks(self, square: int):
+        piece = self.board[square >> 3][square & 7]
+        counts = self._attack_counts[piece.color]
+        cleared = 0
+        for target in _iter_bits(self._piece_attacks[square]):
+            counts[target] -= 1
+            if not counts[target]:
+                cleared |= 1 << target
+        self._attack_masks[piece.color] &= ~cleared
+        self._piece_attacks[square] = 0
+
+    def _compute_attacks(self, square: int, piece: Piece) -> int:
+        if piece.type_code == PAWN:
+            return BB_PAWN_ATTACKS[piece.color][square]
+        if piece.type_code == KNIGHT:
+            return BB_KNIGHT_ATTACKS[square]
+        if piece.type_code == KING:
+            return BB_KING_ATTACKS[square]
+
+        if piece.type_code == ROOK:
+            rays = ROOK_RAY_TARGETS
+        elif piece.type_code == BISHOP:
+            rays = BISHOP_RAY_TARGETS
+        else:
+            rays = RAY_TARGETS
+        board = self.board
+        attacks = 0
+        for table in rays:
+            for target in table[square]:
+                attacks |= 1 << target
+                if board[target >> 3][target & 7] is not None:
+                    break
+        return attacks
+
+    def _sliders_seeing(self, row: int, col: int) -> List[int]:
+        # Squares of rooks, bishops and queens whose rays reach (row, col)
+        board = self.board
+        square = row * 8 + col
+        sliders = []
+        for index, table in enumerate(RAY_TARGETS):
+            for target in table[square]:
+                piece = board[target >> 3][target & 7]
+                if piece is not None:
+                    if piece.type_code == QUEEN or piece.type_code == (ROOK if index < 4 else BISHOP):
+                        sliders.append(target)
+                    break
+        return sliders
 
     def make_move(self, start: str, end: str) -> bool:
         try:
@@ -309,6 +886,7 @@ class ChessBoard:
             start_row = 8 - int(start[1])
             end_col = ord(end[0].lower()) - ord('a')
             end_row = 8 - int(end[1])
+            promotion = PieceType(end[2].lower()) if len(end) > 2 else None
 
             # Validate input coordinates
             if not (0 <= start_row < 8 and 0 <= start_col < 8 and 
@@ -319,381 +897,733 @@ class ChessBoard:
             if not piece or piece.color != self.current_player:
                 return False
 
-            valid_moves = self.get_piece_moves(start_row, start_col)
-            if (end_row, end_col) not in valid_moves:
-                return False
-
-            # Handle special moves
-            if piece.type == PieceType.PAWN:
-                # En passant
-                if (end_col != start_col and 
-                    self.board[end_row][end_col] is None):
-                    self.board[start_row][end_col] = None  # Capture the passed pawn
-
-                # Promotion (automatically to Queen)
-                if end_row in [0, 7]:
-                    piece = Piece(piece.color, PieceType.QUEEN)
-
-            # Handle castling
-            if piece.type == PieceType.KING and abs(end_col - start_col) == 2:
-                # Kingside castling
-                if end_col == 6:
-                    rook = self.board[start_row][7]
-                    self.board[start_row][7] = None
-                    self.board[start_row][5] = rook
-                    if rook:
-                        rook.has_moved = True
-                # Queenside castling
-                elif end_col == 2:
-                    rook = self.board[start_row][0]
-                    self.board[start_row][0] = None
-                    self.board[start_row][3] = rook
-                    if rook:
-                        rook.has_moved = True
-
-            # Make the move
-            self.board[end_row][end_col] = piece
-            self.board[start_row][start_col] = None
-            piece.has_moved = True
-
-            # Update king position
-            if piece.type == PieceType.KING:
-                if piece.color == Color.WHITE:
-                    self.white_king_pos = (end_row, end_col)
-                else:
-                    self.black_king_pos = (end_row, end_col)
+            # Promotion (to Queen unless another piece was asked for)
+            if piece.type_code == PAWN and end_row in [0, 7] and promotion is None:
+                promotion = PieceType.QUEEN
 
-            # Record move for en passant
-            self.last_move = (start_row, start_col, end_row, end_col)
-            self.move_history.append((start, end))
+            move = Move(start_row, start_col, end_row, end_col, promotion)
+            if move not in self.generate_legal_moves():
+                return False
 
-            # Switch players
-            self.current_player = Color.BLACK if self.current_player == Color.WHITE else Color.WHITE
+            self.push(move)
             return True
         
         except (IndexError, ValueError):
             return False
 
-class ChessGUI:
-    def __init__(self):
-        self.window = tk.Tk()
-        self.window.title("Chess")
-        self.game = ChessBoard()
-        self.selected_square = None
-        self.buttons = [[None for _ in range(8)] for _ in range(8)]
-        self.vs_ai = False
-        self.self_play = False
-        self.stockfish = None
-        
-        # Use the exact path for your Stockfish executable
-        stockfish_path = r"C:\Users\jason\Downloads\stockfish-windows-x86-64-avx2\stockfish\stockfish-windows-x86-64-avx2.exe"
-        
-        try:
-            if not os.path.exists(stockfish_path):
-                print(f"Stockfish not found at: {os.path.abspath(stockfish_path)}")
-                raise FileNotFoundError(f"Stockfish executable not found at: {stockfish_path}")
-                
-            self.stockfish = Stockfish(path=stockfish_path)
-            self.stockfish.set_skill_level(20)
-            self.stockfish.set_depth(15)
-            print(f"Successfully initialized Stockfish at: {stockfish_path}")
-        except Exception as e:
-            print(f"Error initializing Stockfish: {e}")
-            messagebox.showwarning("Stockfish Error", 
-                f"Error initializing Stockfish: {e}\n\n"
-                f"Please ensure Stockfish is installed at:\n{os.path.abspath(stockfish_path)}")
-            
-        self.setup_board()
-        self.setup_controls()
-        self.setup_evaluation_display()
-
-    def setup_controls(self):
-        control_frame = tk.Frame(self.window)
-        control_frame.grid(row=8, column=0, columnspan=8)
-        
-        self.ai_button = tk.Button(control_frame, text="VS Player", command=self.toggle_ai_mode)
-        self.ai_button.pack(pady=5)
-        
-        self.self_play_button = tk.Button(control_frame, text="Self Play", command=self.toggle_self_play)
-        self.self_play_button.pack(pady=5)
-        
-        self.restart_button = tk.Button(control_frame, text="Restart", command=self.restart_game)
-        self.restart_button.pack(pady=5)
-
-    def restart_game(self):
-        self.game = ChessBoard()
-        self.selected_square = None
-        if self.stockfish:
-            self.stockfish.set_position([])
-        self.update_display()
-        if self.self_play:
-            self.start_self_play()
-
-    def toggle_self_play(self):
-        if not self.stockfish:
-            messagebox.showerror("Error", 
-                "Stockfish is not available.\n\n"
-                "Please ensure the Stockfish executable is in the correct location.")
-            return
-            
-        self.self_play = not self.self_play
-        self.vs_ai = False
-        self.ai_button.config(text="VS Player")
-        self.self_play_button.config(text="Stop Self Play" if self.self_play else "Self Play")
-        
-        if self.self_play:
-            self.restart_game()
+    def san(self, move: Move) -> str:
+        # Standard algebraic notation for a legal move in this position
+        start_row, start_col, end_row, end_col, promotion = move
+        piece = self.board[start_row][start_col]
+        target = f"{chr(end_col + ord('a'))}{8 - end_row}"
+        if piece.type_code == KING and abs(end_col - start_col) == 2:
+            san = 'O-O' if end_col == 6 else 'O-O-O'
+        elif piece.type_code == PAWN:
+            san = f"{chr(start_col + ord('a'))}x{target}" if start_col != end_col else target
+            if promotion:
+                san += '=' + promotion.value.upper()
         else:
-            self.restart_game()
-
-    def start_self_play(self):
-        if not self.self_play:
-            return
-        
-        def play_game():
-            while self.self_play and not self.game.is_checkmate(self.game.current_player) and not self.game.is_stalemate(self.game.current_player):
-                self.make_stockfish_move()
-                time.sleep(1)  # Delay between moves
-                self.window.update()
-                print(f"Self-play move made, history: {self.game.move_history}")  # Debug print
-
-        thread = threading.Thread(target=play_game)
-        thread.daemon = True
-        thread.start()
-
-    def toggle_ai_mode(self):
-        if not self.stockfish:
-            messagebox.showerror("Error", 
-                "Stockfish is not available.\n\n"
-                "Please ensure the Stockfish executable is in the correct location.")
-            return
-            
-        self.vs_ai = not self.vs_ai
-        self.self_play = False
-        self.self_play_button.config(text="Self Play")
-        self.ai_button.config(text="VS Stockfish" if not self.vs_ai else "VS Player")
-        if self.vs_ai and self.game.current_player == Color.BLACK:
-            self.make_stockfish_move()
-
-    def get_fen_position(self):
-        # Convert current board state to FEN notation
-        fen = []
-        empty = 0
-        
-        for row in range(8):
-            for col in range(8):
-                piece = self.game.board[row][col]
-                if piece is None:
-                    empty += 1
+            # Name the origin file, rank or both if another piece of the
+            # same type could also reach the target
+            rivals = [m for m in self.generate_legal_moves()
+                      if m.end_row == end_row and m.end_col == end_col and m != move
+                      and self.board[m.start_row][m.start_col].type == piece.type]
+            origin = ''
+            if rivals:
+                if all(m.start_col != start_col for m in rivals):
+                    origin = chr(start_col + ord('a'))
+                elif all(m.start_row != start_row for m in rivals):
+                    origin = str(8 - start_row)
                 else:
-                    if empty > 0:
-                        fen.append(str(empty))
-                        empty = 0
-                    symbol = piece.type.value
-                    fen.append(symbol.upper() if piece.color == Color.WHITE else symbol.lower())
-            if empty > 0:
-                fen.append(str(empty))
-                empty = 0
-            if row < 7:
-                fen.append('/')
-        
-        # Add current player
-        fen.append(' w ' if self.game.current_player == Color.WHITE else ' b ')
-        
-        return ''.join(fen)
+                    origin = f"{chr(start_col + ord('a'))}{8 - start_row}"
+            capture = 'x' if self.board[end_row][end_col] else ''
+            san = f"{piece.type.value.upper()}{origin}{capture}{target}"
+
+        self.push(move)
+        if self.is_in_check(self.current_player):
+            san += '+' if self.generate_legal_moves() else '#'
+        self.pop()
+        return san
+
+    def parse_san(self, san: str) -> Move:
+        # Standard algebraic notation ('Nbd7', 'exd5', 'e8=Q+', 'O-O') to the
+        # legal Move it names; ValueError if it names none or several
+        text = san.rstrip('+#!?')
+        moves = self.generate_legal_moves()
+        if text in ('O-O', '0-0', 'O-O-O', '0-0-0'):
+            target_col = 6 if len(text) == 3 else 2
+            candidates = [m for m in moves if m.start_col == 4 and m.end_col == target_col and
+                          self.board[m.start_row][m.start_col].type == PieceType.KING]
+        else:
+            match = SAN_PATTERN.match(text)
+            if not match:
+                raise ValueError(f"Invalid SAN move: {san!r}")
+            piece_letter, from_file, from_rank, target, promotion = match.groups()
+            piece_type = PieceType(piece_letter.lower()) if piece_letter else PieceType.PAWN
+            end_col = ord(target[0]) - ord('a')
+            end_row = 8 - int(target[1])
+            promotion = PieceType(promotion[-1].lower()) if promotion else None
+            candidates = [
+                m for m in moves
+                if m.end_row == end_row and m.end_col == end_col and m.promotion == promotion
+                and self.board[m.start_row][m.start_col].type == piece_type
+                and (from_file is None or m.start_col == ord(from_file) - ord('a'))
+                and (from_rank is None or m.start_row == 8 - int(from_rank))
+            ]
+        if len(candidates) != 1:
+            problem = 'Illegal' if not candidates else 'Ambiguous'
+            raise ValueError(f"{problem} SAN move: {san!r}")
+        return candidates[0]
+
+    def variation_san(self, uci_moves: List[str]) -> str:
+        # A line of UCI moves from this position as numbered SAN, e.g.
+        # '12... Nf6 13. e5'; stops at the first move that is not legal
+        parts = []
+        played = 0
+        for uci in uci_moves:
+            move = next((m for m in self.generate_legal_moves() if m.uci() == uci), None)
+            if move is None:
+                break
+            if self.current_player == Color.WHITE:
+                parts.append(f"{self.fullmove_number}.")
+            elif not parts:
+                parts.append(f"{self.fullmove_number}...")
+            parts.append(self.san(move))
+            self.push(move)
+            played += 1
+        for _ in range(played):
+            self.pop()
+        return ' '.join(parts)
+
+    def push(self, move: Move):
+        # Play a legal move. Everything needed to take it back goes on the
+        # undo stack; no pieces are allocated and the board is not copied.
+        start_row, start_col, end_row, end_col, promotion = move
+        piece = self.board[start_row][start_col]
+        captured = self.board[end_row][end_col]
+        captured_row = end_row
+        previous_state = ZOBRIST_CASTLING[self.castling_rights] ^ self._en_passant_zobrist()
+
+        # En passant takes the pawn beside the start square
+        if piece.type_code == PAWN and start_col != end_col and captured is None:
+            captured_row = start_row
+            captured = self.board[start_row][end_col]
+            self._set_piece(start_row, end_col, None)
+
+        # The position's legal moves and status come back on pop, so going
+        # back to it never recomputes them
+        self._undo_stack.append((move, piece, captured, captured_row, self.castling_rights,
+                                 self.en_passant, self.halfmove_clock, self._legal_moves, self._status))
+        self._legal_moves = None
+        self._status = None
+
+        self._set_piece(end_row, end_col, PROMOTION_PIECES[piece.color, promotion] if promotion else piece)
+        self._set_piece(start_row, start_col, None)
+
+        if piece.type_code == KING:
+            if piece.color_code == WHITE:
+                self.white_king_pos = (end_row, end_col)
+            else:
+                self.black_king_pos = (end_row, end_col)
 
-    def setup_evaluation_display(self):
-        # Create canvas for evaluation bar
-        self.eval_canvas = tk.Canvas(self.window, width=30, height=400, bg='gray')
-        self.eval_canvas.grid(row=0, column=8, rowspan=8, padx=5)
-        
-        # Create initial evaluation bar (neutral position - equal parts black and white)
-        self.eval_bar_black = self.eval_canvas.create_rectangle(
-            0, 0, 30, 200,  # Top half
-            fill='black'
-        )
-        self.eval_bar_white = self.eval_canvas.create_rectangle(
-            0, 200, 30, 400,  # Bottom half
-            fill='white'
-        )
-        
-        self.eval_text = self.eval_canvas.create_text(
-            15, 10,  # Position at top of bar
-            text="0.0",
-            fill='white'  # White text for better visibility
-        )
-        self.update_evaluation()
-
-    def update_evaluation(self):
-        if not self.stockfish:
-            return
-            
-        try:
-            self.stockfish.set_position([move[0] + move[1] for move in self.game.move_history])
-            eval = self.stockfish.get_evaluation()
-            
-            # Convert evaluation to a visual representation
-            max_height = 400  # Total height of canvas
-            middle = max_height / 2
-            
-            if eval['type'] == 'cp':
-                score = eval['value'] / 100.0  # Convert centipawns to pawns
-                
-                # Use a linear mapping for scores between -5 and 5
-                normalized_score = max(min(score, 5), -5)  # Clamp between -5 and 5
-                
-                # Calculate the sizes of white and black sections
-                # Positive score means white advantage (white section grows)
-                white_height = middle * (1 + normalized_score / 5)
-                
-                # Create two rectangles: black on top, white on bottom
-                self.eval_canvas.delete(self.eval_bar_black)  # Remove old black section
-                self.eval_canvas.delete(self.eval_bar_white)  # Remove old white section
-                
-                # Create black section (top)
-                self.eval_bar_black = self.eval_canvas.create_rectangle(
-                    0, 0, 30, max_height - white_height,
-                    fill='black'
-                )
-                
-                # Create white section (bottom)
-                self.eval_bar_white = self.eval_canvas.create_rectangle(
-                    0, max_height - white_height, 30, max_height,
-                    fill='white'
-                )
-                
-                # Update text
-                text = f"+{abs(score):.1f}" if score > 0 else f"{score:.1f}"
-                self.eval_canvas.itemconfig(self.eval_text, text=text)
-                
-            else:  # Mate
-                score = eval['value']
-                self.eval_canvas.delete(self.eval_bar_black)  # Remove old black section
-                self.eval_canvas.delete(self.eval_bar_white)  # Remove old white section
-                
-                if score > 0:  # White is winning
-                    # Fill entire bar with white
-                    self.eval_bar_white = self.eval_canvas.create_rectangle(
-                        0, 0, 30, max_height,
-                        fill='white'
-                    )
-                else:  # Black is winning
-                    # Fill entire bar with black
-                    self.eval_bar_black = self.eval_canvas.create_rectangle(
-                        0, 0, 30, max_height,
-                        fill='black'
-                    )
-                self.eval_canvas.itemconfig(self.eval_text, text=f"M{abs(score)}")
-                
-        except Exception as e:
-            print(f"Error getting evaluation: {e}")
-
-    def make_stockfish_move(self):
-        if not self.stockfish:
-            print("Stockfish not initialized")
-            return
-            
-        # Update Stockfish with current position
-        try:
-            self.stockfish.set_position([move[0] + move[1] for move in self.game.move_history])
-        except Exception as e:
-            print(f"Error setting position: {e}")
-            return
+            # Castling also brings the rook across
+            if abs(end_col - start_col) == 2:
+                rook_from, rook_to = (7, 5) if end_col == 6 else (0, 3)
+                self._set_piece(start_row, rook_to, self.board[start_row][rook_from])
+                self._set_piece(start_row, rook_from, None)
 
-        # Get best move from Stockfish
-        try:
-            best_move = self.stockfish.get_best_move()
-            if best_move:
-                start = best_move[:2]
-                end = best_move[2:4]
-                print(f"Stockfish move: {start} to {end}")  # Debug print
-                
-                if self.game.make_move(start, end):
-                    self.update_display()
-                    self.update_evaluation()  # Update evaluation after move
-                    self.check_game_state()
-                    print(f"Current position after move: {self.game.move_history}")  # Debug print
-        except Exception as e:
-            print(f"Error getting best move: {e}")
-
-    def setup_board(self):
-        colors = ['white', 'gray']
-        for row in range(8):
-            for col in range(8):
-                color = colors[(row + col) % 2]
-                btn = tk.Button(self.window, width=5, height=2, bg=color,
-                              command=lambda r=row, c=col: self.square_clicked(r, c))
-                btn.grid(row=row, column=col)
-                self.buttons[row][col] = btn
-        self.update_display()
-
-    def update_display(self):
-        piece_symbols = {
-            'wp': '♙', 'wr': '♖', 'wn': '♘', 'wb': '♗', 'wq': '♕', 'wk': '♔',
-            'bp': '♟', 'br': '♜', 'bn': '♞', 'bb': '♝', 'bq': '♛', 'bk': '♚'
-        }
-        
+        self.castling_rights &= ~(CASTLING_RIGHTS_LOST[start_row * 8 + start_col] |
+                                  CASTLING_RIGHTS_LOST[end_row * 8 + end_col])
+        if piece.type_code == PAWN and abs(end_row - start_row) == 2:
+            self.en_passant = ((start_row + end_row) // 2, start_col)
+        else:
+            self.en_passant = None
+
+        if piece.type_code == PAWN or captured is not None:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        if piece.color_code == BLACK:
+            self.fullmove_number += 1
+
+        # Switch players
+        self.current_player = Color.BLACK if piece.color_code == WHITE else Color.WHITE
+
+        # Pieces were hashed in by _set_piece; swap the rest of the state over
+        key = (self.zobrist_key ^ previous_state ^ ZOBRIST_BLACK_TO_MOVE ^
+               ZOBRIST_CASTLING[self.castling_rights] ^ self._en_passant_zobrist())
+        self.zobrist_key = key
+        self._key_history.append(key)
+        self._key_counts[key] = self._key_counts.get(key, 0) + 1
+
+    def pop(self) -> Move:
+        # Take back the last pushed move and return it
+        (move, piece, captured, captured_row, castling_rights, en_passant, halfmove_clock,
+         self._legal_moves, self._status) = self._undo_stack.pop()
+        start_row, start_col, end_row, end_col, _ = move
+
+        if piece.type_code == KING:
+            if piece.color_code == WHITE:
+                self.white_king_pos = (start_row, start_col)
+            else:
+                self.black_king_pos = (start_row, start_col)
+
+            if abs(end_col - start_col) == 2:
+                rook_from, rook_to = (7, 5) if end_col == 6 else (0, 3)
+                self._set_piece(start_row, rook_from, self.board[start_row][rook_to])
+                self._set_piece(start_row, rook_to, None)
+
+        self._set_piece(start_row, start_col, piece)
+        if captured_row == end_row:
+            self._set_piece(end_row, end_col, captured)
+        else:
+            self._set_piece(end_row, end_col, None)
+            self._set_piece(captured_row, end_col, captured)
+
+        self.castling_rights = castling_rights
+        self.en_passant = en_passant
+        self.halfmove_clock = halfmove_clock
+        if piece.color_code == BLACK:
+            self.fullmove_number -= 1
+        self.current_player = piece.color
+
+        key = self._key_history.pop()
+        if self._key_counts[key] == 1:
+            del self._key_counts[key]
+        else:
+            self._key_counts[key] -= 1
+        self.zobrist_key = self._key_history[-1]
+        return move
+
+    def perft(self, depth: int) -> int:
+        # Count leaf nodes `depth` plies below this position
+        if depth == 0:
+            return 1
+        moves = self.generate_legal_moves()
+        if depth == 1:
+            return len(moves)
+        nodes = 0
+        for move in moves:
+            self.push(move)
+            nodes += self.perft(depth - 1)
+            self.pop()
+        return nodes
+
+    def divide(self, depth: int) -> Dict[str, int]:
+        # Perft split by root move, for tracking down a wrong count
+        counts = {}
+        for move in self.generate_legal_moves():
+            self.push(move)
+            counts[move.uci()] = self.perft(depth - 1)
+            self.pop()
+        return counts
+
+    @property
+    def move_stack(self) -> List[Move]:
+        return [record[0] for record in self._undo_stack]
+
+    def peek(self) -> Optional[Move]:
+        # The last move played, without building the whole move_stack
+        return self._undo_stack[-1][0] if self._undo_stack else None
+
+    @property
+    def move_history(self) -> List[Tuple[str, str]]:
+        # (start, end) squares of each move played so far; a promotion keeps
+        # its piece letter on the end square, e.g. ('e7', 'e8q')
+        return [(uci[:2], uci[2:]) for uci in (record[0].uci() for record in self._undo_stack)]
+
+class BitboardChessBoard(ChessBoard):
+    # Backed by bitboards: twelve 64-bit piece sets plus occupancy. self.board
+    # is still kept in step so the GUI can read squares directly; move
+    # generation and attack detection work on the bitboards, so the mailbox
+    # attack maps are not kept at all and attack queries are answered on
+    # demand.
+    backend = 'bitboard'
+
+    def _rebuild_derived_state(self):
+        self.pieces = [0] * 12
+        self.occupancy = {Color.WHITE: 0, Color.BLACK: 0}
         for row in range(8):
             for col in range(8):
-                piece = self.game.board[row][col]
-                text = ''
+                piece = self.board[row][col]
                 if piece:
-                    text = piece_symbols[str(piece)]
-                self.buttons[row][col].config(text=text, font=('Arial', 20))
-
-    def square_clicked(self, row: int, col: int):
-        if self.self_play:
-            return
-            
-        # If it's AI's turn (Black) and VS AI mode is on, ignore clicks
-        if self.vs_ai and self.game.current_player == Color.BLACK:
-            return
-
-        if self.selected_square is None:
-            piece = self.game.board[row][col]
-            if piece and piece.color == self.game.current_player:
-                self.selected_square = (row, col)
-                self.buttons[row][col].config(bg='yellow')
+                    bit = 1 << (row * 8 + col)
+                    self.pieces[piece.code] |= bit
+                    self.occupancy[piece.color] |= bit
+        self.occupied = self.occupancy[Color.WHITE] | self.occupancy[Color.BLACK]
+        super()._rebuild_derived_state()
+
+    def _rebuild_attack_state(self):
+        pass
+
+    def _copy_attack_state(self, board: 'BitboardChessBoard'):
+        board.pieces = self.pieces[:]
+        board.occupancy = dict(self.occupancy)
+
+    def _set_piece(self, row: int, col: int, piece: Optional[Piece]):
+        square = row * 8 + col
+        bit = 1 << square
+        old = self.board[row][col]
+        if old is not None:
+            self.pieces[old.code] &= ~bit
+            self.occupancy[old.color] &= ~bit
+            self.zobrist_key ^= ZOBRIST_PIECES[old.code][square]
+        if piece is not None:
+            self.pieces[piece.code] |= bit
+            self.occupancy[piece.color] |= bit
+            self.zobrist_key ^= ZOBRIST_PIECES[piece.code][square]
+        self.occupied = self.occupancy[Color.WHITE] | self.occupancy[Color.BLACK]
+        self.board[row][col] = piece
+
+    def is_square_attacked(self, row: int, col: int, color: Color) -> bool:
+        enemy = Color.BLACK if color == Color.WHITE else Color.WHITE
+        return self._attacked_by(row * 8 + col, enemy, self.occupied)
+
+    def attacks(self, color: Color) -> int:
+        board = self.board
+        attacks = 0
+        for square in _iter_bits(self.occupancy[color]):
+            attacks |= self._compute_attacks(square, board[square >> 3][square & 7])
+        return attacks
+
+    def attack_count(self, row: int, col: int, color: Color) -> int:
+        square = row * 8 + col
+        pieces = self.pieces
+        base = BB_PIECE_INDEX[color, PieceType.PAWN]
+        other = Color.BLACK if color == Color.WHITE else Color.WHITE
+        queens = pieces[base + 4]
+        attackers = (BB_PAWN_ATTACKS[other][square] & pieces[base] |
+                     BB_KNIGHT_ATTACKS[square] & pieces[base + 2] |
+                     BB_KING_ATTACKS[square] & pieces[base + 5] |
+                     _slider_attacks(square, self.occupied, BB_ROOK_RAYS) & (pieces[base + 1] | queens) |
+                     _slider_attacks(square, self.occupied, BB_BISHOP_RAYS) & (pieces[base + 3] | queens))
+        return bin(attackers).count('1')
+
+    def _compute_attacks(self, square: int, piece: Piece) -> int:
+        if piece.type_code == ROOK:
+            return _slider_attacks(square, self.occupied, BB_ROOK_RAYS)
+        if piece.type_code == BISHOP:
+            return _slider_attacks(square, self.occupied, BB_BISHOP_RAYS)
+        if piece.type_code == QUEEN:
+            return (_slider_attacks(square, self.occupied, BB_ROOK_RAYS) |
+                    _slider_attacks(square, self.occupied, BB_BISHOP_RAYS))
+        return super()._compute_attacks(square, piece)
+
+    def _attacked_by(self, square: int, color: Color, occupied: int, removed: int = 0) -> bool:
+        # True if a piece of `color` attacks `square`, given the occupancy and
+        # ignoring any pieces in `removed` (e.g. one about to be captured)
+        pieces = self.pieces
+        base = BB_PIECE_INDEX[color, PieceType.PAWN]
+        other = Color.BLACK if color == Color.WHITE else Color.WHITE
+        if BB_PAWN_ATTACKS[other][square] & pieces[base] & ~removed:
+            return True
+        if BB_KNIGHT_ATTACKS[square] & pieces[base + 2] & ~removed:
+            return True
+        if BB_KING_ATTACKS[square] & pieces[base + 5]:
+            return True
+        queens = pieces[base + 4]
+        rooks = (pieces[base + 1] | queens) & ~removed
+        if rooks and _slider_attacks(square, occupied, BB_ROOK_RAYS) & rooks:
+            return True
+        bishops = (pieces[base + 3] | queens) & ~removed
+        if bishops and _slider_attacks(square, occupied, BB_BISHOP_RAYS) & bishops:
+            return True
+        return False
+
+    def get_piece_moves(self, row: int, col: int, checking_check: bool = False) -> List[Tuple[int, int]]:
+        piece = self.board[row][col]
+        if piece is None:
+            return []
+
+        targets = self._get_targets(row, col, piece, checking_check)
+        if checking_check:
+            return [divmod(target, 8) for target in _iter_bits(targets)]
+        return [divmod(target, 8) for target in _iter_bits(targets)
+                if not self._move_causes_check(row, col, target >> 3, target & 7)]
+
+    def _get_targets(self, row: int, col: int, piece: Piece, checking_check: bool) -> int:
+        square = row * 8 + col
+        own = self.occupancy[piece.color]
+        if piece.type_code == PAWN:
+            return self._get_pawn_targets(row, col, piece)
+        if piece.type_code == KNIGHT:
+            return BB_KNIGHT_ATTACKS[square] & ~own
+        if piece.type_code == BISHOP:
+            return _slider_attacks(square, self.occupied, BB_BISHOP_RAYS) & ~own
+        if piece.type_code == ROOK:
+            return _slider_attacks(square, self.occupied, BB_ROOK_RAYS) & ~own
+        if piece.type_code == QUEEN:
+            return (_slider_attacks(square, self.occupied, BB_ROOK_RAYS) |
+                    _slider_attacks(square, self.occupied, BB_BISHOP_RAYS)) & ~own
+        targets = BB_KING_ATTACKS[square] & ~own
+        if not checking_check:
+            targets |= self._castling_targets(row, piece)
+        return targets
+
+    def _get_pawn_targets(self, row: int, col: int, piece: Piece) -> int:
+        direction = 1 if piece.color_code == BLACK else -1
+        enemy = Color.BLACK if piece.color_code == WHITE else Color.WHITE
+        targets = 0
+
+        # Forward moves; the double push only if the single push is free
+        for target in PAWN_PUSHES[piece.color][row * 8 + col]:
+            if self.occupied >> target & 1:
+                break
+            targets |= 1 << target
+
+        # Captures
+        targets |= BB_PAWN_ATTACKS[piece.color][row * 8 + col] & self.occupancy[enemy]
+
+        # En passant
+        if self.en_passant:
+            ep_row, ep_col = self.en_passant
+            if ep_row == row + direction and abs(col - ep_col) == 1:
+                targets |= 1 << (ep_row * 8 + ep_col)
+        return targets
+
+    def _castling_targets(self, row: int, king: Piece) -> int:
+        rights = self.castling_rights
+        if not rights & (CASTLE_KINGSIDE[king.color] | CASTLE_QUEENSIDE[king.color]):
+            return 0
+        enemy = Color.BLACK if king.color_code == WHITE else Color.WHITE
+        occupied = self.occupied
+        rooks = self.pieces[king.color_code * 6 + ROOK]
+        base = row * 8
+        if self._attacked_by(base + 4, enemy, occupied):
+            return 0
+
+        targets = 0
+        # Kingside: f and g empty and not attacked
+        if (rights & CASTLE_KINGSIDE[king.color] and rooks >> (base + 7) & 1 and
+            not occupied & (0b11 << (base + 5)) and
+            not self._attacked_by(base + 5, enemy, occupied) and
+            not self._attacked_by(base + 6, enemy, occupied)):
+            targets |= 1 << (base + 6)
+
+        # Queenside: b, c and d empty; c and d not attacked
+        if (rights & CASTLE_QUEENSIDE[king.color] and rooks >> base & 1 and
+            not occupied & (0b111 << (base + 1)) and
+            not self._attacked_by(base + 2, enemy, occupied) and
+            not self._attacked_by(base + 3, enemy, occupied)):
+            targets |= 1 << (base + 2)
+        return targets
+
+    def _move_causes_check(self, start_row: int, start_col: int, end_row: int, end_col: int) -> bool:
+        # Play the move on occupancy masks only; nothing on the board changes
+        piece = self.board[start_row][start_col]
+        start = start_row * 8 + start_col
+        end = end_row * 8 + end_col
+        captured = 1 << end if self.board[end_row][end_col] else 0
+        if piece.type_code == PAWN and start_col != end_col and not captured:
+            captured = 1 << (start_row * 8 + end_col)  # En passant
+        occupied = (self.occupied & ~(1 << start) & ~captured) | (1 << end)
+
+        if piece.type_code == KING:
+            king_square = end
         else:
-            start_row, start_col = self.selected_square
-            start = f"{chr(start_col + ord('a'))}{8-start_row}"
-            end = f"{chr(col + ord('a'))}{8-row}"
-            
-            if self.game.make_move(start, end):
-                self.update_display()
-                self.update_evaluation()  # Update evaluation after move
-                self.check_game_state()
-                print(f"Player move: {start} to {end}")  # Debug print
-                
-                if self.vs_ai and self.game.current_player == Color.BLACK:
-                    self.window.after(500, self.make_stockfish_move)
-            
-            # Reset selection
-            self.buttons[start_row][start_col].config(bg='white' if (start_row + start_col) % 2 == 0 else 'gray')
-            self.selected_square = None
-
-    def check_game_state(self):
-        if self.game.is_checkmate(self.game.current_player):
-            winner = "Black" if self.game.current_player == Color.WHITE else "White"
-            messagebox.showinfo("Game Over", f"Checkmate! {winner} wins!")
-            if self.self_play:
-                self.self_play = False
-                self.self_play_button.config(text="Self Play")
-        elif self.game.is_stalemate(self.game.current_player):
-            messagebox.showinfo("Game Over", "Stalemate! The game is a draw.")
-            if self.self_play:
-                self.self_play = False
-                self.self_play_button.config(text="Self Play")
-        elif self.game.is_in_check(self.game.current_player):
-            if not self.self_play:  # Don't show check messages during self-play
-                messagebox.showinfo("Check", f"{self.game.current_player.value} is in check!")
-
-    def run(self):
-        self.window.mainloop()
-
-def main():
-    gui = ChessGUI()
-    gui.run()
+            king_row, king_col = self.white_king_pos if piece.color_code == WHITE else self.black_king_pos
+            king_square = king_row * 8 + king_col
+        enemy = Color.BLACK if piece.color_code == WHITE else Color.WHITE
+        return self._attacked_by(king_square, enemy, occupied, captured)
+
+    def _own_squares(self, color: Color):
+        return _iter_bits(self.occupancy[color])
+
+    def _piece_targets(self, row: int, col: int, piece: Piece) -> int:
+        return self._get_targets(row, col, piece, checking_check=True)
+
+    def _find_checks_and_pins(self, color: Color, king_square: int) -> Tuple[int, dict, int]:
+        enemy = Color.BLACK if color == Color.WHITE else Color.WHITE
+        pieces = self.pieces
+        base = BB_PIECE_INDEX[enemy, PieceType.PAWN]
+        check_mask = (BB_PAWN_ATTACKS[color][king_square] & pieces[base] |
+                      BB_KNIGHT_ATTACKS[king_square] & pieces[base + 2])
+        king_danger = 0
+        pins = {}
+
+        queens = pieces[base + 4]
+        for index, direction in enumerate(BB_DIRECTIONS):
+            table = BB_RAYS[direction]
+            ray = table[king_square]
+            sliders = (pieces[base + 1] if index < 4 else pieces[base + 3]) | queens
+            if not ray & sliders:
+                continue
+            positive = direction[0] * 8 + direction[1] > 0
+            blockers = ray & self.occupied
+            first = (blockers & -blockers).bit_length() - 1 if positive else blockers.bit_length() - 1
+            if sliders >> first & 1:
+                check_mask |= ray ^ table[first]
+                king_danger |= BB_RAYS[-direction[0], -direction[1]][king_square]
+            elif self.occupancy[color] >> first & 1:
+                beyond = table[first] & self.occupied
+                if not beyond:
+                    continue
+                second = (beyond & -beyond).bit_length() - 1 if positive else beyond.bit_length() - 1
+                if sliders >> second & 1:
+                    pins[first] = ray ^ table[second]
+        return check_mask, pins, king_danger
+
+BOARD_BACKENDS = {
+    'mailbox': ChessBoard,
+    'bitboard': BitboardChessBoard,
+}
+
+# Reference perft counts (chessprogramming.org "Perft Results"), indexed by depth - 1
+PERFT_POSITIONS = [
+    ("startpos", START_FEN,
+     [20, 400, 8902, 197281, 4865609, 119060324]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     [48, 2039, 97862, 4085603, 193690690]),
+    ("position3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     [14, 191, 2812, 43238, 674624, 11030083]),
+    ("position4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     [6, 264, 9467, 422333, 15833292]),
+    ("position5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     [44, 1486, 62379, 2103487, 89941194]),
+    ("position6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     [46, 2079, 89890, 3894594, 164075551]),
+]
+
+def run_perft(fen: str, depth: int, backend: str = 'bitboard', divide: bool = False) -> int:
+    game = ChessBoard.from_fen(fen, backend)
+    start = time.perf_counter()
+    if divide:
+        counts = game.divide(depth)
+        for move in sorted(counts):
+            print(f"{move}: {counts[move]}")
+        nodes = sum(counts.values())
+    else:
+        nodes = game.perft(depth)
+    elapsed = time.perf_counter() - start
+    print(f"depth {depth}: {nodes} nodes in {elapsed:.3f}s ({nodes / max(elapsed, 1e-9):,.0f} nps)")
+    return nodes
+
+def run_perft_suite(max_depth: int, backend: str = 'bitboard') -> bool:
+    # Check every reference position up to max_depth; True if all counts match
+    passed = True
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen, expected in PERFT_POSITIONS:
+        for depth in range(1, min(max_depth, len(expected)) + 1):
+            game = ChessBoard.from_fen(fen, backend)
+            start = time.perf_counter()
+            nodes = game.perft(depth)
+            elapsed = time.perf_counter() - start
+            total_nodes += nodes
+            total_time += elapsed
+            status = "ok" if nodes == expected[depth - 1] else f"FAIL (expected {expected[depth - 1]})"
+            print(f"{name:<10} depth {depth}: {nodes:>10} {status:<6} {nodes / max(elapsed, 1e-9):>12,.0f} nps")
+            passed = passed and nodes == expected[depth - 1]
+    print(f"{total_nodes} nodes in {total_time:.3f}s ({total_nodes / max(total_time, 1e-9):,.0f} nps) "
+          f"- {'all passed' if passed else 'FAILED'}")
+    return passed
+
+def run_search(fen: str, depth: int, movetime: Optional[int]) -> Optional[str]:
+    # Search with the built-in engine, printing each finished depth
+    from search import BuiltinEngine
+    engine = BuiltinEngine(depth=depth, movetime=movetime)
+    engine.set_fen_position(fen)
+
+    def show(info):
+        score = info['score']
+        score_text = f"mate {score['value']}" if score['type'] == 'mate' else f"cp {score['value']}"
+        print(f"depth {info['depth']:>2}  score {score_text:<9} nodes {info['nodes']:>8} "
+              f"nps {info['nps']:>7,}  time {info['time']:>6}ms  pv {' '.join(info['pv'])}")
+
+    command = f"go depth {depth}" + (f" movetime {movetime}" if movetime else '')
+    best, _, _ = engine.go(command, show)
+    print(f"bestmove {best}")
+    return best
+
+DRAW_MESSAGES = {
+    GameStatus.STALEMATE: "Stalemate!",
+    GameStatus.INSUFFICIENT_MATERIAL: "Insufficient material!",
+    GameStatus.FIFTY_MOVES: "Fifty moves without a capture or pawn move!",
+    GameStatus.REPETITION: "Threefold repetition!",
+}
+
+def run_headless(engine_path: Optional[str] = None, book_path: Optional[str] = None) -> int:
+    # The engine plays itself in the terminal: no window, and no Tk loaded
+    from engine_pool import EngineError, open_engine_pool
+    pool = open_engine_pool(engine_path)
+    book = None
+    if book_path:
+        from polyglot import OpeningBook
+        book = OpeningBook(book_path)
+    game = ChessBoard()
+    start = time.perf_counter()
+    try:
+        with pool.engine() as engine:
+            while not game.status().is_game_over:
+                move = book.choose(game) if book is not None else None
+                if move is None:
+                    engine.set_fen_position(game.to_fen())
+                    best, _, _ = engine.analyse()
+                    move = next((m for m in game.generate_legal_moves() if m.uci() == best), None)
+                    if move is None:
+                        print(f"Engine played an illegal move: {best}", file=sys.stderr)
+                        return 1
+                print(game.variation_san([move.uci()]), flush=True)
+                game.push(move)
+    except EngineError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        pool.close()
+        if book is not None:
+            book.close()
+
+    status = game.status()
+    if status == GameStatus.CHECKMATE:
+        winner = "Black" if game.current_player == Color.WHITE else "White"
+        message = f"Checkmate! {winner} wins!"
+    else:
+        message = f"{DRAW_MESSAGES[status]} The game is a draw."
+    elapsed = time.perf_counter() - start
+    print(f"{message} ({len(game.move_stack)} plies in {elapsed:.1f}s)")
+    return 0
+
+# Modules a batch worker should not pay for when it only needs the rules
+HEAVY_MODULES = ('tkinter', 'gui', 'engine_pool', 'async_engine', 'eval_cache', 'search',
+                 'subprocess', 'concurrent.futures', 'numpy')
+
+def run_startup_benchmark(runs: int, gui: bool = False) -> int:
+    # Cold starts in fresh interpreters: importing the rules core the way a
+    # batch worker does, and with `gui` the window's first frame and a ready
+    # engine, both timed from process start
+    import os
+    import statistics
+    import subprocess
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    def timed(command: List[str]) -> float:
+        start = time.perf_counter()
+        subprocess.run(command, cwd=here, check=True, stdout=subprocess.DEVNULL)
+        return (time.perf_counter() - start) * 1000
+
+    probes = [
+        ("python -c pass", "pass"),
+        ("import chess", "import chess"),
+        ("import chess, legal moves", "import chess; chess.ChessBoard().generate_legal_moves()"),
+    ]
+    for name, code in probes:
+        times = sorted(timed([sys.executable, '-c', code]) for _ in range(runs))
+        print(f"{name:<28} median {statistics.median(times):7.1f}ms   min {times[0]:7.1f}ms")
+    check = f"import chess, sys; print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    loaded = subprocess.run([sys.executable, '-c', check], cwd=here, check=True,
+                            capture_output=True, text=True).stdout.split()
+    print(f"{'heavy modules loaded':<28} {', '.join(loaded) or 'none'}")
+    if not gui:
+        return 1 if loaded else 0
+
+    # The GUI prints 'First frame after ...' and 'Engine ready after ...'
+    # with --timing; the time each line arrives here includes interpreter start
+    events = {}
+    for _ in range(runs):
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, os.path.join(here, 'chess.py'), '--timing',
+                                    '--quit-after-startup'], cwd=here, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.PIPE, text=True)
+        for line in process.stderr:
+            if ' after ' in line:
+                event = line.split(' after ')[0]
+                events.setdefault(event, []).append((time.perf_counter() - start) * 1000)
+        if process.wait() != 0:
+            print("The GUI could not start (no display?)", file=sys.stderr)
+            return 1
+    for event, times in events.items():
+        times.sort()
+        print(f"{event:<28} median {statistics.median(times):7.1f}ms   min {times[0]:7.1f}ms")
+    return 1 if loaded else 0
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Chess with Stockfish")
+    subparsers = parser.add_subparsers(dest='command')
+    perft_parser = subparsers.add_parser(
+        'perft', help="count move-generation nodes headlessly and report nodes per second")
+    perft_parser.add_argument('depth', type=int, nargs='?', default=4)
+    perft_parser.add_argument('--fen', default=START_FEN, help="position to search (default: start position)")
+    perft_parser.add_argument('--divide', action='store_true', help="print the node count under each root move")
+    perft_parser.add_argument('--suite', action='store_true',
+                              help="check the reference positions up to DEPTH instead")
+    perft_parser.add_argument('--backend', choices=sorted(BOARD_BACKENDS), default='bitboard')
+    search_parser = subparsers.add_parser(
+        'search', help="search a position with the built-in engine and report nodes per second")
+    search_parser.add_argument('--fen', default=START_FEN, help="position to search (default: start position)")
+    search_parser.add_argument('--depth', type=int, default=64)
+    search_parser.add_argument('--movetime', type=int, default=5000, help="milliseconds to search (0: no limit)")
+    startup_parser = subparsers.add_parser(
+        'startup', help="time cold starts: importing the rules core and, with --gui, the first frame")
+    startup_parser.add_argument('--runs', type=int, default=10)
+    startup_parser.add_argument('--gui', action='store_true',
+                                help="also time the window's first frame and engine startup")
+    parser.add_argument('--headless', action='store_true',
+                        help="no window: the engine plays itself in the terminal")
+    parser.add_argument('--engine', metavar='PATH',
+                        help="UCI engine (default: $STOCKFISH_PATH, the config file, or stockfish on PATH)")
+    parser.add_argument('--timing', action='store_true',
+                        help="print the time to the first frame and to a ready engine")
+    parser.add_argument('--quit-after-startup', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--eval-cache', metavar='PATH',
+                        help="keep engine evaluations in this file between runs")
+    parser.add_argument('--book', metavar='PATH', help="Polyglot opening book to play from")
+    parser.add_argument('--analysis-lines', type=int, default=3, metavar='N',
+                        help="lines of live analysis on your turn (0: one fixed-depth evaluation)")
+    parser.add_argument('--no-ponder', dest='ponder', action='store_false',
+                        help="don't let the engine think on your time in VS AI games")
+    stats_group = parser.add_argument_group("instrumentation (off unless asked for)")
+    stats_group.add_argument('--stats', action='store_true',
+                             help="time the hot paths and print a summary on exit")
+    stats_group.add_argument('--stats-interval', type=float, metavar='SECONDS',
+                             help="also print the summary periodically")
+    stats_group.add_argument('--stats-json', metavar='PATH', help="write the stats as JSON on exit")
+    stats_group.add_argument('--profile', metavar='PATH',
+                             help="run under cProfile (all threads) and save the profile here")
+    args = parser.parse_args(argv)
+
+    if not (args.stats or args.stats_interval or args.stats_json or args.profile):
+        return run_command(args)
+
+    import instrumentation
+    reporter = None
+    if args.stats or args.stats_interval or args.stats_json:
+        # Only a run that opens the window has any GUI to time
+        window = args.command is None and not args.headless
+        instrumentation.enable(instrumentation.default_targets(gui=window))
+        if args.stats_interval:
+            reporter = instrumentation.Reporter(args.stats_interval)
+    try:
+        if args.profile:
+            with instrumentation.profile(args.profile):
+                return run_command(args)
+        return run_command(args)
+    finally:
+        if reporter is not None:
+            reporter.stop()
+        if instrumentation.is_enabled():
+            print(instrumentation.summary(), file=sys.stderr)
+            if args.stats_json:
+                instrumentation.dump(args.stats_json)
+
+def run_command(args: argparse.Namespace) -> int:
+    if args.command == 'perft':
+        if args.suite:
+            return 0 if run_perft_suite(args.depth, args.backend) else 1
+        run_perft(args.fen, args.depth, args.backend, args.divide)
+        return 0
+    if args.command == 'search':
+        run_search(args.fen, args.depth, args.movetime or None)
+        return 0
+    if args.command == 'startup':
+        return run_startup_benchmark(args.runs, args.gui)
+    if args.headless:
+        return run_headless(args.engine, args.book)
+
+    from gui import launch
+    return launch(args, _started)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    # Modules loaded later (gui, search, polyglot, ...) import `chess`;
+    # point them at this module rather than loading a second copy of it
+    sys.modules.setdefault('chess', sys.modules[__name__])
+    sys.exit(main()) 
\ No newline at end of file
@@ -0,0 +1,405 @@
+"""UCI engine processes and a pool that shares them between callers.
+
+UCIEngine speaks UCI to one engine subprocess and offers the calls the GUI
+used from the stockfish wrapper (set_fen_position, get_best_move,
+get_evaluation, ...). EnginePool owns N of them with checkout/return,
+health checks and restart on crash, so the GUI and headless batch jobs can
+share engines and spread work across cores.
+
+find_engine() looks for an engine executable: $STOCKFISH_PATH, then the
+"engine" entry of the config file (~/.chessing.json, or $CHESS_CONFIG),
+then stockfish on PATH. open_engine_pool() starts the one it finds, or the
+built-in engine when there is none.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+import json
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+CONFIG_PATH = os.path.join(os.path.expanduser('~'), '.chessing.json')
+ENGINE_NAMES = ('stockfish',)
+
+# Limits for the built-in engine when no UCI engine is available
+BUILTIN_ENGINE_DEPTH = 64
+BUILTIN_ENGINE_MOVETIME = 1000  # ms
+
+class EngineError(Exception):
+    pass
+
+def parse_info_line(line: str) -> Dict:
+    # 'info depth 12 multipv 1 score cp 31 nodes 1200 pv e2e4 e7e5' ->
+    # {'depth': 12, 'multipv': 1, 'score': {'type': 'cp', 'value': 31}, 'nodes': 1200, 'pv': [...]}
+    tokens = line.split()
+    info = {}
+    i = 1
+    while i < len(tokens):
+        token = tokens[i]
+        if token in ('depth', 'seldepth', 'multipv', 'nodes', 'nps', 'time', 'hashfull', 'tbhits'):
+            try:
+                info[token] = int(tokens[i + 1])
+            except (IndexError, ValueError):
+                pass
+            i += 2
+        elif token == 'score':
+            try:
+                info['score'] = {'type': tokens[i + 1], 'value': int(tokens[i + 2])}
+            except (IndexError, ValueError):
+                pass
+            i += 3
+            # 'lowerbound' / 'upperbound' qualify a score that is still moving
+            while i < len(tokens) and tokens[i] in ('lowerbound', 'upperbound'):
+                info['bound'] = tokens[i]
+                i += 1
+        elif token == 'pv':
+            info['pv'] = tokens[i + 1:]
+            break
+        elif token == 'string':
+            info['string'] = ' '.join(tokens[i + 1:])
+            break
+        else:
+            i += 1
+    return info
+
+class UCIEngine:
+    def __init__(self, path: str, threads: int = 1, hash_mb: int = 16, depth: int = 15,
+                 skill_level: Optional[int] = None, options: Optional[Dict] = None,
+                 timeout: float = 10.0):
+        self.path = path
+        self.depth = depth
+        self.timeout = timeout  # For handshakes and isready, not searches
+        self.name = None
+        self._white_to_move = True
+        self._lines = queue.Queue()
+        self._write_lock = threading.Lock()  # stop() may come from another thread
+        try:
+            self._process = subprocess.Popen(
+                [path], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL, text=True, bufsize=1)
+        except OSError as e:
+            raise EngineError(f"Could not start engine {path!r}: {e}") from e
+        self._reader = threading.Thread(target=self._read_output, daemon=True)
+        self._reader.start()
+
+        try:
+            self._send('uci')
+            while True:
+                line = self._read_line(self.timeout)
+                if line.startswith('id name '):
+                    self.name = line[len('id name '):]
+                elif line == 'uciok':
+                    break
+
+            self.set_option('Threads', threads)
+            self.set_option('Hash', hash_mb)
+            if skill_level is not None:
+                self.set_option('Skill Level', skill_level)
+            for name, value in (options or {}).items():
+                self.set_option(name, value)
+            if not self.ping(self.timeout):
+                raise EngineError(f"Engine {path!r} did not answer isready")
+        except EngineError:
+            # Nobody holds this engine yet, so nobody else would reap it
+            self._process.kill()
+            self._process.wait()
+            raise
+
+    def _read_output(self):
+        for line in self._process.stdout:
+            self._lines.put(line.strip())
+        self._lines.put(None)  # EOF: the process went away
+
+    def _read_line(self, timeout: Optional[float] = None) -> str:
+        try:
+            line = self._lines.get(timeout=timeout)
+        except queue.Empty:
+            raise EngineError(f"Engine {self.path!r} timed out") from None
+        if line is None:
+            self._lines.put(None)  # Keep reporting EOF to later readers
+            raise EngineError(f"Engine {self.path!r} exited (code {self._process.poll()})")
+        return line
+
+    def _send(self, command: str):
+        try:
+            with self._write_lock:
+                self._process.stdin.write(command + '\n')
+                self._process.stdin.flush()
+        except (OSError, ValueError) as e:
+            raise EngineError(f"Engine {self.path!r} is not accepting commands: {e}") from e
+
+    def set_option(self, name: str, value):
+        if isinstance(value, bool):
+            value = 'true' if value else 'false'
+        self._send(f"setoption name {name} value {value}")
+
+    def set_skill_level(self, skill_level: int):
+        self.set_option('Skill Level', skill_level)
+
+    def set_depth(self, depth: int):
+        self.depth = depth
+
+    def new_game(self):
+        self._send('ucinewgame')
+
+    def set_fen_position(self, fen: str, moves: Optional[List[str]] = None):
+        # Moves played since `fen` let the engine see repetitions
+        moves = moves or []
+        self._white_to_move = (fen.split()[1] == 'w') == (len(moves) % 2 == 0)
+        self._send(f"position fen {fen}" + (' moves ' + ' '.join(moves) if moves else ''))
+
+    def set_position(self, moves: Optional[List[str]] = None):
+        moves = moves or []
+        self._white_to_move = len(moves) % 2 == 0
+        self._send('position startpos' + (' moves ' + ' '.join(moves) if moves else ''))
+
+    def go(self, command: str, on_info: Optional[Callable[[Dict], None]] = None,
+           timeout: Optional[float] = None) -> Tuple[Optional[str], Optional[str], Dict]:
+        # Run one search; returns (best move, expected reply, last main-line info).
+        # Without bestmove within `timeout` seconds EngineError is raised, and
+        # the engine, still searching, has to be replaced.
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        self._send(command)
+        info = {}
+        while True:
+            line = self._read_line(max(0.0, deadline - time.monotonic()) if deadline is not None else None)
+            if line.startswith('info '):
+                parsed = parse_info_line(line)
+                if 'score' in parsed and parsed.get('multipv', 1) == 1:
+                    info = parsed
+                if on_info:
+                    on_info(parsed)
+            elif line.startswith('bestmove'):
+                parts = line.split()
+                best = parts[1] if len(parts) > 1 and parts[1] != '(none)' else None
+                ponder = parts[3] if len(parts) > 3 and parts[2] == 'ponder' else None
+                return best, ponder, info
+
+    def analyse(self, depth: Optional[int] = None, on_info: Optional[Callable[[Dict], None]] = None,
+                ponder: bool = False) -> Tuple[Optional[str], Optional[str], Dict]:
+        # One search giving (best move, expected reply, White-relative evaluation).
+        # A ponder search only applies the depth limit after ponderhit().
+        command = "go ponder depth" if ponder else "go depth"
+        best, reply, info = self.go(f"{command} {depth or self.depth}", on_info)
+        return best, reply, self._white_score(info.get('score', {'type': 'cp', 'value': 0}))
+
+    def stop(self):
+        # Ends the current search early; go() still returns its bestmove
+        self._send('stop')
+
+    def ponderhit(self):
+        # The pondered move was played: the running search becomes a normal one
+        self._send('ponderhit')
+
+    def get_best_move(self, depth: Optional[int] = None, movetime: Optional[int] = None) -> Optional[str]:
+        if movetime is not None:
+            best, _, _ = self.go(f"go movetime {movetime}")
+        else:
+            best, _, _ = self.go(f"go depth {depth or self.depth}")
+        return best
+
+    def get_evaluation(self, depth: Optional[int] = None) -> Dict:
+        # {'type': 'cp' | 'mate', 'value': n} from White's point of view
+        _, _, info = self.go(f"go depth {depth or self.depth}")
+        return self._white_score(info.get('score', {'type': 'cp', 'value': 0}))
+
+    def _white_score(self, score: Dict) -> Dict:
+        # UCI scores are from the side to move
+        if self._white_to_move:
+            return dict(score)
+        return {'type': score['type'], 'value': -score['value']}
+
+    def is_alive(self) -> bool:
+        return self._process.poll() is None
+
+    def ping(self, timeout: Optional[float] = None) -> bool:
+        # isready round trip; stray output from an earlier search is skipped
+        try:
+            self._send('isready')
+            while self._read_line(timeout) != 'readyok':
+                pass
+            return True
+        except EngineError:
+            return False
+
+    def quit(self):
+        if self.is_alive():
+            try:
+                self._send('quit')
+                self._process.wait(timeout=1)
+            except (EngineError, subprocess.TimeoutExpired):
+                self._process.kill()
+                self._process.wait()
+        for stream in (self._process.stdin, self._process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+def find_engine(config_path: Optional[str] = None) -> Optional[str]:
+    # Path of the UCI engine to use, or None if there is none to be found
+    path = os.environ.get('STOCKFISH_PATH')
+    if path:
+        return path
+    config_path = config_path or os.environ.get('CHESS_CONFIG', CONFIG_PATH)
+    try:
+        with open(config_path, encoding='utf-8') as f:
+            path = json.load(f).get('engine')
+    except (OSError, ValueError, AttributeError):
+        path = None
+    if path:
+        return os.path.expanduser(path)
+    for name in ENGINE_NAMES:
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+class EnginePool:
+    def __init__(self, path: str, size: int = 1, threads: int = 1, hash_mb: int = 16,
+                 depth: int = 15, skill_level: Optional[int] = None,
+                 engine_factory: Optional[Callable[[], UCIEngine]] = None,
+                 health_timeout: float = 5.0):
+        # engine_factory overrides how engines are started (e.g. different
+        # options per pool); by default every engine gets the same settings
+        self.path = path
+        self.size = size
+        self.depth = depth
+        self.health_timeout = health_timeout
+        self.restarts = 0
+        self._factory = engine_factory or (lambda: UCIEngine(
+            path, threads=threads, hash_mb=hash_mb, depth=depth, skill_level=skill_level))
+        self._idle = queue.Queue()
+        self._executor = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self._engines = []
+        try:
+            for _ in range(size):
+                engine = self._factory()
+                self._engines.append(engine)
+                self._idle.put(engine)
+        except EngineError:
+            self.close()
+            raise
+
+    def checkout(self, timeout: Optional[float] = None) -> UCIEngine:
+        # Take an engine for exclusive use; blocks until one is free
+        if self._closed:
+            raise EngineError("Engine pool is closed")
+        try:
+            engine = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise EngineError("No engine became free in time") from None
+        if not engine.is_alive():
+            try:
+                engine = self._restart(engine)
+            except EngineError:
+                self._idle.put(engine)  # Try again on the next checkout
+                raise
+        return engine
+
+    def checkin(self, engine: UCIEngine, healthy: bool = True):
+        # Hand an engine back; one that failed mid-request is replaced first
+        if self._closed:
+            engine.quit()
+            return
+        if not healthy or not engine.is_alive():
+            try:
+                engine = self._restart(engine)
+            except EngineError as e:
+                print(f"Could not restart engine: {e}", file=sys.stderr)
+        self._idle.put(engine)
+
+    @contextmanager
+    def engine(self, timeout: Optional[float] = None):
+        engine = self.checkout(timeout)
+        healthy = True
+        try:
+            yield engine
+        except BaseException:
+            # Whatever interrupted it (an engine failure, an on_info callback
+            # raising, Ctrl-C), the engine may still be searching, and its
+            # bestmove would answer the next caller's go
+            healthy = False
+            raise
+        finally:
+            self.checkin(engine, healthy)
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        # Run fn(engine, *args, **kwargs) on a pool thread with its own engine
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix='engine')
+        return self._executor.submit(self._run, fn, *args, **kwargs)
+
+    def _run(self, fn: Callable, *args, **kwargs):
+        with self.engine() as engine:
+            return fn(engine, *args, **kwargs)
+
+    def health_check(self) -> int:
+        # Ping every idle engine and restart the ones that fail; returns the
+        # number restarted. Engines checked out right now are left alone.
+        idle = []
+        while True:
+            try:
+                idle.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        restarted = 0
+        for engine in idle:
+            if not engine.is_alive() or not engine.ping(self.health_timeout):
+                try:
+                    engine = self._restart(engine)
+                    restarted += 1
+                except EngineError as e:
+                    print(f"Could not restart engine: {e}", file=sys.stderr)
+            self._idle.put(engine)
+        return restarted
+
+    def _restart(self, engine: UCIEngine) -> UCIEngine:
+        engine.quit()
+        replacement = self._factory()
+        with self._lock:
+            self._engines = [replacement if e is engine else e for e in self._engines]
+            self.restarts += 1
+        return replacement
+
+    def close(self):
+        self._closed = True
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        for engine in self._engines:
+            engine.quit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def open_engine_pool(path: Optional[str] = None, size: int = 1, depth: int = 15,
+                     skill_level: Optional[int] = 20) -> EnginePool:
+    # A pool of the engine at `path` (found with find_engine() if not given),
+    # falling back to the built-in engine so callers always get one. Starting
+    # an engine takes a while; the GUI calls this off the Tk thread.
+    path = path or find_engine()
+    if path is not None:
+        try:
+            pool = EnginePool(path, size=size, depth=depth, skill_level=skill_level)
+            print(f"Using the engine at {path}", file=sys.stderr)
+            return pool
+        except EngineError as e:
+            print(f"Error starting engine: {e}", file=sys.stderr)
+    else:
+        print("No UCI engine found (set STOCKFISH_PATH, add one to PATH or to the config file)",
+              file=sys.stderr)
+    from search import BuiltinEngine
+    print("Using the built-in engine instead", file=sys.stderr)
+    return EnginePool('builtin', size=size, depth=BUILTIN_ENGINE_DEPTH,
+                      engine_factory=lambda: BuiltinEngine(movetime=BUILTIN_ENGINE_MOVETIME))
@@ -0,0 +1,105 @@
+"""Bounded LRU cache of engine evaluations, keyed by position and depth.
+
+Positions are normalised to the first four FEN fields, so the same position
+reached at a different move number shares an entry; the en passant square
+only counts when a capture on it is possible. The cache can be saved
+to and reloaded from a JSON file, so it survives restarts. Values are the
+White-relative score dicts the engines return, plus the engine's best move
+under 'best' when it is known.
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import json
+import os
+import sys
+import threading
+
+def normalize_fen(fen: str) -> str:
+    # Placement, side to move, castling and en passant; the move clocks do
+    # not change what the engine thinks of the position. An en passant
+    # square no pawn can take on is dropped, as in the Polyglot key, so
+    # 1. e4 and a transposition into the same position share an entry.
+    fields = fen.split()[:4]
+    if len(fields) == 4 and fields[3] != '-' and not _en_passant_possible(fields):
+        fields[3] = '-'
+    return ' '.join(fields)
+
+def _en_passant_possible(fields: List[str]) -> bool:
+    # Does a pawn of the side to move stand next to the one that just
+    # advanced two squares? Anything malformed keeps its square.
+    placement, side, _, square = fields
+    ranks = placement.split('/')
+    if len(ranks) != 8 or len(square) != 2 or square[0] not in 'abcdefgh':
+        return True
+    # White captures from the fifth rank, Black from the fourth
+    rank, pawn = (ranks[3], 'P') if side == 'w' else (ranks[4], 'p')
+    squares = ''.join('.' * int(symbol) if symbol.isdigit() else symbol for symbol in rank)
+    col = ord(square[0]) - ord('a')
+    return any(0 <= c < len(squares) and squares[c] == pawn for c in (col - 1, col + 1))
+
+class EvaluationCache:
+    def __init__(self, max_entries: int = 100_000, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (normalised FEN, depth) -> evaluation
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def get(self, fen: str, depth: int) -> Optional[Dict]:
+        key = (normalize_fen(fen), depth)
+        with self._lock:
+            evaluation = self._entries.get(key)
+            if evaluation is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(evaluation)
+
+    def put(self, fen: str, depth: int, evaluation: Dict):
+        key = (normalize_fen(fen), depth)
+        with self._lock:
+            self._entries[key] = dict(evaluation)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)  # Least recently used
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def load(self, path: str):
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            entries = data.get('entries', []) if isinstance(data, dict) else None
+            # Checked up front, so a damaged file loads nothing rather than half
+            if not isinstance(entries, list) or not all(
+                    isinstance(entry, list) and len(entry) == 3 and isinstance(entry[0], str)
+                    and isinstance(entry[1], int) and isinstance(entry[2], dict) for entry in entries):
+                raise ValueError("not an evaluation cache file")
+        except (OSError, ValueError) as e:
+            print(f"Could not read evaluation cache {path}: {e}", file=sys.stderr)
+            return
+        with self._lock:
+            # Saved oldest first, so replaying keeps the LRU order
+            for position, depth, evaluation in entries:
+                self._entries[position, depth] = evaluation
+                self._entries.move_to_end((position, depth))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def save(self, path: Optional[str] = None):
+        path = path or self.path
+        if not path:
+            return
+        with self._lock:
+            entries = [[position, depth, evaluation]
+                       for (position, depth), evaluation in self._entries.items()]
+        # Write then rename, so a crash mid-save leaves the old file intact
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'entries': entries}, f)
+        os.replace(tmp_path, path)
@@ -0,0 +1,731 @@
+"""Asyncio game server hosting many ChessBoard games in one process.
+
+Clients speak JSON, one object per message, either as lines over plain TCP
+or as text frames over WebSocket; both are served on the same port (a
+connection that opens with an HTTP GET is upgraded). Every request may carry
+an "id", which is echoed in its response so requests can be pipelined.
+
+    {"op": "new", "engine": "black"}             -> {"game": 1, "fen": ..., "legal": [...]}
+    {"op": "move", "game": 1, "move": "e2e4"}    -> the move, then the engine's reply
+    {"op": "go", "game": 1}                      -> the engine moves for the side to move
+    {"op": "state", "game": 1}
+    {"op": "close", "game": 1}
+    {"op": "stats"} / {"op": "stats", "game": 1} -> latency histograms
+
+Moves are UCI or SAN. A game belongs to the connection that created it:
+other connections cannot see it, and it is closed when its owner goes
+away. Engine searches from all games share one EnginePool through
+EngineScheduler: pending searches are queued per connection and served
+round-robin, so one busy client cannot starve the rest. The total queue,
+each connection's requests in flight and its number of games are bounded
+too, so a flood of requests slows its sender (TCP backpressure) instead of
+growing memory, and no one connection can take every game slot.
+
+    python game_server.py serve --engine stockfish --workers 4 --depth 8
+    python game_server.py load --connections 16 --games 512 --duration 30
+
+`load` is the load generator: it plays random moves in many games at once
+and reports moves per second and the latency percentiles it saw.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import struct
+import sys
+import time
+
+from chess import ChessBoard, Color, GameStatus
+from instrumentation import Histogram
+
+DEFAULT_PORT = 8765
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+MAX_MESSAGE = 1 << 20
+
+class ProtocolError(Exception):
+    pass
+
+# Transports: both give recv() -> str or None at EOF, and send(str)
+
+class _BatchedWriter:
+    # Everything sent during one pass of the event loop goes out in a single
+    # write, instead of one system call per response
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self._buffer = []
+
+    async def send_bytes(self, data: bytes):
+        if not self._buffer:
+            asyncio.get_running_loop().call_soon(self._flush)
+        self._buffer.append(data)
+        await self.writer.drain()
+
+    def _flush(self):
+        if self._buffer and not self.writer.is_closing():
+            self.writer.write(b''.join(self._buffer))
+        self._buffer.clear()
+
+class LineChannel(_BatchedWriter):
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 first: bytes = b''):
+        super().__init__(writer)
+        self.reader = reader
+        self._first = first
+
+    async def recv(self) -> Optional[str]:
+        while True:
+            if self._first:
+                line, self._first = self._first, b''
+            else:
+                line = await self.reader.readline()
+                if not line:
+                    return None
+            line = line.strip()
+            if line:
+                return line.decode('utf-8')
+
+    async def send(self, text: str):
+        await self.send_bytes(text.encode('utf-8') + b'\n')
+
+    async def close(self):
+        self._flush()
+        self.writer.close()
+
+def _xor_mask(payload: bytes, mask: bytes) -> bytes:
+    # Whole-payload XOR with the repeated 4-byte key, as one big int
+    if not payload:
+        return payload
+    key = (mask * (len(payload) // 4 + 1))[:len(payload)]
+    return (int.from_bytes(payload, 'big') ^ int.from_bytes(key, 'big')).to_bytes(len(payload), 'big')
+
+def _frame(opcode: int, payload: bytes, masked: bool) -> bytes:
+    # Servers send unmasked frames, clients masked ones (RFC 6455)
+    length = len(payload)
+    mask_bit = 0x80 if masked else 0
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, mask_bit | length)
+    elif length < 1 << 16:
+        header = struct.pack('!BBH', 0x80 | opcode, mask_bit | 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, mask_bit | 127, length)
+    if masked:
+        mask = os.urandom(4)
+        return header + mask + _xor_mask(payload, mask)
+    return header + payload
+
+class WebSocketChannel(_BatchedWriter):
+    # Text and control frames of RFC 6455; fragmented messages are joined
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, client: bool = False):
+        super().__init__(writer)
+        self.reader = reader
+        self.client = client
+        self.closed = False
+
+    async def recv(self) -> Optional[str]:
+        parts = []
+        size = 0  # Of the message so far, over all its fragments
+        while True:
+            try:
+                head = await self.reader.readexactly(2)
+                fin, opcode = head[0] & 0x80, head[0] & 0x0F
+                # Clients must mask every frame and servers none
+                if bool(head[1] & 0x80) == self.client:
+                    raise ProtocolError("unmasked client frame" if not self.client else "masked server frame")
+                length = head[1] & 0x7F
+                if length == 126:
+                    length, = struct.unpack('!H', await self.reader.readexactly(2))
+                elif length == 127:
+                    length, = struct.unpack('!Q', await self.reader.readexactly(8))
+                if (length if opcode & 0x8 else size + length) > MAX_MESSAGE:
+                    raise ProtocolError("message too large")
+                mask = await self.reader.readexactly(4) if head[1] & 0x80 else None
+                payload = await self.reader.readexactly(length)
+            except asyncio.IncompleteReadError:
+                return None
+            if mask:
+                payload = _xor_mask(payload, mask)
+            # Control frames are written at once, after anything still buffered
+            if opcode == 0x8:
+                if not self.closed:
+                    self.closed = True
+                    self._flush()
+                    self.writer.write(_frame(0x8, payload[:2], self.client))
+                return None
+            if opcode == 0x9:
+                self._flush()
+                self.writer.write(_frame(0xA, payload, self.client))
+                continue
+            if opcode == 0xA:
+                continue
+            parts.append(payload)
+            size += length
+            if fin:
+                return b''.join(parts).decode('utf-8')
+
+    async def send(self, text: str):
+        await self.send_bytes(_frame(0x1, text.encode('utf-8'), self.client))
+
+    async def close(self):
+        self._flush()
+        if not self.closed:
+            self.closed = True
+            self.writer.write(_frame(0x8, struct.pack('!H', 1000), self.client))
+        self.writer.close()
+
+async def _read_headers(reader: asyncio.StreamReader) -> Dict[str, str]:
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if not line or line in (b'\r\n', b'\n'):
+            return headers
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+def _accept_key(key: str) -> str:
+    return base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+
+async def _upgrade(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> Optional[WebSocketChannel]:
+    # Server side of the handshake; the request line has been read already
+    headers = await _read_headers(reader)
+    key = headers.get('sec-websocket-key')
+    if not key or 'websocket' not in headers.get('upgrade', '').lower():
+        writer.write(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n')
+        writer.close()
+        return None
+    writer.write(('HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                  f'Sec-WebSocket-Accept: {_accept_key(key)}\r\n\r\n').encode())
+    await writer.drain()
+    return WebSocketChannel(reader, writer)
+
+async def connect(host: str, port: int, websocket: bool = False):
+    # A client channel to the server
+    reader, writer = await asyncio.open_connection(host, port, limit=MAX_MESSAGE)
+    if not websocket:
+        return LineChannel(reader, writer)
+    key = base64.b64encode(os.urandom(16)).decode()
+    writer.write((f'GET / HTTP/1.1\r\nHost: {host}:{port}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                  f'Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n').encode())
+    status = await reader.readline()
+    headers = await _read_headers(reader)
+    if b' 101 ' not in status or headers.get('sec-websocket-accept') != _accept_key(key):
+        writer.close()
+        raise ProtocolError(f"WebSocket handshake failed: {status.decode('latin-1').strip()}")
+    return WebSocketChannel(reader, writer, client=True)
+
+# Engine scheduling
+
+class EngineScheduler:
+    def __init__(self, pool, depth: Optional[int] = None, movetime: Optional[int] = None,
+                 max_pending: int = 1024, search_timeout: Optional[float] = 60.0):
+        self.pool = pool
+        self.command = f"go movetime {movetime}" if movetime else f"go depth {depth or pool.depth}"
+        self.max_pending = max_pending
+        # A hung engine is given up on (and restarted) after this long, rather
+        # than holding a worker for good
+        self.search_timeout = search_timeout
+        self.pending = 0
+        self._queues: Dict[object, deque] = {}  # owner -> searches waiting
+        self._ready = deque()  # Owners with searches waiting, in serving order
+        self._changed = asyncio.Condition()
+        self._workers = []
+        self._executor = None
+        self.queue_wait = Histogram()
+        self.search_time = Histogram()
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        self._executor = ThreadPoolExecutor(max_workers=self.pool.size, thread_name_prefix='engine')
+        self._workers = [loop.create_task(self._work()) for _ in range(self.pool.size)]
+
+    async def search(self, owner: object, fen: str) -> Tuple[Optional[str], Dict]:
+        # (best move, score for the side to move); waits while the queue is full
+        future = asyncio.get_running_loop().create_future()
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.pending < self.max_pending)
+            queue = self._queues.get(owner)
+            if queue is None:
+                queue = self._queues[owner] = deque()
+                self._ready.append(owner)
+            queue.append((fen, future, time.perf_counter()))
+            self.pending += 1
+            self._changed.notify_all()
+        return await future
+
+    async def _next(self):
+        async with self._changed:
+            await self._changed.wait_for(lambda: self._ready)
+            owner = self._ready.popleft()
+            queue = self._queues[owner]
+            job = queue.popleft()
+            if queue:
+                self._ready.append(owner)  # Back of the line: round robin
+            else:
+                del self._queues[owner]
+            self.pending -= 1
+            self._changed.notify_all()
+        return job
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            fen, future, queued = await self._next()
+            if future.done():
+                continue  # Its connection went away
+            self.queue_wait.add(time.perf_counter() - queued)
+            start = time.perf_counter()
+            try:
+                result = await loop.run_in_executor(self._executor, self._search, fen)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            self.search_time.add(time.perf_counter() - start)
+            if not future.done():
+                future.set_result(result)
+
+    def _search(self, fen: str):
+        # On an executor thread, with an engine to itself
+        with self.pool.engine() as engine:
+            engine.set_fen_position(fen)
+            best, _, info = engine.go(self.command, timeout=self.search_timeout)
+        return best, info.get('score', {'type': 'cp', 'value': 0})
+
+    def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+# Games
+
+def percentile(samples: List[float], fraction: float) -> float:
+    # Exact, from sorted samples
+    if not samples:
+        return 0.0
+    return samples[min(int(fraction * len(samples)), len(samples) - 1)]
+
+def histogram_stats(histogram: Histogram) -> Dict:
+    # Histogram percentiles are the upper bounds of power-of-two buckets, up
+    # to 2x the true value, so they are reported under names that say so
+    stats = histogram.as_dict()
+    stats['p50_bound_us'] = stats.pop('p50_us')
+    stats['p99_bound_us'] = stats.pop('p99_us')
+    return stats
+
+class Game:
+    __slots__ = ('id', 'board', 'engine_side', 'lock', 'latencies', 'moves', 'created')
+
+    def __init__(self, game_id: int, board: ChessBoard, engine_side: Optional[Color]):
+        self.id = game_id
+        self.board = board
+        self.engine_side = engine_side
+        self.lock = asyncio.Lock()  # One request at a time changes the board
+        self.latencies = []  # Server time of each move request, engine included
+        self.moves = 0
+        self.created = time.perf_counter()
+
+    def result(self) -> Optional[str]:
+        status = self.board.status()
+        if status == GameStatus.CHECKMATE:
+            return '0-1' if self.board.current_player == Color.WHITE else '1-0'
+        if status.is_draw:
+            return '1/2-1/2'
+        return None
+
+    def state(self) -> Dict:
+        return {
+            'game': self.id,
+            'fen': self.board.to_fen(),
+            'status': self.board.status().value,
+            'result': self.result(),
+            'legal': [move.uci() for move in self.board.generate_legal_moves()],
+        }
+
+    def metrics(self) -> Dict:
+        # A game makes few requests, so its percentiles come from every sample
+        latencies = sorted(self.latencies)
+        return {
+            'moves': self.moves,
+            'requests': len(latencies),
+            'mean_ms': sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+            'p50_ms': percentile(latencies, 0.5) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'max_ms': percentile(latencies, 1.0) * 1000,
+        }
+
+class Session:
+    # One connection: the games it created, and its place in the engine queue
+    __slots__ = ('games',)
+
+    def __init__(self):
+        self.games = set()
+
+SIDES = {'white': Color.WHITE, 'black': Color.BLACK, None: None, 'none': None}
+
+class GameServer:
+    def __init__(self, scheduler: Optional[EngineScheduler], max_games: int = 10000,
+                 max_in_flight: int = 64, max_games_per_connection: int = 1000):
+        self.scheduler = scheduler
+        self.max_games = max_games
+        self.max_in_flight = max_in_flight
+        self.max_games_per_connection = max_games_per_connection
+        self.games: Dict[int, Game] = {}
+        self.next_id = 1
+        self.connections = 0
+        self.requests: Dict[str, Histogram] = {}  # op -> server time
+        self.started = time.perf_counter()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            first = await reader.readline()
+            if first.startswith(b'GET '):
+                channel = await _upgrade(reader, writer)
+            else:
+                channel = LineChannel(reader, writer, first)
+        except (ConnectionError, ValueError):
+            # An over-long first line or header, or a peer that went away
+            channel = None
+        if channel is None:
+            writer.close()
+            return
+        self.connections += 1
+        session = Session()
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        tasks = set()
+        try:
+            while True:
+                # Past max_in_flight the connection is not read from at all
+                await in_flight.acquire()
+                try:
+                    text = await channel.recv()
+                except (ConnectionError, ProtocolError, UnicodeDecodeError, ValueError):
+                    text = None
+                if text is None:
+                    in_flight.release()
+                    break
+                task = asyncio.create_task(self._respond(channel, text, session, in_flight))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            self.connections -= 1
+            for task in tasks:
+                task.cancel()
+            for game_id in session.games:
+                self.games.pop(game_id, None)
+            try:
+                await channel.close()
+            except ConnectionError:
+                pass
+
+    async def _respond(self, channel, text: str, session: Session, in_flight: asyncio.Semaphore):
+        start = time.perf_counter()
+        request_id = None
+        op = None
+        try:
+            request = json.loads(text)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+            request_id = request.get('id')
+            op = request.get('op')
+            handler = self.OPS.get(op)
+            if handler is None:
+                raise ValueError(f"unknown op {op!r}")
+            response = await handler(self, request, session)
+        except (ValueError, KeyError, TypeError) as e:
+            response = {'error': str(e)}
+        except Exception as e:
+            response = {'error': f"{type(e).__name__}: {e}"}
+        elapsed = time.perf_counter() - start
+        if op in self.OPS:
+            histogram = self.requests.get(op)
+            if histogram is None:
+                histogram = self.requests[op] = Histogram()
+            histogram.add(elapsed)
+        if request_id is not None:
+            response['id'] = request_id
+        response['server_ms'] = round(elapsed * 1000, 3)
+        try:
+            await channel.send(json.dumps(response))
+        except ConnectionError:
+            pass
+        finally:
+            in_flight.release()
+
+    def _game(self, request: Dict, session: Session) -> Game:
+        # Only the connection that created a game may see or change it
+        game_id = request.get('game')
+        game = self.games.get(game_id) if game_id in session.games else None
+        if game is None:
+            raise ValueError(f"no game {game_id!r}")
+        return game
+
+    async def op_new(self, request: Dict, session: Session) -> Dict:
+        if len(self.games) >= self.max_games:
+            raise ValueError(f"server is full ({self.max_games} games)")
+        if len(session.games) >= self.max_games_per_connection:
+            raise ValueError(f"too many games on this connection ({self.max_games_per_connection})")
+        engine_side = SIDES[request.get('engine')]
+        if engine_side is not None and self.scheduler is None:
+            raise ValueError("this server has no engine")
+        board = ChessBoard.from_fen(request['fen'], 'bitboard') if request.get('fen') else ChessBoard('bitboard')
+        game = Game(self.next_id, board, engine_side)
+        self.next_id += 1
+        self.games[game.id] = game
+        session.games.add(game.id)
+        async with game.lock:
+            played = await self._engine_turns(game, session)
+        return dict(game.state(), played=played)
+
+    async def op_move(self, request: Dict, session: Session) -> Dict:
+        game = self._game(request, session)
+        start = time.perf_counter()
+        async with game.lock:
+            board = game.board
+            if board.status().is_game_over:
+                raise ValueError("the game is over")
+            text = request['move']
+            move = next((m for m in board.generate_legal_moves() if m.uci() == text), None)
+            if move is None:
+                move = board.parse_san(text)
+            played = [{'uci': move.uci(), 'san': board.san(move)}]
+            board.push(move)
+            game.moves += 1
+            played += await self._engine_turns(game, session)
+        game.latencies.append(time.perf_counter() - start)
+        return dict(game.state(), played=played)
+
+    async def op_go(self, request: Dict, session: Session) -> Dict:
+        # The engine moves once for whichever side is to move
+        game = self._game(request, session)
+        if self.scheduler is None:
+            raise ValueError("this server has no engine")
+        start = time.perf_counter()
+        async with game.lock:
+            played = [await self._engine_move(game, session)] if not game.board.status().is_game_over else []
+        game.latencies.append(time.perf_counter() - start)
+        return dict(game.state(), played=played)
+
+    async def _engine_turns(self, game: Game, session: Session) -> List[Dict]:
+        played = []
+        while (game.engine_side is not None and game.board.current_player == game.engine_side
+               and not game.board.status().is_game_over):
+            played.append(await self._engine_move(game, session))
+        return played
+
+    async def _engine_move(self, game: Game, session: Session) -> Dict:
+        board = game.board
+        best, score = await self.scheduler.search(session, board.to_fen())
+        move = next((m for m in board.generate_legal_moves() if m.uci() == best), None)
+        if move is None:
+            raise ValueError(f"engine played an illegal move: {best}")
+        played = {'uci': best, 'san': board.san(move), 'score': score}
+        board.push(move)
+        game.moves += 1
+        return played
+
+    async def op_state(self, request: Dict, session: Session) -> Dict:
+        return self._game(request, session).state()
+
+    async def op_close(self, request: Dict, session: Session) -> Dict:
+        game = self._game(request, session)
+        del self.games[game.id]
+        session.games.discard(game.id)
+        return {'game': game.id, 'closed': True, **game.metrics()}
+
+    async def op_stats(self, request: Dict, session: Session) -> Dict:
+        if request.get('game') is not None:
+            return {'game': request['game'], **self._game(request, session).metrics()}
+        stats = {
+            'uptime_s': time.perf_counter() - self.started,
+            'games': len(self.games),
+            'connections': self.connections,
+            'requests': {op: histogram_stats(histogram) for op, histogram in self.requests.items()},
+        }
+        if self.scheduler is not None:
+            stats['engine'] = {
+                'workers': self.scheduler.pool.size,
+                'pending': self.scheduler.pending,
+                'queue_wait': histogram_stats(self.scheduler.queue_wait),
+                'search': histogram_stats(self.scheduler.search_time),
+            }
+        if request.get('games'):
+            stats['per_game'] = {game_id: self.games[game_id].metrics() for game_id in session.games}
+        return stats
+
+    OPS = {
+        'new': op_new,
+        'move': op_move,
+        'go': op_go,
+        'state': op_state,
+        'close': op_close,
+        'stats': op_stats,
+    }
+
+async def serve(host: str, port: int, server: GameServer):
+    if server.scheduler is not None:
+        server.scheduler.start()
+    listener = await asyncio.start_server(server.handle_connection, host, port, limit=MAX_MESSAGE,
+                                          backlog=4096)
+    addresses = ', '.join(str(sock.getsockname()) for sock in listener.sockets)
+    print(f"Serving games on {addresses} (JSON lines or WebSocket)", file=sys.stderr, flush=True)
+    async with listener:
+        await listener.serve_forever()
+
+# Load generator
+
+class Client:
+    # One connection with any number of requests in flight, matched by id
+    def __init__(self, channel):
+        self.channel = channel
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.next_id = 0
+        self.reader = asyncio.create_task(self._read())
+
+    async def _read(self):
+        while True:
+            text = await self.channel.recv()
+            if text is None:
+                break
+            response = json.loads(text)
+            future = self.pending.pop(response.get('id'), None)
+            if future is not None and not future.done():
+                future.set_result(response)
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("server closed the connection"))
+
+    async def request(self, **request) -> Dict:
+        self.next_id += 1
+        request['id'] = self.next_id
+        future = self.pending[self.next_id] = asyncio.get_running_loop().create_future()
+        await self.channel.send(json.dumps(request))
+        return await future
+
+    async def close(self):
+        await self.channel.close()
+        self.reader.cancel()
+
+async def _play(client: Client, engine: Optional[str], deadline: float, max_plies: int,
+                rng: random.Random, totals: Dict, latencies: List[float]):
+    while time.perf_counter() < deadline:
+        state = await client.request(op='new', engine=engine)
+        if 'error' in state:
+            totals['errors'] += 1
+            return
+        totals['games'] += 1
+        game = state['game']
+        plies = len(state['played'])
+        while state['legal'] and state['result'] is None and plies < max_plies:
+            if time.perf_counter() >= deadline:
+                break
+            start = time.perf_counter()
+            state = await client.request(op='move', game=game, move=rng.choice(state['legal']))
+            if 'error' in state:
+                totals['errors'] += 1
+                break
+            latencies.append(time.perf_counter() - start)
+            totals['requests'] += 1
+            totals['moves'] += len(state['played'])
+            plies += len(state['played'])
+        await client.request(op='close', game=game)
+
+async def run_load(host: str, port: int, connections: int, games: int, duration: float,
+                   engine: Optional[str], websocket: bool, max_plies: int, seed: int) -> Dict:
+    clients = [Client(await connect(host, port, websocket)) for _ in range(connections)]
+    totals = {'games': 0, 'requests': 0, 'moves': 0, 'errors': 0}
+    latencies = []
+    start = time.perf_counter()
+    deadline = start + duration
+    rng = random.Random(seed)
+    players = [_play(clients[i % connections], engine, deadline, max_plies,
+                     random.Random(rng.getrandbits(64)), totals, latencies) for i in range(games)]
+    await asyncio.gather(*players)
+    elapsed = time.perf_counter() - start
+    server_stats = await clients[0].request(op='stats')
+    for client in clients:
+        await client.close()
+    latencies.sort()
+    return {
+        'elapsed_s': elapsed,
+        **totals,
+        'moves_per_s': totals['moves'] / elapsed,
+        'requests_per_s': totals['requests'] / elapsed,
+        'latency_ms': {name: percentile(latencies, fraction) * 1000
+                       for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0))},
+        'server': server_stats,
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Host many concurrent games over JSON, and load-test it")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    serve_parser = subparsers.add_parser('serve', help="run the game server")
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument('--engine', metavar='PATH',
+                              help="UCI engine (default: $STOCKFISH_PATH, the config file or stockfish on PATH)")
+    serve_parser.add_argument('--no-engine', action='store_true', help="games between clients only")
+    serve_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                              help="engine processes shared by all games")
+    serve_parser.add_argument('--depth', type=int, default=8)
+    serve_parser.add_argument('--movetime', type=int, help="milliseconds per engine move (overrides --depth)")
+    serve_parser.add_argument('--max-games', type=int, default=10000)
+    serve_parser.add_argument('--search-timeout', type=float, default=60.0,
+                              help="seconds before an engine that has not answered is restarted")
+    serve_parser.add_argument('--max-pending', type=int, default=1024,
+                              help="engine searches queued before requests have to wait")
+    serve_parser.add_argument('--max-in-flight', type=int, default=64,
+                              help="requests per connection handled at once before it is no longer read")
+    serve_parser.add_argument('--max-games-per-connection', type=int, default=1000)
+    load_parser = subparsers.add_parser('load', help="play random moves in many games and report throughput")
+    load_parser.add_argument('--host', default='127.0.0.1')
+    load_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    load_parser.add_argument('--connections', type=int, default=8)
+    load_parser.add_argument('--games', type=int, default=256, help="games played at once")
+    load_parser.add_argument('--duration', type=float, default=10.0, help="seconds")
+    load_parser.add_argument('--engine', choices=['white', 'black', 'none'], default='black',
+                             help="side the server's engine plays (none: random moves for both)")
+    load_parser.add_argument('--websocket', action='store_true')
+    load_parser.add_argument('--max-plies', type=int, default=200)
+    load_parser.add_argument('--seed', type=int, default=0)
+    load_parser.add_argument('--json', action='store_true', help="print the full report as JSON")
+    args = parser.parse_args(argv)
+
+    if args.command == 'load':
+        engine = None if args.engine == 'none' else args.engine
+        report = asyncio.run(run_load(args.host, args.port, args.connections, args.games, args.duration,
+                                      engine, args.websocket, args.max_plies, args.seed))
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            latency = report['latency_ms']
+            print(f"{report['games']} games, {report['requests']} move requests, {report['moves']} moves "
+                  f"in {report['elapsed_s']:.1f}s: {report['moves_per_s']:,.0f} moves/s, "
+                  f"{report['requests_per_s']:,.0f} requests/s, {report['errors']} errors")
+            print(f"latency p50 {latency['p50']:.2f}ms  p90 {latency['p90']:.2f}ms  "
+                  f"p99 {latency['p99']:.2f}ms  max {latency['max']:.2f}ms")
+        return 1 if report['errors'] else 0
+
+    scheduler = None
+    if not args.no_engine:
+        from engine_pool import open_engine_pool
+        pool = open_engine_pool(args.engine, size=args.workers, depth=args.depth, skill_level=None)
+        scheduler = EngineScheduler(pool, args.depth, args.movetime, args.max_pending, args.search_timeout)
+    server = GameServer(scheduler, args.max_games, args.max_in_flight, args.max_games_per_connection)
+    try:
+        asyncio.run(serve(args.host, args.port, server))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if scheduler is not None:
+            scheduler.stop()
+            scheduler.pool.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
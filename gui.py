@@ -0,0 +1,534 @@
+"""Tk front end: the board, eval bar and analysis display, and the engine modes.
+
+Only this module needs tkinter. The rules in chess.py import without it, so
+headless workers never load Tk or start an engine; `python chess.py` loads
+this module when it opens a window. The window is drawn before any engine
+is looked for: find_engine() and the engine's own startup run on a thread,
+and the AI modes wait for it.
+
+The board is one Canvas whose squares and pieces are created once
+(BoardCanvas); a move only touches the squares it changed, and the eval
+bar only moves its rectangles. Redraws requested between two display
+frames are coalesced into one.
+"""
+from typing import Optional
+import queue
+import sys
+import threading
+import time
+import tkinter as tk
+from tkinter import messagebox
+
+from async_engine import AnalysisUpdate, AsyncEngine, SearchResult
+from chess import DRAW_MESSAGES, KING, PAWN, ChessBoard, Color, GameStatus, Move
+from engine_pool import EnginePool, open_engine_pool
+from eval_cache import EvaluationCache
+
+PIECE_SYMBOLS = '♙♖♘♗♕♔♟♜♞♝♛♚'  # Indexed by Piece.code
+
+class BoardCanvas:
+    # The 64 squares and 64 piece glyphs are canvas items made once. draw()
+    # only looks at squares marked dirty and only reconfigures those whose
+    # piece differs from what is on screen; highlight() only recolours
+    # squares whose colour changes.
+    COLORS = ('white', 'gray')
+    SELECTED = 'yellow'
+    TARGETS = ('#cde8b0', '#8fb56a')  # Legal destinations on light / dark squares
+
+    def __init__(self, master, square_size: int, on_click):
+        self.square_size = square_size
+        size = 8 * square_size
+        self.canvas = tk.Canvas(master, width=size, height=size, highlightthickness=0)
+        self.squares = []
+        self.pieces = []
+        font = ('Arial', square_size * 5 // 12)
+        for square in range(64):
+            row, col = divmod(square, 8)
+            x, y = col * square_size, row * square_size
+            self.squares.append(self.canvas.create_rectangle(
+                x, y, x + square_size, y + square_size, fill=self.base_color(square), outline=''))
+            self.pieces.append(self.canvas.create_text(
+                x + square_size / 2, y + square_size / 2, text='', font=font))
+        self.shown = [None] * 64  # Piece code on screen per square, None if empty
+        self.highlighted = {}  # Square -> fill, for squares not in their own colour
+        self.dirty = set(range(64))
+        self.canvas.bind('<Button-1>', lambda event: self._click(event, on_click))
+
+    def _click(self, event, on_click):
+        row, col = event.y // self.square_size, event.x // self.square_size
+        if 0 <= row < 8 and 0 <= col < 8:
+            on_click(row, col)
+
+    def base_color(self, square: int) -> str:
+        return self.COLORS[(square >> 3 ^ square) & 1]
+
+    def mark_all(self):
+        self.dirty.update(range(64))
+
+    def mark_move(self, board: ChessBoard, move: Move):
+        # Squares `move`, just played on `board`, can have changed: its two
+        # ends, the rook's squares when castling and the pawn taken en passant
+        start_row, start_col, end_row, end_col, _ = move
+        self.dirty.add(start_row * 8 + start_col)
+        self.dirty.add(end_row * 8 + end_col)
+        piece = board.board[end_row][end_col]
+        if piece.type_code == KING and abs(end_col - start_col) == 2:
+            rook_from, rook_to = (7, 5) if end_col > start_col else (0, 3)
+            self.dirty.update((end_row * 8 + rook_from, end_row * 8 + rook_to))
+        elif piece.type_code == PAWN and start_col != end_col:
+            self.dirty.add(start_row * 8 + end_col)
+
+    def draw(self, board: ChessBoard):
+        rows = board.board
+        for square in self.dirty:
+            piece = rows[square >> 3][square & 7]
+            code = piece.code if piece else None
+            if code != self.shown[square]:
+                self.shown[square] = code
+                self.canvas.itemconfigure(self.pieces[square],
+                                          text=PIECE_SYMBOLS[code] if code is not None else '')
+        self.dirty.clear()
+
+    def highlight(self, selected: Optional[int] = None, targets=()):
+        wanted = {}
+        for square in targets:
+            wanted[square] = self.TARGETS[(square >> 3 ^ square) & 1]
+        if selected is not None:
+            wanted[selected] = self.SELECTED
+        for square in self.highlighted.keys() | wanted.keys():
+            fill = wanted.get(square, self.base_color(square))
+            if self.highlighted.get(square, self.base_color(square)) != fill:
+                self.canvas.itemconfigure(self.squares[square], fill=fill)
+        self.highlighted = wanted
+
+class ChessGUI:
+    ENGINE_POLL_MS = 20  # How often finished engine searches are picked up
+    BOOK_MOVE_DELAY_MS = 300  # Book moves need no search; pause so they can be followed
+    FRAME_MS = 16  # Redraws asked for within one display frame are drawn once
+    PV_MOVES = 10  # Moves shown per line in the principal variation display
+    SQUARE_SIZE = 60
+    EVAL_BAR_WIDTH = 30
+
+    def __init__(self, engine_pool: Optional[EnginePool] = None,
+                 eval_cache: Optional[EvaluationCache] = None, book=None,
+                 analysis_lines: int = 3, ponder: bool = True, engine_path: Optional[str] = None,
+                 started: Optional[float] = None, quit_after_startup: bool = False):
+        self.window = tk.Tk()
+        self.window.title("Chess")
+        self.game = ChessBoard()
+        self.selected_square = None
+        self.redraw_pending = False
+        self.pending_evaluation = None  # (white share of the bar, text) for the next redraw
+        self.vs_ai = False
+        self.self_play = False
+        # Engines can be shared with other tooling by passing in a pool
+        self.engine_pool = engine_pool
+        self.owns_engine_pool = engine_pool is None
+        self.engine = None
+        # Evaluations already seen (restarts, repeated openings) skip the engine
+        self.eval_cache = eval_cache if eval_cache is not None else EvaluationCache()
+        # Polyglot OpeningBook; its moves are played before the engine is asked
+        self.book = book
+        self.pending_book_move = None
+        # Lines of streaming analysis on the human's turn; 0 asks for one
+        # fixed-depth evaluation instead
+        self.analysis_lines = analysis_lines
+        # In VS AI games the engine keeps searching on the reply it expects
+        self.ponder = ponder
+        self.expected_reply = None
+        # perf_counter() at program start: time to first frame and to a
+        # ready engine are printed against it
+        self.started = started
+        self.quit_after_startup = quit_after_startup
+        self.first_frame_shown = False
+
+        self.setup_board()
+        self.setup_controls()
+        self.setup_evaluation_display()
+        self.window.bind('<Map>', self.on_first_frame, add='+')
+
+        # Finding and starting an engine can take seconds, so it happens off
+        # the Tk thread while the board is already up; searches then run on
+        # worker threads, and poll_engine picks up both
+        self.engine_startup = queue.Queue()
+        if self.engine_pool is not None:
+            self.on_engine_ready(self.engine_pool)
+        else:
+            threading.Thread(target=lambda: self.engine_startup.put(open_engine_pool(engine_path)),
+                             daemon=True, name='engine-startup').start()
+        self.window.after(self.ENGINE_POLL_MS, self.poll_engine)
+
+    def on_first_frame(self, event):
+        if self.first_frame_shown or event.widget is not self.window:
+            return
+        self.first_frame_shown = True
+        self.window.update_idletasks()
+        self.report_startup("First frame")
+
+    def on_engine_ready(self, pool: EnginePool):
+        self.engine_pool = pool
+        self.engine = AsyncEngine(pool, self.eval_cache)
+        self.report_startup("Engine ready")
+        # Start whatever was asked for while the engine was loading
+        if self.self_play or (self.vs_ai and self.game.current_player == Color.BLACK):
+            self.make_stockfish_move()
+        else:
+            self.update_evaluation()
+
+    def report_startup(self, event: str):
+        if self.started is not None:
+            print(f"{event} after {(time.perf_counter() - self.started) * 1000:.0f}ms", file=sys.stderr)
+        if self.quit_after_startup and self.first_frame_shown and self.engine:
+            self.window.after_idle(self.window.destroy)
+
+    def setup_controls(self):
+        control_frame = tk.Frame(self.window)
+        control_frame.grid(row=8, column=0, columnspan=8)
+        
+        self.ai_button = tk.Button(control_frame, text="VS Player", command=self.toggle_ai_mode)
+        self.ai_button.pack(pady=5)
+        
+        self.self_play_button = tk.Button(control_frame, text="Self Play", command=self.toggle_self_play)
+        self.self_play_button.pack(pady=5)
+        
+        self.restart_button = tk.Button(control_frame, text="Restart", command=self.restart_game)
+        self.restart_button.pack(pady=5)
+
+    def restart_game(self):
+        self.game = ChessBoard()
+        self.selected_square = None
+        self.pending_book_move = None
+        self.expected_reply = None
+        if self.engine:
+            self.engine.cancel()
+        self.board_view.highlight()
+        self.update_display()
+        if self.self_play:
+            self.start_self_play()
+        else:
+            self.update_evaluation()
+
+    def toggle_self_play(self):
+        self.self_play = not self.self_play
+        self.vs_ai = False
+        self.ai_button.config(text="VS Player")
+        self.self_play_button.config(text="Stop Self Play" if self.self_play else "Self Play")
+        
+        if self.self_play:
+            self.restart_game()
+        else:
+            self.restart_game()
+
+    def start_self_play(self):
+        if not self.self_play:
+            return
+
+        # Each engine move asks for the next one once it is on the board
+        # (see after_move), so self-play runs as fast as the engine searches
+        self.make_stockfish_move()
+
+    def toggle_ai_mode(self):
+        self.vs_ai = not self.vs_ai
+        self.self_play = False
+        self.self_play_button.config(text="Self Play")
+        self.ai_button.config(text="VS Stockfish" if not self.vs_ai else "VS Player")
+        if self.vs_ai and self.game.current_player == Color.BLACK:
+            self.make_stockfish_move()
+        elif not self.vs_ai and self.engine:
+            self.engine.cancel('move')  # Nothing to ponder on any more
+
+    def get_fen_position(self):
+        return self.game.to_fen()
+
+    def setup_evaluation_display(self):
+        # Black above, White below; show_evaluation only moves the boundary
+        width, height = self.EVAL_BAR_WIDTH, 8 * self.SQUARE_SIZE
+        self.eval_canvas = tk.Canvas(self.window, width=width, height=height, bg='gray',
+                                     highlightthickness=0)
+        self.eval_canvas.grid(row=0, column=8, rowspan=8, padx=5)
+        self.eval_bar_black = self.eval_canvas.create_rectangle(0, 0, width, height / 2,
+                                                                fill='black', outline='')
+        self.eval_bar_white = self.eval_canvas.create_rectangle(0, height / 2, width, height,
+                                                                fill='white', outline='')
+        self.eval_text = self.eval_canvas.create_text(width / 2, 10, text="0.0", fill='white')
+
+        # Principal variations from the streaming analysis, one per line
+        self.pv_label = tk.Label(self.window, text="", justify='left', anchor='w',
+                                 font=('Courier', 9), height=max(self.analysis_lines, 1))
+        self.pv_label.grid(row=9, column=0, columnspan=9, sticky='we', padx=5)
+        self.update_evaluation()
+
+    def update_evaluation(self):
+        self.pv_label.config(text="")
+        if self.book is not None and self.book.entries(self.game):
+            # Still in the book: a known opening, not worth a search
+            self.show_book_evaluation()
+            return
+        if not self.engine:
+            return
+
+        # Send the position itself rather than replaying the game from the start
+        fen = self.game.to_fen()
+        if not self.analysis_lines:
+            self.engine.request_evaluation(fen, self.on_evaluation)
+            return
+        # Analyse until the position changes, showing each depth as it lands;
+        # a cached evaluation fills the bar until the first one does
+        cached = self.eval_cache.get(fen, self.engine_pool.depth)
+        if cached is not None:
+            cached.pop('best', None)
+            self.show_evaluation(cached)
+        self.engine.request_analysis(fen, self.on_analysis, multipv=self.analysis_lines)
+
+    def on_analysis(self, update: AnalysisUpdate):
+        if update.fen != self.game.to_fen():
+            return
+        self.show_evaluation(update.lines[0]['score'])
+        lines = []
+        for info in update.lines:
+            score = info['score']
+            if score['type'] == 'mate':
+                text = f"#{score['value']}"
+            else:
+                text = f"{score['value'] / 100:+.2f}"
+            variation = self.game.variation_san(info['pv'][:self.PV_MOVES])
+            lines.append(f"{text:>7} d{info.get('depth', 0):<3} {variation}")
+        self.pv_label.config(text='\n'.join(lines))
+
+    def show_book_evaluation(self):
+        self.show_evaluation({'type': 'cp', 'value': 0}, text="Book")
+
+    def on_evaluation(self, result: SearchResult):
+        if result.error:
+            print(f"Error getting evaluation: {result.error}", file=sys.stderr)
+            return
+        self.show_evaluation(result.evaluation)
+
+    def show_evaluation(self, eval: dict, text: Optional[str] = None):
+        # White's share of the bar: linear between -5 and +5 pawns, all or
+        # nothing for a mate. Drawn with the next redraw.
+        if eval['type'] == 'cp':
+            score = eval['value'] / 100.0
+            white_share = 0.5 + max(min(score, 5), -5) / 10
+            default_text = f"+{abs(score):.1f}" if score > 0 else f"{score:.1f}"
+        else:
+            white_share = 1.0 if eval['value'] > 0 else 0.0
+            default_text = f"M{abs(eval['value'])}"
+        self.pending_evaluation = (white_share, text or default_text)
+        self.schedule_redraw()
+
+    def draw_evaluation(self, white_share: float, text: str):
+        width, height = self.EVAL_BAR_WIDTH, 8 * self.SQUARE_SIZE
+        boundary = height * (1 - white_share)
+        self.eval_canvas.coords(self.eval_bar_black, 0, 0, width, boundary)
+        self.eval_canvas.coords(self.eval_bar_white, 0, boundary, width, height)
+        # The text sits at the top of the bar; keep it readable on white
+        self.eval_canvas.itemconfigure(self.eval_text, text=text,
+                                       fill='white' if boundary > 20 else 'black')
+
+    def make_stockfish_move(self):
+        self.pv_label.config(text="")  # Analysis of the previous position
+        if self.book is not None:
+            move = self.book.choose(self.game)
+            if move is not None:
+                result = SearchResult(self.game.to_fen(), move.uci(), None, None)
+                self.pending_book_move = result
+                self.show_book_evaluation()
+                self.window.after(self.BOOK_MOVE_DELAY_MS, lambda: self.play_book_move(result))
+                return
+
+        if not self.engine:
+            return  # Still starting; on_engine_ready asks again
+
+        # Ask for the best move without waiting; apply_engine_move runs on
+        # the Tk thread once the search is done
+        self.engine.request_move(self.game.to_fen(), self.apply_engine_move)
+
+    def play_book_move(self, result: SearchResult):
+        # Dropped if the game was restarted while it was waiting
+        if result is self.pending_book_move:
+            self.pending_book_move = None
+            self.apply_engine_move(result)
+
+    def apply_engine_move(self, result: SearchResult):
+        if result.error:
+            print(f"Error getting best move: {result.error}", file=sys.stderr)
+            return
+        if result.fen != self.game.to_fen():
+            return  # The position moved on while the engine was thinking
+
+        # The move search scored this position too, so use it for the bar
+        if result.evaluation:
+            self.show_evaluation(result.evaluation)
+
+        # What it expects in reply; pondered on once the move is played
+        self.expected_reply = result.ponder
+        try:
+            best_move = result.best_move
+            if best_move:
+                start = best_move[:2]
+                end = best_move[2:]  # Keeps any promotion letter
+                
+                if self.game.make_move(start, end):
+                    self.after_move()
+        except Exception as e:
+            print(f"Error applying best move: {e}", file=sys.stderr)
+
+    def after_move(self):
+        self.update_display(self.game.peek())
+        if self.engine:
+            # Evaluations of the old position are stale; a ponder search may
+            # not be, so that is settled below
+            self.engine.cancel('evaluation')
+            self.engine.cancel('analysis')
+        self.check_game_state()
+        if self.game.status().is_game_over:
+            if self.engine:
+                self.engine.cancel()
+            return
+
+        # An engine move search also refreshes the eval bar, so only ask for
+        # a separate evaluation when no engine move is due
+        if self.self_play or (self.vs_ai and self.game.current_player == Color.BLACK):
+            if self.engine and self.engine.ponderhit(self.game.to_fen()):
+                # It was pondering on this very move and now searches for real
+                self.pv_label.config(text="")
+                return
+            if self.engine:
+                self.engine.cancel('move')
+            self.make_stockfish_move()
+        else:
+            pondering = self.start_pondering()
+            if pondering and self.engine_pool.size == 1:
+                # A single engine ponders instead of analysing for the human
+                self.pv_label.config(text=f"Pondering {pondering}")
+            else:
+                self.update_evaluation()
+
+    def start_pondering(self) -> Optional[str]:
+        # Search the position after the reply the engine expects while the
+        # human thinks; returns that reply in SAN, or None if not pondering
+        reply, self.expected_reply = self.expected_reply, None
+        if not (self.ponder and self.vs_ai and self.engine and reply):
+            return None
+        move = next((m for m in self.game.generate_legal_moves() if m.uci() == reply), None)
+        if move is None:
+            return None
+        san = self.game.san(move)
+        self.game.push(move)
+        try:
+            fen = self.game.to_fen()
+            in_book = self.book is not None and self.book.entries(self.game)
+        finally:
+            self.game.pop()
+        if in_book:
+            return None  # The book will answer it without a search
+        self.engine.request_ponder(fen, self.apply_engine_move)
+        return san
+
+    def poll_engine(self):
+        if self.engine:
+            self.engine.dispatch_results()
+        else:
+            try:
+                self.on_engine_ready(self.engine_startup.get_nowait())
+            except queue.Empty:
+                pass
+        self.window.after(self.ENGINE_POLL_MS, self.poll_engine)
+
+    def setup_board(self):
+        self.board_view = BoardCanvas(self.window, self.SQUARE_SIZE, self.square_clicked)
+        self.board_view.canvas.grid(row=0, column=0, rowspan=8, columnspan=8)
+        self.update_display()
+
+    def update_display(self, move: Optional[Move] = None):
+        # After `move` only the squares it touched are redrawn; without one,
+        # the whole board is
+        if move is None:
+            self.board_view.mark_all()
+        else:
+            self.board_view.mark_move(self.game, move)
+        self.schedule_redraw()
+
+    def schedule_redraw(self):
+        if not self.redraw_pending:
+            self.redraw_pending = True
+            self.window.after(self.FRAME_MS, self.redraw)
+
+    def redraw(self):
+        self.redraw_pending = False
+        self.board_view.draw(self.game)
+        if self.pending_evaluation is not None:
+            self.draw_evaluation(*self.pending_evaluation)
+            self.pending_evaluation = None
+
+    def legal_targets(self, row: int, col: int):
+        # Destination squares of the piece on (row, col), from the board's
+        # cached move list
+        return [end_row * 8 + end_col for start_row, start_col, end_row, end_col, _
+                in self.game.generate_legal_moves() if start_row == row and start_col == col]
+
+    def square_clicked(self, row: int, col: int):
+        if self.self_play:
+            return
+            
+        # If it's AI's turn (Black) and VS AI mode is on, ignore clicks
+        if self.vs_ai and self.game.current_player == Color.BLACK:
+            return
+
+        if self.selected_square is None:
+            # Only pick up pieces that have somewhere legal to go
+            targets = self.legal_targets(row, col)
+            if targets:
+                self.selected_square = (row, col)
+                self.board_view.highlight(row * 8 + col, targets)
+        else:
+            start_row, start_col = self.selected_square
+            start = f"{chr(start_col + ord('a'))}{8-start_row}"
+            end = f"{chr(col + ord('a'))}{8-row}"
+            
+            if self.game.make_move(start, end):
+                self.after_move()
+            
+            # Reset selection
+            self.board_view.highlight()
+            self.selected_square = None
+
+    def check_game_state(self):
+        status = self.game.status()
+        if status == GameStatus.CHECKMATE:
+            winner = "Black" if self.game.current_player == Color.WHITE else "White"
+            messagebox.showinfo("Game Over", f"Checkmate! {winner} wins!")
+        elif status.is_draw:
+            messagebox.showinfo("Game Over", f"{DRAW_MESSAGES[status]} The game is a draw.")
+        elif status == GameStatus.CHECK:
+            if not self.self_play:  # Don't show check messages during self-play
+                messagebox.showinfo("Check", f"{self.game.current_player.value} is in check!")
+        if status.is_game_over and self.self_play:
+            self.self_play = False
+            self.self_play_button.config(text="Self Play")
+
+    def run(self):
+        self.window.mainloop()
+        if self.engine:
+            self.engine.close()
+        if self.engine_pool and self.owns_engine_pool:
+            self.engine_pool.close()
+        try:
+            self.eval_cache.save()
+        except OSError as e:
+            print(f"Could not save evaluation cache: {e}", file=sys.stderr)
+
+def launch(args, started: Optional[float] = None) -> int:
+    # The GUI behind `python chess.py`, with its command-line options
+    book = None
+    if args.book:
+        from polyglot import OpeningBook
+        book = OpeningBook(args.book)
+    gui = ChessGUI(eval_cache=EvaluationCache(path=args.eval_cache), book=book,
+                   analysis_lines=args.analysis_lines, ponder=args.ponder, engine_path=args.engine,
+                   started=started if args.timing else None, quit_after_startup=args.quit_after_startup)
+    gui.run()
+    if book is not None:
+        book.close()
+    return 0
@@ -0,0 +1,229 @@
+"""Opt-in counters, latency histograms and profiling for the hot paths.
+
+Nothing here runs until enable() is called: it wraps the methods listed by
+default_targets() with timing wrappers, and disable() puts the originals back, so an
+uninstrumented run pays nothing at all. Each wrapped call is counted and
+its latency added to a histogram with power-of-two buckets.
+
+    python chess.py --stats                   # summary on exit
+    python chess.py --stats-interval 10       # and every 10 seconds
+    python chess.py --stats-json stats.json   # machine-readable dump on exit
+    python chess.py --profile selfplay.prof   # cProfile the whole session, all threads
+
+record(), timed() and count() can be used directly for anything else.
+"""
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, TextIO, Tuple
+import cProfile
+import functools
+import json
+import pstats
+import sys
+import threading
+import time
+
+# Bucket i holds latencies below 2**i microseconds; the last one is open
+BUCKETS = 24
+
+class Histogram:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self.buckets = [0] * BUCKETS
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[min(int(seconds * 1e6).bit_length(), BUCKETS - 1)] += 1
+
+    def percentile(self, fraction: float) -> float:
+        # Upper bound of the bucket holding the percentile, in seconds
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= rank:
+                return min((1 << index) / 1e6, self.max)
+        return self.max
+
+    def as_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'total_s': self.total,
+            'mean_us': self.total / self.count * 1e6 if self.count else 0.0,
+            'min_us': self.min * 1e6 if self.count else 0.0,
+            'max_us': self.max * 1e6,
+            'p50_us': self.percentile(0.5) * 1e6,
+            'p99_us': self.percentile(0.99) * 1e6,
+            # Bucket upper bound in microseconds -> calls
+            'buckets': {str(1 << i): n for i, n in enumerate(self.buckets) if n},
+        }
+
+_lock = threading.Lock()
+_timers: Dict[str, Histogram] = {}
+_counters: Dict[str, int] = {}
+_originals: List[Tuple[type, str, Callable]] = []
+_started = time.perf_counter()
+
+def record(name: str, seconds: float):
+    with _lock:
+        histogram = _timers.get(name)
+        if histogram is None:
+            histogram = _timers[name] = Histogram()
+        histogram.add(seconds)
+
+def count(name: str, n: int = 1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+@contextmanager
+def timed(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+def reset():
+    global _started
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+        _started = time.perf_counter()
+
+def default_targets(gui: bool = True) -> List[Tuple[type, str, str]]:
+    # (class, method, name in the stats). Imported here so only callers of
+    # enable() load the engine modules, and only with `gui` the GUI.
+    from chess import BitboardChessBoard, ChessBoard
+    from engine_pool import UCIEngine
+    from search import BuiltinEngine
+    targets = []
+    for board in (ChessBoard, BitboardChessBoard):
+        for method in ('get_piece_moves', 'is_square_attacked', '_move_causes_check',
+                       'generate_legal_moves'):
+            if method in vars(board):
+                targets.append((board, method, f"board.{method}"))
+    # The built-in engine stands in when there is no UCI one; same names
+    for engine in (UCIEngine, BuiltinEngine):
+        for method in ('set_position', 'set_fen_position', 'get_best_move', 'get_evaluation', 'analyse'):
+            if method in vars(engine):
+                targets.append((engine, method, f"engine.{method}"))
+    if gui:
+        from gui import ChessGUI
+        for method in ('update_display', 'show_evaluation', 'redraw'):
+            targets.append((ChessGUI, method, f"gui.{method}"))
+    return targets
+
+def _wrap(function: Callable, name: str) -> Callable:
+    perf_counter = time.perf_counter
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            record(name, perf_counter() - start)
+    return wrapper
+
+def enable(targets: Optional[List[Tuple[type, str, str]]] = None):
+    # Wrap the hot paths; calling it twice does not wrap them twice
+    if _originals:
+        return
+    for owner, method, name in targets or default_targets():
+        original = vars(owner)[method]
+        _originals.append((owner, method, original))
+        setattr(owner, method, _wrap(original, name))
+    reset()
+
+def disable():
+    while _originals:
+        owner, method, original = _originals.pop()
+        setattr(owner, method, original)
+
+def is_enabled() -> bool:
+    return bool(_originals)
+
+def snapshot() -> Dict:
+    with _lock:
+        return {
+            'elapsed_s': time.perf_counter() - _started,
+            'timers': {name: histogram.as_dict() for name, histogram in _timers.items()},
+            'counters': dict(_counters),
+        }
+
+def summary() -> str:
+    stats = snapshot()
+    lines = [f"{'':28} {'calls':>10} {'total s':>9} {'mean us':>9} {'p50 us':>8} "
+             f"{'p99 us':>8} {'max us':>9}"]
+    timers = sorted(stats['timers'].items(), key=lambda item: -item[1]['total_s'])
+    for name, timer in timers:
+        lines.append(f"{name:28} {timer['count']:10} {timer['total_s']:9.3f} {timer['mean_us']:9.1f} "
+                     f"{timer['p50_us']:8.0f} {timer['p99_us']:8.0f} {timer['max_us']:9.0f}")
+    for name, value in sorted(stats['counters'].items()):
+        lines.append(f"{name:28} {value:10}")
+    lines.append(f"over {stats['elapsed_s']:.1f}s")
+    return '\n'.join(lines)
+
+def dump(path: str):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot(), f, indent=2)
+
+class Reporter:
+    # Prints summary() every `interval` seconds from a daemon thread
+    def __init__(self, interval: float, out: TextIO = sys.stderr):
+        self.interval = interval
+        self.out = out
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='stats-reporter')
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            print(summary(), file=self.out, flush=True)
+
+    def stop(self):
+        self._stop.set()
+
+@contextmanager
+def profile(path: Optional[str] = None, top: int = 25, out: TextIO = sys.stderr):
+    # cProfile everything inside the block, including threads started in it
+    # (the engine workers); the merged stats go to `path` (for snakeviz,
+    # pstats, ...) and the top entries by cumulative time to `out`
+    profiler = cProfile.Profile()
+    thread_profilers = []
+
+    def profile_thread(*args):
+        # First event in a new thread: give the thread a profiler of its own,
+        # since a Profile only sees the thread that enabled it
+        sys.setprofile(None)
+        thread_profiler = cProfile.Profile()
+        try:
+            thread_profiler.enable()
+        except ValueError:
+            return  # Python 3.12+: the main profiler sees every thread already
+        with _lock:
+            thread_profilers.append(thread_profiler)
+
+    threading.setprofile(profile_thread)
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        threading.setprofile(None)
+        stats = pstats.Stats(profiler, stream=out)
+        with _lock:
+            for thread_profiler in thread_profilers:
+                stats.add(thread_profiler)
+        if path:
+            stats.dump_stats(path)
+        stats.sort_stats('cumulative').print_stats(top)
@@ -0,0 +1,434 @@
+"""Fixed-size binary positions and memory-mapped files of them.
+
+Every position packs into 32 bytes, little-endian:
+
+    0   8  occupancy bitboard (bit row * 8 + col, so bit 0 is a8)
+    8  16  piece codes, 4 bits each, one per occupied square in bit order
+           (low nibble first; codes as Piece.code, 0-11)
+    24  1  castling rights (CASTLE_* flags) | 0x10 when Black is to move
+    25  1  en passant square, 0xFF when there is none
+    26  1  halfmove clock (capped at 255)
+    27  2  fullmove number
+    29  1  result: 0 unknown, 1 '1-0', 2 '0-1', 3 '1/2-1/2'
+    30  2  White-relative evaluation in centipawns, NO_EVAL when absent;
+           mate in n is stored as +/-(MATE_SCORE - n)
+
+A file is a 16-byte header followed by records. PositionFile maps it and
+reads records in place, so any position can be fetched without parsing the
+rest, and array() gives a zero-copy NumPy view of the whole file.
+
+    python packed_positions.py pack games.pgn positions.fen -o positions.bin
+    python packed_positions.py show positions.bin --start 1000 --count 5
+"""
+from typing import BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+
+from chess import (CASTLE_BLACK_KINGSIDE, CASTLE_BLACK_QUEENSIDE, CASTLE_WHITE_KINGSIDE,
+                   CASTLE_WHITE_QUEENSIDE, ChessBoard, Color)
+
+MAGIC = b'CHESSPOS'
+VERSION = 1
+HEADER = struct.Struct('<8sII')  # magic, version, record size
+HEADER_SIZE = 16
+RECORD = struct.Struct('<Q16sBBBHBh')
+RECORD_SIZE = RECORD.size  # 32
+
+BLACK_TO_MOVE = 0x10
+NO_EN_PASSANT = 0xFF
+NO_EVAL = -32768
+MATE_SCORE = 32000
+MAX_CP = 30000
+
+RESULT_CODES = {None: 0, '*': 0, '1-0': 1, '0-1': 2, '1/2-1/2': 3}
+RESULTS = [None, '1-0', '0-1', '1/2-1/2']
+
+CASTLING_FLAGS = [('K', CASTLE_WHITE_KINGSIDE), ('Q', CASTLE_WHITE_QUEENSIDE),
+                  ('k', CASTLE_BLACK_KINGSIDE), ('q', CASTLE_BLACK_QUEENSIDE)]
+FEN_CODES = {symbol: code for code, symbol in enumerate('PRNBQKprnbqk')}
+FEN_SYMBOLS = 'PRNBQKprnbqk'
+
+def encode_eval(evaluation: Optional[Dict]) -> int:
+    if evaluation is None:
+        return NO_EVAL
+    if evaluation['type'] == 'mate':
+        moves = min(abs(evaluation['value']), MATE_SCORE - MAX_CP - 1)
+        return MATE_SCORE - moves if evaluation['value'] >= 0 else -(MATE_SCORE - moves)
+    return max(-MAX_CP, min(MAX_CP, evaluation['value']))
+
+def decode_eval(value: int) -> Optional[Dict]:
+    if value == NO_EVAL:
+        return None
+    if abs(value) > MAX_CP:
+        moves = MATE_SCORE - abs(value)
+        return {'type': 'mate', 'value': moves if value > 0 else -moves}
+    return {'type': 'cp', 'value': value}
+
+def _pack(squares: Iterable[Tuple[int, int]], flags: int, en_passant: int, halfmove_clock: int,
+          fullmove_number: int, evaluation: Optional[Dict], result: Optional[str]) -> bytes:
+    # squares: (square, piece code) in increasing square order
+    occupied = 0
+    codes = 0
+    count = 0
+    for square, code in squares:
+        if count == 32:
+            raise ValueError("More than 32 pieces cannot be packed")
+        occupied |= 1 << square
+        codes |= code << (4 * count)
+        count += 1
+    return RECORD.pack(occupied, codes.to_bytes(16, 'little'), flags, en_passant,
+                       min(halfmove_clock, 255), min(fullmove_number, 65535),
+                       RESULT_CODES[result], encode_eval(evaluation))
+
+def encode(board: ChessBoard, evaluation: Optional[Dict] = None, result: Optional[str] = None) -> bytes:
+    squares = [(row * 8 + col, piece.code)
+               for row, pieces in enumerate(board.board)
+               for col, piece in enumerate(pieces) if piece is not None]
+    flags = board.castling_rights | (BLACK_TO_MOVE if board.current_player == Color.BLACK else 0)
+    en_passant = board.en_passant[0] * 8 + board.en_passant[1] if board.en_passant else NO_EN_PASSANT
+    return _pack(squares, flags, en_passant, board.halfmove_clock, board.fullmove_number,
+                 evaluation, result)
+
+def encode_fen(fen: str, evaluation: Optional[Dict] = None, result: Optional[str] = None) -> bytes:
+    # Straight from the text, without building a ChessBoard; only the layout
+    # is checked, not whether the position is legal
+    fields = fen.split()
+    if len(fields) < 4:
+        raise ValueError(f"Incomplete FEN: {fen!r}")
+    placement, side, castling, en_passant = fields[:4]
+    squares = []
+    square = 0
+    for symbol in placement:
+        if symbol == '/':
+            if square % 8:
+                raise ValueError(f"Rank {8 - square // 8} does not cover 8 squares: {fen!r}")
+        elif symbol.isdigit():
+            square += int(symbol)
+        elif symbol in FEN_CODES:
+            squares.append((square, FEN_CODES[symbol]))
+            square += 1
+        else:
+            raise ValueError(f"Bad piece {symbol!r} in FEN: {fen!r}")
+    if square != 64 or placement.count('/') != 7:
+        raise ValueError(f"FEN needs 8 ranks: {fen!r}")
+    if side not in ('w', 'b'):
+        raise ValueError(f"Bad side to move {side!r}")
+
+    flags = BLACK_TO_MOVE if side == 'b' else 0
+    if castling != '-':
+        rights = dict(CASTLING_FLAGS)
+        for flag in castling:
+            if flag not in rights:
+                raise ValueError(f"Bad castling field {castling!r}")
+            flags |= rights[flag]
+    ep_square = NO_EN_PASSANT
+    if en_passant != '-':
+        col = ord(en_passant[0]) - ord('a')
+        row = 8 - int(en_passant[1:]) if en_passant[1:].isdigit() else -1
+        if not (0 <= col < 8 and row in (2, 5)):
+            raise ValueError(f"Bad en passant square {en_passant!r}")
+        ep_square = row * 8 + col
+    try:
+        halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+        fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+    except ValueError:
+        raise ValueError(f"Bad move counters in FEN: {fen!r}") from None
+    return _pack(squares, flags, ep_square, halfmove_clock, fullmove_number, evaluation, result)
+
+class PackedPosition(NamedTuple):
+    occupied: int
+    pieces: bytes
+    flags: int
+    en_passant: int
+    halfmove_clock: int
+    fullmove_number: int
+    result_code: int
+    eval_code: int
+
+    @property
+    def black_to_move(self) -> bool:
+        return bool(self.flags & BLACK_TO_MOVE)
+
+    @property
+    def castling_rights(self) -> int:
+        return self.flags & 0x0F
+
+    @property
+    def result(self) -> Optional[str]:
+        return RESULTS[self.result_code & 3]
+
+    @property
+    def evaluation(self) -> Optional[Dict]:
+        return decode_eval(self.eval_code)
+
+    def squares(self) -> Iterator[Tuple[int, int]]:
+        # (square, piece code) for every occupied square
+        codes = int.from_bytes(self.pieces, 'little')
+        occupied = self.occupied
+        while occupied:
+            lowest = occupied & -occupied
+            yield lowest.bit_length() - 1, codes & 0xF
+            codes >>= 4
+            occupied ^= lowest
+
+    def fen(self) -> str:
+        grid = [None] * 64
+        for square, code in self.squares():
+            if code >= 12:
+                raise ValueError(f"Bad piece code {code} in packed position")
+            grid[square] = FEN_SYMBOLS[code]
+        ranks = []
+        for row in range(8):
+            rank = ''
+            empty = 0
+            for symbol in grid[row * 8:row * 8 + 8]:
+                if symbol is None:
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                rank += symbol
+            ranks.append(rank + (str(empty) if empty else ''))
+        castling = ''.join(flag for flag, right in CASTLING_FLAGS if self.flags & right) or '-'
+        en_passant = '-'
+        if self.en_passant != NO_EN_PASSANT:
+            row, col = divmod(self.en_passant, 8)
+            en_passant = f"{chr(col + ord('a'))}{8 - row}"
+        return (f"{'/'.join(ranks)} {'b' if self.black_to_move else 'w'} {castling} {en_passant} "
+                f"{self.halfmove_clock} {self.fullmove_number}")
+
+    def board(self, backend: str = 'bitboard') -> ChessBoard:
+        return ChessBoard.from_fen(self.fen(), backend=backend)
+
+def decode(data: bytes, offset: int = 0) -> PackedPosition:
+    return PackedPosition(*RECORD.unpack_from(data, offset))
+
+def _header() -> bytes:
+    return HEADER.pack(MAGIC, VERSION, RECORD_SIZE)
+
+def _check_header(data: bytes, path: str):
+    if len(data) < HEADER_SIZE:
+        raise ValueError(f"{path}: too short for a position file")
+    magic, version, record_size = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: not a position file")
+    if version != VERSION or record_size != RECORD_SIZE:
+        raise ValueError(f"{path}: unsupported version {version} (record size {record_size})")
+
+class PositionWriter:
+    # Appends records to a position file, creating it (and its header) if
+    # needed. Use as a context manager or call close().
+    def __init__(self, path: str, append: bool = False):
+        self.path = path
+        self.count = 0
+        if append and os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, 'rb') as f:
+                _check_header(f.read(HEADER_SIZE), path)
+            if (os.path.getsize(path) - HEADER_SIZE) % RECORD_SIZE:
+                raise ValueError(f"{path}: truncated record at the end")
+            self._file: BinaryIO = open(path, 'ab')
+        else:
+            self._file = open(path, 'wb')
+            self._file.write(_header())
+
+    def write(self, board: ChessBoard, evaluation: Optional[Dict] = None, result: Optional[str] = None):
+        self._file.write(encode(board, evaluation, result))
+        self.count += 1
+
+    def write_fen(self, fen: str, evaluation: Optional[Dict] = None, result: Optional[str] = None):
+        self._file.write(encode_fen(fen, evaluation, result))
+        self.count += 1
+
+    def write_packed(self, record: bytes):
+        if len(record) != RECORD_SIZE:
+            raise ValueError(f"Packed positions are {RECORD_SIZE} bytes, got {len(record)}")
+        self._file.write(record)
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class PositionFile:
+    # Read-only, memory-mapped view of a position file. Records are decoded
+    # on access; nothing is read up front, so opening is instant at any size.
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            size = os.fstat(self._file.fileno()).st_size
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+            _check_header(self._mmap, path)
+        except (ValueError, OSError):
+            self._file.close()
+            raise
+        self._count = (size - HEADER_SIZE) // RECORD_SIZE
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _offset(self, index: int) -> int:
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("position index out of range")
+        return HEADER_SIZE + index * RECORD_SIZE
+
+    def __getitem__(self, index: int) -> PackedPosition:
+        return decode(self._mmap, self._offset(index))
+
+    def __iter__(self) -> Iterator[PackedPosition]:
+        for offset in range(HEADER_SIZE, HEADER_SIZE + self._count * RECORD_SIZE, RECORD_SIZE):
+            yield decode(self._mmap, offset)
+
+    def raw(self, index: int) -> bytes:
+        # The record's 32 bytes, e.g. to copy it into another file
+        offset = self._offset(index)
+        return self._mmap[offset:offset + RECORD_SIZE]
+
+    def fen(self, index: int) -> str:
+        return self[index].fen()
+
+    def board(self, index: int, backend: str = 'bitboard') -> ChessBoard:
+        return self[index].board(backend)
+
+    def array(self):
+        # Structured NumPy array over the mapped records, without copying.
+        # Drop it before close(), which cannot unmap memory still in use.
+        import numpy as np
+        return np.frombuffer(self._mmap, dtype=record_dtype(), count=self._count, offset=HEADER_SIZE)
+
+    def close(self):
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def record_dtype():
+    import numpy as np
+    return np.dtype([('occupied', '<u8'), ('pieces', 'u1', 16), ('flags', 'u1'), ('en_passant', 'u1'),
+                     ('halfmove_clock', 'u1'), ('fullmove_number', '<u2'), ('result', 'u1'),
+                     ('eval', '<i2')])
+
+def to_batch(records):
+    # BoardBatch (see board_batch.py) for a structured array of records, such
+    # as a slice of PositionFile.array(); vectorised, no per-position Python
+    import numpy as np
+    from board_batch import BoardBatch
+
+    n = len(records)
+    occupied = np.ascontiguousarray(records['occupied']).view(np.uint8).reshape(n, 8)
+    is_occupied = np.unpackbits(occupied, axis=1, bitorder='little').astype(bool)
+    nibbles = np.ascontiguousarray(records['pieces'])
+    codes = np.empty((n, 32), dtype=np.int8)
+    codes[:, 0::2] = nibbles & 0x0F
+    codes[:, 1::2] = nibbles >> 4
+    # The k-th occupied square holds the k-th nibble
+    slots = np.cumsum(is_occupied, axis=1) - 1
+    squares = np.where(is_occupied, np.take_along_axis(codes, np.clip(slots, 0, 31), axis=1), -1)
+    pieces = np.empty((n, 12), dtype=np.uint64)
+    for code in range(12):
+        bits = np.packbits(squares == code, axis=1, bitorder='little')
+        pieces[:, code] = np.ascontiguousarray(bits).view('<u8').ravel()
+    ep = records['en_passant']
+    return BoardBatch(pieces, records['flags'] & BLACK_TO_MOVE != 0,
+                      (records['flags'] & 0x0F).astype(np.uint8),
+                      np.where(ep == NO_EN_PASSANT, -1, ep).astype(np.int8))
+
+def _pgn_records(path: str) -> Iterator[bytes]:
+    # Every position of every game, tagged with the game's result
+    from pgn_analysis import read_pgn_files
+    for game in read_pgn_files([path]):
+        result = game.result if game.result in RESULT_CODES else None
+        try:
+            board = ChessBoard.from_fen(game.headers['FEN'], backend='bitboard') \
+                if 'FEN' in game.headers else ChessBoard('bitboard')
+            yield encode(board, None, result)
+            for san in game.moves:
+                board.push(board.parse_san(san))
+                yield encode(board, None, result)
+        except ValueError as e:
+            print(f"{path}: skipping rest of game: {e}", file=sys.stderr)
+
+def _fen_records(path: str) -> Iterator[bytes]:
+    # One FEN per line; an EPD 'ce' opcode becomes the evaluation (it is
+    # from the side to move, so it is flipped for Black)
+    if path == '-':
+        yield from _epd_lines_to_records(path, sys.stdin)
+        return
+    with open(path, encoding='utf-8') as f:
+        yield from _epd_lines_to_records(path, f)
+
+def _epd_lines_to_records(path: str, lines: Iterable[str]) -> Iterator[bytes]:
+    for line in lines:
+        fields = line.split(';')[0].split()
+        if len(fields) < 4 or line.lstrip().startswith('#'):
+            continue
+        counters = fields[4:6] if len(fields) >= 6 and all(x.isdigit() for x in fields[4:6]) else []
+        fen = ' '.join(fields[:4] + counters)
+        evaluation = None
+        if ' ce ' in f" {line}":
+            try:
+                value = int(line.split(' ce ', 1)[1].split(';')[0].split()[0])
+                evaluation = {'type': 'cp', 'value': -value if fields[1] == 'b' else value}
+            except (IndexError, ValueError):
+                pass
+        try:
+            yield encode_fen(fen, evaluation)
+        except ValueError as e:
+            print(f"{path}: skipping line: {e}", file=sys.stderr)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Pack positions into fixed-size binary records")
+    commands = parser.add_subparsers(dest='command', required=True)
+    pack = commands.add_parser('pack', help="pack PGN games (.pgn) or FEN/EPD lines into a file")
+    pack.add_argument('inputs', nargs='+')
+    pack.add_argument('-o', '--output', required=True)
+    pack.add_argument('--append', action='store_true', help="add to an existing file")
+    show = commands.add_parser('show', help="print records as FEN")
+    show.add_argument('file')
+    show.add_argument('--start', type=int, default=0)
+    show.add_argument('--count', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    if args.command == 'pack':
+        start = time.perf_counter()
+        with PositionWriter(args.output, append=args.append) as writer:
+            for path in args.inputs:
+                records = _pgn_records(path) if path.endswith('.pgn') else _fen_records(path)
+                for record in records:
+                    writer.write_packed(record)
+        elapsed = time.perf_counter() - start
+        print(f"{writer.count} positions written to {args.output} in {elapsed:.1f}s", file=sys.stderr)
+        return 0
+
+    with PositionFile(args.file) as positions:
+        print(f"{len(positions)} positions", file=sys.stderr)
+        for index in range(args.start, min(args.start + args.count, len(positions))):
+            position = positions[index]
+            extra = ''
+            if position.evaluation is not None:
+                score = position.evaluation
+                extra += f" eval {'#' if score['type'] == 'mate' else ''}{score['value']}"
+            if position.result is not None:
+                extra += f" result {position.result}"
+            print(f"{index}: {position.fen()}{extra}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+"""Headless batch analysis of PGN archives.
+
+Games are streamed one at a time from any number of PGN files, replayed on
+ChessBoard and scored position by position on an EnginePool. At most
+--in-flight games are queued or being searched at once, so memory stays flat
+however large the archive is, while every engine in the pool is kept busy.
+Each game becomes one JSON line with per-move evaluations, mistake flags and
+per-side accuracy, written in input order.
+
+    python pgn_analysis.py games.pgn --engine stockfish --workers 4 --depth 12 -o games.jsonl
+"""
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, TextIO
+import argparse
+import json
+import math
+import os
+import re
+import sys
+import time
+
+from chess import ChessBoard, Color, GameStatus
+from engine_pool import EngineError, EnginePool, UCIEngine
+from eval_cache import EvaluationCache
+
+RESULT_TOKENS = {'1-0', '0-1', '1/2-1/2', '*'}
+HEADER_PATTERN = re.compile(r'^\[(\w+)\s+"(.*)"\]\s*$')
+TOKEN_PATTERN = re.compile(r'[{}();]|[^\s{}();]+')
+MOVE_NUMBER_PATTERN = re.compile(r'^\d+\.+')
+
+# Mate scores become centipawns beyond anything material can reach
+MATE_CP = 10000
+# Centipawn loss is capped so one lost mate does not swamp a side's average
+MAX_CP_LOSS = 1000
+# Drops in the mover's winning chances (percentage points) that flag a move
+JUDGEMENTS = [(30, 'blunder'), (20, 'mistake'), (10, 'inaccuracy')]
+
+class PgnGame(NamedTuple):
+    headers: Dict[str, str]
+    moves: List[str]  # SAN, main line only
+    result: str
+
+def read_games(lines: Iterable[str]) -> Iterator[PgnGame]:
+    # Yields games as their movetext ends; only the current game is held in
+    # memory. Comments, variations, NAGs and move numbers are dropped.
+    headers, moves = {}, []
+    in_comment = False
+    variation_depth = 0
+    for line in lines:
+        if not in_comment and variation_depth == 0:
+            stripped = line.strip()
+            if stripped.startswith('%'):
+                continue
+            header = HEADER_PATTERN.match(stripped)
+            if header:
+                if moves:
+                    # Previous game had no result token
+                    yield PgnGame(headers, moves, headers.get('Result', '*'))
+                    headers, moves = {}, []
+                headers[header.group(1)] = header.group(2)
+                continue
+
+        for token in TOKEN_PATTERN.findall(line):
+            if in_comment:
+                in_comment = token != '}'
+            elif token == '{':
+                in_comment = True
+            elif token == ';':
+                break
+            elif token == '(':
+                variation_depth += 1
+            elif token == ')':
+                variation_depth = max(variation_depth - 1, 0)
+            elif variation_depth:
+                continue
+            elif token in RESULT_TOKENS:
+                yield PgnGame(headers, moves, token)
+                headers, moves = {}, []
+            elif not token.startswith('$'):
+                token = MOVE_NUMBER_PATTERN.sub('', token)
+                if token:
+                    moves.append(token)
+    if moves or headers:
+        yield PgnGame(headers, moves, headers.get('Result', '*'))
+
+def read_pgn_files(paths: Iterable[str]) -> Iterator[PgnGame]:
+    for path in paths:
+        if path == '-':
+            yield from read_games(sys.stdin)
+            continue
+        with open(path, encoding='utf-8', errors='replace') as f:
+            yield from read_games(f)
+
+def score_to_cp(score: Dict) -> int:
+    if score['type'] == 'mate':
+        return int(math.copysign(MATE_CP - abs(score['value']), score['value']))
+    return score['value']
+
+def win_percent(cp: int) -> float:
+    # Winning chances for the side the score favours, 0-100
+    return 50 + 50 * (2 / (1 + math.exp(-0.00368208 * cp)) - 1)
+
+def move_accuracy(win_before: float, win_after: float) -> float:
+    accuracy = 103.1668 * math.exp(-0.04354 * (win_before - win_after)) - 3.1669
+    return min(max(accuracy, 0.0), 100.0)
+
+def _evaluate(engine: UCIEngine, board: ChessBoard, depth: int,
+              cache: Optional[EvaluationCache]) -> Dict:
+    # {'eval': White-relative score, 'cp': the same in centipawns, 'best': uci or None}
+    status = board.status()
+    if status == GameStatus.CHECKMATE:
+        # Game over: no point asking the engine
+        mated = -1 if board.current_player == Color.WHITE else 1
+        return {'eval': {'type': 'mate', 'value': 0}, 'cp': mated * MATE_CP, 'best': None}
+    if status == GameStatus.STALEMATE:
+        return {'eval': {'type': 'cp', 'value': 0}, 'cp': 0, 'best': None}
+
+    fen = board.to_fen()
+    evaluation = cache.get(fen, depth) if cache is not None else None
+    if evaluation is not None and 'best' in evaluation:
+        best = evaluation.pop('best')
+    else:
+        engine.set_fen_position(fen)
+        best, _, evaluation = engine.analyse(depth)
+        if cache is not None:
+            cache.put(fen, depth, dict(evaluation, best=best))
+    return {'eval': evaluation, 'cp': score_to_cp(evaluation), 'best': best}
+
+def analyse_game(engine: UCIEngine, game: PgnGame, depth: int,
+                 cache: Optional[EvaluationCache] = None) -> Dict:
+    record = {'headers': game.headers, 'result': game.result, 'moves': []}
+    try:
+        if 'FEN' in game.headers:
+            board = ChessBoard.from_fen(game.headers['FEN'], backend='bitboard')
+        else:
+            board = ChessBoard('bitboard')
+    except ValueError as e:
+        record['error'] = str(e)
+        return record
+
+    before = _evaluate(engine, board, depth, cache)
+    sides = {color: {'accuracy': [], 'cp_loss': [], 'inaccuracy': 0, 'mistake': 0, 'blunder': 0}
+             for color in Color}
+    for ply, san in enumerate(game.moves, 1):
+        try:
+            move = board.parse_san(san)
+        except ValueError as e:
+            record['error'] = f"ply {ply}: {e}"
+            break
+        mover = board.current_player
+        board.push(move)
+        after = _evaluate(engine, board, depth, cache)
+
+        sign = 1 if mover == Color.WHITE else -1
+        cp_before, cp_after = sign * before['cp'], sign * after['cp']
+        win_before, win_after = win_percent(cp_before), win_percent(cp_after)
+        accuracy = move_accuracy(win_before, win_after)
+        cp_loss = min(max(cp_before - cp_after, 0), MAX_CP_LOSS)
+        judgement = next((name for drop, name in JUDGEMENTS if win_before - win_after >= drop), None)
+
+        side = sides[mover]
+        side['accuracy'].append(accuracy)
+        side['cp_loss'].append(cp_loss)
+        if judgement:
+            side[judgement] += 1
+        record['moves'].append({
+            'ply': ply,
+            'san': san,
+            'uci': move.uci(),
+            'eval': after['eval'],
+            'best': before['best'],
+            'cp_loss': cp_loss,
+            'accuracy': round(accuracy, 1),
+            'judgement': judgement,
+        })
+        before = after
+
+    for color, side in sides.items():
+        moves = len(side['accuracy'])
+        record['white' if color == Color.WHITE else 'black'] = {
+            'accuracy': round(sum(side['accuracy']) / moves, 1) if moves else None,
+            'acpl': round(sum(side['cp_loss']) / moves) if moves else None,
+            'inaccuracies': side['inaccuracy'],
+            'mistakes': side['mistake'],
+            'blunders': side['blunder'],
+        }
+    return record
+
+def analyse_games(games: Iterable[PgnGame], pool: EnginePool, depth: int,
+                  max_in_flight: Optional[int] = None,
+                  cache: Optional[EvaluationCache] = None) -> Iterator[Dict]:
+    # Records in input order. Games are only pulled from `games` while fewer
+    # than max_in_flight are pending, which bounds memory use.
+    max_in_flight = max_in_flight or 4 * pool.size
+    pending = deque()
+    for index, game in enumerate(games):
+        if len(pending) >= max_in_flight:
+            yield _finish(*pending.popleft())
+        pending.append((index, game, pool.submit(analyse_game, game, depth, cache)))
+    while pending:
+        yield _finish(*pending.popleft())
+
+def _finish(index: int, game: PgnGame, future) -> Dict:
+    try:
+        record = future.result()
+    except EngineError as e:
+        # The pool has already replaced the engine; report and carry on
+        record = {'headers': game.headers, 'result': game.result, 'moves': [], 'error': str(e)}
+    return {'game': index, **record}
+
+def write_records(records: Iterable[Dict], out: TextIO) -> Dict[str, int]:
+    totals = {'games': 0, 'moves': 0, 'errors': 0}
+    for record in records:
+        out.write(json.dumps(record) + '\n')
+        totals['games'] += 1
+        totals['moves'] += len(record['moves'])
+        totals['errors'] += 'error' in record
+    return totals
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Analyse PGN games with a pool of UCI engines")
+    parser.add_argument('pgn', nargs='+', help="PGN files to read ('-' for stdin)")
+    parser.add_argument('--engine', default=os.environ.get('STOCKFISH_PATH', 'stockfish'),
+                        help="UCI engine executable (default: $STOCKFISH_PATH or 'stockfish')")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="engine processes to run in parallel")
+    parser.add_argument('--depth', type=int, default=12)
+    parser.add_argument('--hash', type=int, default=16, help="hash size per engine in MB")
+    parser.add_argument('--in-flight', type=int, default=None,
+                        help="games queued or being analysed at once (default: 4 per worker)")
+    parser.add_argument('--eval-cache', metavar='PATH',
+                        help="reuse evaluations of repeated positions, kept in this file")
+    parser.add_argument('-o', '--output', help="JSON Lines output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    cache = EvaluationCache(path=args.eval_cache)
+    try:
+        pool = EnginePool(args.engine, size=args.workers, hash_mb=args.hash, depth=args.depth)
+    except EngineError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    start = time.perf_counter()
+    try:
+        records = analyse_games(read_pgn_files(args.pgn), pool, args.depth, args.in_flight, cache)
+        totals = write_records(records, out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        pool.close()
+        cache.save()
+    elapsed = time.perf_counter() - start
+    print(f"{totals['games']} games, {totals['moves']} moves in {elapsed:.1f}s "
+          f"({totals['games'] / elapsed:.2f} games/s, {totals['moves'] / elapsed:.1f} moves/s), "
+          f"{totals['errors']} with errors", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
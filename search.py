@@ -0,0 +1,598 @@
+"""Built-in alpha-beta engine, used when no UCI engine is available.
+
+Searcher runs iterative deepening over ChessBoard: principal-variation
+alpha-beta with a transposition table keyed on the board's Zobrist key, a
+captures-only quiescence search, and move ordering by TT move, MVV-LVA,
+killer moves and history. Each search stops at a depth, time or node
+budget, or when stop() is called from another thread. The evaluation is
+material plus piece-square tables, updated incrementally on every move.
+
+BuiltinEngine wraps a Searcher behind the calls AsyncEngine and EnginePool
+make on a UCIEngine, so the GUI and the headless tools can use it unchanged.
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+import time
+
+from chess import (BB_PIECE_INDEX, ChessBoard, Color, Move, PieceType, START_FEN,
+                   KING, PAWN, ROOK, WHITE)
+
+INFINITY = 1_000_000
+MATE_SCORE = 100_000
+MAX_PLY = 128
+# Scores beyond this are mates, counted in plies from the root
+MATE_BOUND = MATE_SCORE - MAX_PLY
+
+TT_EXACT, TT_LOWER, TT_UPPER = 0, 1, 2
+
+PIECE_VALUES = {
+    PieceType.PAWN: 100, PieceType.KNIGHT: 320, PieceType.BISHOP: 330,
+    PieceType.ROOK: 500, PieceType.QUEEN: 900, PieceType.KING: 0,
+}
+# Game phase: 24 with all minor and major pieces on, 0 with none
+PHASE_WEIGHTS = {
+    PieceType.PAWN: 0, PieceType.KNIGHT: 1, PieceType.BISHOP: 1,
+    PieceType.ROOK: 2, PieceType.QUEEN: 4, PieceType.KING: 0,
+}
+MAX_PHASE = 24
+
+# Piece-square tables from White's side, rank 8 first (index row * 8 + col)
+PIECE_SQUARE_TABLES = {
+    PieceType.PAWN: [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        50, 50, 50, 50, 50, 50, 50, 50,
+        10, 10, 20, 30, 30, 20, 10, 10,
+        5, 5, 10, 25, 25, 10, 5, 5,
+        0, 0, 0, 20, 20, 0, 0, 0,
+        5, -5, -10, 0, 0, -10, -5, 5,
+        5, 10, 10, -20, -20, 10, 10, 5,
+        0, 0, 0, 0, 0, 0, 0, 0,
+    ],
+    PieceType.KNIGHT: [
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20, 0, 0, 0, 0, -20, -40,
+        -30, 0, 10, 15, 15, 10, 0, -30,
+        -30, 5, 15, 20, 20, 15, 5, -30,
+        -30, 0, 15, 20, 20, 15, 0, -30,
+        -30, 5, 10, 15, 15, 10, 5, -30,
+        -40, -20, 0, 5, 5, 0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50,
+    ],
+    PieceType.BISHOP: [
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 10, 10, 5, 0, -10,
+        -10, 5, 5, 10, 10, 5, 5, -10,
+        -10, 0, 10, 10, 10, 10, 0, -10,
+        -10, 10, 10, 10, 10, 10, 10, -10,
+        -10, 5, 0, 0, 0, 0, 5, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20,
+    ],
+    PieceType.ROOK: [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        5, 10, 10, 10, 10, 10, 10, 5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        0, 0, 0, 5, 5, 0, 0, 0,
+    ],
+    PieceType.QUEEN: [
+        -20, -10, -10, -5, -5, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 5, 5, 5, 0, -10,
+        -5, 0, 5, 5, 5, 5, 0, -5,
+        0, 0, 5, 5, 5, 5, 0, -5,
+        -10, 5, 5, 5, 5, 5, 0, -10,
+        -10, 0, 5, 0, 0, 0, 0, -10,
+        -20, -10, -10, -5, -5, -10, -10, -20,
+    ],
+    PieceType.KING: [0] * 64,  # Kings are scored separately, by game phase
+}
+KING_MIDDLEGAME_TABLE = [
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    20, 20, 0, 0, 0, 0, 20, 20,
+    20, 30, 10, 0, 0, 10, 30, 20,
+]
+KING_ENDGAME_TABLE = [
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10, 0, 0, -10, -20, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -30, 0, 0, 0, 0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+]
+
+def _mirror(square: int) -> int:
+    return (7 - square // 8) * 8 + square % 8
+
+# Material plus placement of a piece on a square, positive for White,
+# indexed by Piece.code and then square
+SQUARE_VALUES = [
+    [
+        (1 if color == Color.WHITE else -1) *
+        (PIECE_VALUES[piece_type] +
+         PIECE_SQUARE_TABLES[piece_type][square if color == Color.WHITE else _mirror(square)])
+        for square in range(64)
+    ]
+    for color in Color for piece_type in PieceType
+]
+# The same per Piece.type_code
+TYPE_VALUES = [PIECE_VALUES[piece_type] for piece_type in PieceType]
+TYPE_PHASE_WEIGHTS = [PHASE_WEIGHTS[piece_type] for piece_type in PieceType]
+
+class _SearchAborted(Exception):
+    pass
+
+class Searcher:
+    def __init__(self, tt_entries: int = 1 << 20):
+        self.tt_entries = tt_entries
+        self.tt: Dict[int, Tuple[int, int, int, Optional[Move]]] = {}
+        self.history = {color: [[0] * 64 for _ in range(64)] for color in Color}
+        self.killers: List[List[Optional[Move]]] = [[None, None] for _ in range(MAX_PLY + 1)]
+        self.nodes = 0
+        self._stopped = False
+        self._deadline = None
+        self._max_nodes = None
+        self._max_depth = MAX_PLY
+        self._depth = 0
+        self._root_best = None
+
+    def clear(self):
+        # Forget everything learnt in earlier searches (new game)
+        self.tt.clear()
+        self.history = {color: [[0] * 64 for _ in range(64)] for color in Color}
+
+    def stop(self):
+        # Safe to call from another thread; the search returns its best so far.
+        # One that comes before search() starts ends that search at once.
+        self._stopped = True
+
+    def reset_stop(self):
+        # Called when the next search is set up, so a stop() aimed at an
+        # earlier one is not held against it
+        self._stopped = False
+
+    def ponderhit(self, max_depth: int = 64, movetime: Optional[float] = None,
+                  max_nodes: Optional[int] = None):
+        # Put limits on a running unlimited search, counted from now, so a
+        # ponder search goes on as the real one. Safe from another thread.
+        now = time.perf_counter()
+        self._max_depth = min(max_depth, MAX_PLY)
+        self._clock_start = now
+        self._deadline = now + movetime if movetime else None
+        self._max_nodes = self.nodes + max_nodes if max_nodes else None
+        if self._depth > self._max_depth:
+            self._stopped = True  # The depth asked for is already finished
+
+    def search(self, board: ChessBoard, max_depth: int = 64, movetime: Optional[float] = None,
+               max_nodes: Optional[int] = None, on_info: Optional[Callable[[Dict], None]] = None
+               ) -> Tuple[Optional[Move], int, Dict]:
+        # Iterative deepening. Returns (best move, score for the side to move,
+        # info for the last finished depth). movetime is in seconds.
+        self.board = board
+        self.nodes = 0
+        self._start = self._clock_start = time.perf_counter()
+        self._deadline = self._start + movetime if movetime else None
+        self._max_nodes = max_nodes
+        self._max_depth = min(max_depth, MAX_PLY)
+        self._depth = 0
+        self.killers = [[None, None] for _ in range(MAX_PLY + 1)]
+        if len(self.tt) > self.tt_entries:
+            self.tt.clear()
+        self._init_evaluation()
+
+        moves = board.generate_legal_moves()
+        if not moves:
+            score = -MATE_SCORE if board.is_in_check(board.current_player) else 0
+            return None, score, {'depth': 0, 'score': self._uci_score(score), 'nodes': 0, 'pv': []}
+
+        best_move, best_score, info = moves[0], 0, {}
+        for depth in range(1, MAX_PLY + 1):
+            # Checked every time round: ponderhit() may lower it, and a stop()
+            # that came before the search started ends it here
+            if depth > self._max_depth or self._stopped:
+                break
+            self._depth = depth
+            self._root_best = None
+            try:
+                score = self._negamax(depth, -INFINITY, INFINITY, 0)
+            except _SearchAborted:
+                # The first root move searched was last depth's best, so any
+                # move that has already beaten it is at least as good
+                if self._root_best is not None:
+                    best_move = self._root_best
+                break
+            best_move, best_score = self._root_best or best_move, score
+            info = self._info(depth, score)
+            if on_info:
+                on_info(info)
+            if abs(score) >= MATE_BOUND and MATE_SCORE - abs(score) <= depth:
+                break  # Forced mate found; deeper searches cannot improve on it
+            if self._deadline and time.perf_counter() - self._clock_start > (self._deadline - self._clock_start) / 2:
+                break  # The next depth would not finish in time
+        if not info:
+            info = self._info(0, best_score)
+        return best_move, best_score, info
+
+    def _info(self, depth: int, score: int) -> Dict:
+        # Same shape as engine_pool.parse_info_line gives for UCI engines
+        elapsed = time.perf_counter() - self._start
+        return {
+            'depth': depth,
+            'score': self._uci_score(score),
+            'nodes': self.nodes,
+            'nps': int(self.nodes / elapsed) if elapsed > 0 else 0,
+            'time': int(elapsed * 1000),
+            'pv': [move.uci() for move in self._principal_variation(depth)],
+        }
+
+    @staticmethod
+    def _uci_score(score: int) -> Dict:
+        if abs(score) >= MATE_BOUND:
+            plies = MATE_SCORE - abs(score)
+            moves = (plies + 1) // 2
+            return {'type': 'mate', 'value': moves if score > 0 else -moves}
+        return {'type': 'cp', 'value': score}
+
+    def _principal_variation(self, depth: int) -> List[Move]:
+        board = self.board
+        pv = []
+        seen = set()
+        while len(pv) < depth:
+            entry = self.tt.get(board.zobrist_key)
+            if not entry or entry[3] is None or board.zobrist_key in seen:
+                break
+            move = entry[3]
+            if move not in board.generate_legal_moves():
+                break
+            seen.add(board.zobrist_key)
+            pv.append(move)
+            board.push(move)
+        for _ in pv:
+            board.pop()
+        return pv
+
+    def _check_limits(self):
+        if (self._stopped or (self._deadline and time.perf_counter() >= self._deadline)
+                or (self._max_nodes and self.nodes >= self._max_nodes)):
+            raise _SearchAborted
+
+    # Evaluation
+
+    def _init_evaluation(self):
+        # Material and placement of everything but the kings, positive for
+        # White, plus the game phase; both are updated move by move
+        self.material = 0
+        self.phase = 0
+        for row in range(8):
+            for col in range(8):
+                piece = self.board.board[row][col]
+                if piece:
+                    self.material += SQUARE_VALUES[piece.code][row * 8 + col]
+                    self.phase += TYPE_PHASE_WEIGHTS[piece.type_code]
+
+    def _evaluate(self) -> int:
+        # Static score for the side to move
+        board = self.board
+        phase = min(self.phase, MAX_PHASE)
+        white_king = board.white_king_pos[0] * 8 + board.white_king_pos[1]
+        black_king = _mirror(board.black_king_pos[0] * 8 + board.black_king_pos[1])
+        middlegame = KING_MIDDLEGAME_TABLE[white_king] - KING_MIDDLEGAME_TABLE[black_king]
+        endgame = KING_ENDGAME_TABLE[white_king] - KING_ENDGAME_TABLE[black_king]
+        score = self.material + (middlegame * phase + endgame * (MAX_PHASE - phase)) // MAX_PHASE
+        return score if board.current_player == Color.WHITE else -score
+
+    def _move_delta(self, move: Move) -> Tuple[int, int]:
+        # (material change, phase change) the move will cause
+        board = self.board.board
+        start_row, start_col, end_row, end_col, promotion = move
+        piece = board[start_row][start_col]
+        start, end = start_row * 8 + start_col, end_row * 8 + end_col
+        moved = BB_PIECE_INDEX[piece.color, promotion] if promotion else piece.code
+        material = SQUARE_VALUES[moved][end] - SQUARE_VALUES[piece.code][start]
+        phase = PHASE_WEIGHTS[promotion] if promotion else 0
+
+        captured = board[end_row][end_col]
+        if captured:
+            material -= SQUARE_VALUES[captured.code][end]
+            phase -= TYPE_PHASE_WEIGHTS[captured.type_code]
+        elif piece.type_code == PAWN and start_col != end_col:
+            enemy_pawn = PAWN + 6 if piece.color_code == WHITE else PAWN
+            material -= SQUARE_VALUES[enemy_pawn][start_row * 8 + end_col]
+        elif piece.type_code == KING and abs(end_col - start_col) == 2:
+            rook_from, rook_to = (7, 5) if end_col == 6 else (0, 3)
+            rook = SQUARE_VALUES[piece.color_code * 6 + ROOK]
+            material += rook[start_row * 8 + rook_to] - rook[start_row * 8 + rook_from]
+        return material, phase
+
+    # Move ordering
+
+    def _capture_value(self, move: Move) -> int:
+        # MVV-LVA: most valuable victim first, cheapest attacker breaking ties;
+        # 0 for quiet moves
+        board = self.board.board
+        victim = board[move.end_row][move.end_col]
+        attacker = board[move.start_row][move.start_col]
+        if victim:
+            return 10 * TYPE_VALUES[victim.type_code] - TYPE_VALUES[attacker.type_code] + 10_000
+        if attacker.type_code == PAWN and move.start_col != move.end_col:
+            return 10 * TYPE_VALUES[PAWN] - TYPE_VALUES[PAWN] + 10_000
+        return 0
+
+    def _order_moves(self, moves: List[Move], tt_move: Optional[Move], ply: int) -> List[Move]:
+        killers = self.killers[ply]
+        history = self.history[self.board.current_player]
+
+        def priority(move: Move) -> int:
+            if move == tt_move:
+                return 1 << 30
+            capture = self._capture_value(move)
+            if capture:
+                return (1 << 24) + capture
+            if move.promotion:
+                return (1 << 23) + PIECE_VALUES[move.promotion]
+            if move == killers[0]:
+                return 1 << 22
+            if move == killers[1]:
+                return (1 << 22) - 1
+            return history[move.start_row * 8 + move.start_col][move.end_row * 8 + move.end_col]
+
+        return sorted(moves, key=priority, reverse=True)
+
+    # Search
+
+    def _negamax(self, depth: int, alpha: int, beta: int, ply: int) -> int:
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self._check_limits()
+        board = self.board
+        if ply and (board.halfmove_clock >= 100 or board.is_repetition(2)):
+            return 0
+
+        key = board.zobrist_key
+        entry = self.tt.get(key)
+        tt_move = None
+        if entry:
+            entry_depth, entry_score, flag, tt_move = entry
+            if ply and entry_depth >= depth:
+                # Mate scores are stored relative to the node, not the root
+                if entry_score >= MATE_BOUND:
+                    entry_score -= ply
+                elif entry_score <= -MATE_BOUND:
+                    entry_score += ply
+                if (flag == TT_EXACT or (flag == TT_LOWER and entry_score >= beta)
+                        or (flag == TT_UPPER and entry_score <= alpha)):
+                    return entry_score
+
+        in_check = board.is_in_check(board.current_player)
+        if in_check:
+            depth += 1  # Check extension: never drop into quiescence in check
+        if depth <= 0:
+            return self._quiesce(alpha, beta, ply)
+        if ply >= MAX_PLY:
+            return self._evaluate()
+
+        moves = board.generate_legal_moves()
+        if not moves:
+            return -MATE_SCORE + ply if in_check else 0
+
+        original_alpha = alpha
+        best_score, best_move = -INFINITY, None
+        for index, move in enumerate(self._order_moves(moves, tt_move, ply)):
+            material, phase = self._move_delta(move)
+            quiet = not self._capture_value(move) and not move.promotion
+            self.material += material
+            self.phase += phase
+            board.push(move)
+            try:
+                if index == 0:
+                    score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+                else:
+                    # Principal variation search: prove the move is no better
+                    # with a null window, and search properly only if it is
+                    score = -self._negamax(depth - 1, -alpha - 1, -alpha, ply + 1)
+                    if alpha < score < beta:
+                        score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                board.pop()
+                self.material -= material
+                self.phase -= phase
+
+            if score > best_score:
+                best_score, best_move = score, move
+                if ply == 0:
+                    self._root_best = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if quiet:
+                    killers = self.killers[ply]
+                    if move != killers[0]:
+                        killers[1], killers[0] = killers[0], move
+                    from_square = move.start_row * 8 + move.start_col
+                    self.history[board.current_player][from_square][move.end_row * 8 + move.end_col] += depth * depth
+                break
+
+        if best_score <= original_alpha:
+            flag = TT_UPPER
+        elif best_score >= beta:
+            flag = TT_LOWER
+        else:
+            flag = TT_EXACT
+        stored = best_score
+        if stored >= MATE_BOUND:
+            stored += ply
+        elif stored <= -MATE_BOUND:
+            stored -= ply
+        # A fail-low says nothing about which move is best; keep the old one
+        self.tt[key] = (depth, stored, flag, best_move if flag != TT_UPPER else tt_move)
+        return best_score
+
+    def _quiesce(self, alpha: int, beta: int, ply: int) -> int:
+        # Only captures and promotions, so the static score is taken in a
+        # quiet position rather than halfway through an exchange
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self._check_limits()
+        stand_pat = self._evaluate()
+        if stand_pat >= beta or ply >= MAX_PLY:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        board = self.board
+        noisy = [(self._capture_value(move), move) for move in board.generate_legal_moves()
+                 if move.promotion or board.board[move.end_row][move.end_col]
+                 or (move.start_col != move.end_col
+                     and board.board[move.start_row][move.start_col].type_code == PAWN)]
+        noisy.sort(key=lambda item: item[0], reverse=True)
+        for _, move in noisy:
+            material, phase = self._move_delta(move)
+            self.material += material
+            self.phase += phase
+            board.push(move)
+            try:
+                score = -self._quiesce(-beta, -alpha, ply + 1)
+            finally:
+                board.pop()
+                self.material -= material
+                self.phase -= phase
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+class BuiltinEngine:
+    # Searcher behind the UCIEngine calls used by EnginePool and AsyncEngine
+    def __init__(self, depth: int = 64, movetime: Optional[int] = 1000, max_nodes: Optional[int] = None,
+                 skill_level: Optional[int] = None, tt_entries: int = 1 << 20):
+        # movetime (ms) and max_nodes cap every search on top of its depth
+        self.name = 'Built-in alpha-beta'
+        self.path = 'builtin'
+        self.depth = depth
+        self.movetime = movetime
+        self.max_nodes = max_nodes
+        self.timeout = None
+        self.searcher = Searcher(tt_entries)
+        self.board = ChessBoard('bitboard')
+        self._max_depth = MAX_PLY
+        self._ponder_limits = None  # What a ponder search gets on ponderhit()
+        if skill_level is not None:
+            self.set_skill_level(skill_level)
+
+    def set_option(self, name: str, value):
+        if name == 'Skill Level':
+            self.set_skill_level(int(value))
+
+    def set_skill_level(self, skill_level: int):
+        # No randomness, just a shallower search: 0 looks 1 ply ahead, 20 is unlimited
+        self._max_depth = MAX_PLY if skill_level >= 20 else 1 + skill_level // 4
+
+    def set_depth(self, depth: int):
+        self.depth = depth
+
+    def new_game(self):
+        self.searcher.clear()
+
+    def set_fen_position(self, fen: str, moves: Optional[List[str]] = None):
+        # Every request sets a position first, so a stop() from here on
+        # belongs to the search about to run
+        self.searcher.reset_stop()
+        self.board = ChessBoard.from_fen(fen, backend='bitboard')
+        for uci in moves or []:
+            move = next((m for m in self.board.generate_legal_moves() if m.uci() == uci), None)
+            if move is None:
+                raise ValueError(f"Illegal move in position: {uci}")
+            self.board.push(move)
+
+    def set_position(self, moves: Optional[List[str]] = None):
+        self.set_fen_position(START_FEN, moves)
+
+    def go(self, command: str, on_info: Optional[Callable[[Dict], None]] = None,
+           timeout: Optional[float] = None) -> Tuple[Optional[str], Optional[str], Dict]:
+        # Understands the UCI limits 'depth', 'movetime', 'nodes', the clock
+        # fields, 'infinite' (which runs until stop()) and 'ponder' (which
+        # runs until stop() or until ponderhit() applies the other limits).
+        # The search runs in this thread, so `timeout` just caps its time.
+        tokens = command.split()
+        limits = {}
+        for name in ('depth', 'movetime', 'nodes', 'wtime', 'btime', 'winc', 'binc', 'movestogo'):
+            if name in tokens:
+                limits[name] = int(tokens[tokens.index(name) + 1])
+        infinite = 'infinite' in tokens
+
+        depth = limits.get('depth', self.depth)
+        side = 'w' if self.board.current_player == Color.WHITE else 'b'
+        if 'movetime' in limits:
+            movetime = limits['movetime']
+        elif f'{side}time' in limits:
+            # Spend a slice of the remaining clock
+            remaining = limits[f'{side}time']
+            movetime = remaining // limits.get('movestogo', 30) + limits.get(f'{side}inc', 0) // 2
+            movetime = max(1, min(movetime, remaining // 2))
+        else:
+            movetime = None if infinite else self.movetime
+        max_nodes = limits.get('nodes', None if infinite else self.max_nodes)
+        depth = min(depth, self._max_depth)
+        movetime = movetime / 1000 if movetime else None
+
+        if 'ponder' in tokens:
+            self._ponder_limits = (depth, movetime, max_nodes)
+            depth, movetime, max_nodes = self._max_depth, None, None
+        if timeout is not None:
+            movetime = min(movetime or timeout, timeout)
+        try:
+            best, _, info = self.searcher.search(self.board, depth, movetime, max_nodes, on_info)
+        finally:
+            self._ponder_limits = None
+        pv = info.get('pv', [])
+        ponder = pv[1] if len(pv) > 1 else None
+        return (best.uci() if best else None), ponder, info
+
+    def analyse(self, depth: Optional[int] = None, on_info: Optional[Callable[[Dict], None]] = None,
+                ponder: bool = False) -> Tuple[Optional[str], Optional[str], Dict]:
+        command = "go ponder depth" if ponder else "go depth"
+        best, reply, info = self.go(f"{command} {depth or self.depth}", on_info)
+        return best, reply, self._white_score(info['score'])
+
+    def stop(self):
+        self.searcher.stop()
+
+    def ponderhit(self):
+        limits = self._ponder_limits
+        if limits is not None:
+            self.searcher.ponderhit(*limits)
+
+    def get_best_move(self, depth: Optional[int] = None, movetime: Optional[int] = None) -> Optional[str]:
+        if movetime is not None:
+            best, _, _ = self.go(f"go movetime {movetime}")
+        else:
+            best, _, _ = self.go(f"go depth {depth or self.depth}")
+        return best
+
+    def get_evaluation(self, depth: Optional[int] = None) -> Dict:
+        _, _, evaluation = self.analyse(depth)
+        return evaluation
+
+    def _white_score(self, score: Dict) -> Dict:
+        if self.board.current_player == Color.WHITE:
+            return dict(score)
+        return {'type': score['type'], 'value': -score['value']}
+
+    def is_alive(self) -> bool:
+        return True
+
+    def ping(self, timeout: Optional[float] = None) -> bool:
+        return True
+
+    def quit(self):
+        self.searcher.stop()
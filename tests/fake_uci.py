@@ -0,0 +1,76 @@
+"""A stand-in UCI engine for the engine_pool tests.
+
+It knows nothing about chess: every search reports one info line per depth
+and answers "bestmove e2e4 ponder e7e5". FAKE_UCI_MODE picks a misbehaviour:
+
+    hang       never finishes the uci handshake
+    no-ready   finishes the handshake but ignores isready
+    crash      exits as soon as it is asked to search
+"""
+import os
+import sys
+import threading
+import time
+
+MODE = os.environ.get('FAKE_UCI_MODE', '')
+DELAY = float(os.environ.get('FAKE_UCI_DELAY', '0.001'))  # Seconds per depth
+
+stop = threading.Event()
+pondering = threading.Event()
+write_lock = threading.Lock()
+
+def out(line: str):
+    with write_lock:
+        sys.stdout.write(line + '\n')
+        sys.stdout.flush()
+
+def search(tokens):
+    depth = int(tokens[tokens.index('depth') + 1]) if 'depth' in tokens else None
+    current = 0
+    while not stop.is_set():
+        if depth is not None and current >= depth and not pondering.is_set():
+            break
+        current += 1
+        out(f"info depth {current} score cp {10 + current} nodes {current * 100} pv e2e4 e7e5")
+        time.sleep(DELAY)
+    pondering.clear()
+    out("bestmove e2e4 ponder e7e5")
+
+def main():
+    searcher = None
+    for line in sys.stdin:
+        tokens = line.split()
+        if not tokens:
+            continue
+        command = tokens[0]
+        if command == 'uci':
+            if MODE == 'hang':
+                continue
+            out("id name Fake UCI")
+            out("option name Threads type spin default 1 min 1 max 64")
+            out("option name Hash type spin default 16 min 1 max 1024")
+            out("uciok")
+        elif command == 'isready':
+            if MODE != 'no-ready':
+                out("readyok")
+        elif command == 'go':
+            if MODE == 'crash':
+                os._exit(3)
+            stop.clear()
+            if 'ponder' in tokens or 'infinite' in tokens:
+                pondering.set()
+            searcher = threading.Thread(target=search, args=(tokens,))
+            searcher.start()
+        elif command == 'ponderhit':
+            pondering.clear()
+        elif command == 'stop':
+            pondering.clear()
+            stop.set()
+            if searcher is not None:
+                searcher.join()
+        elif command == 'quit':
+            stop.set()
+            break
+
+if __name__ == '__main__':
+    main()
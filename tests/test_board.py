@@ -0,0 +1,30 @@
+import pytest
+
+from chess import BitboardChessBoard, ChessBoard, Color, PERFT_POSITIONS
+
+def attack_state(board):
+    return ([board.attacks(color) for color in Color],
+            [board.attack_count(row, col, color) for color in Color for row in range(8) for col in range(8)],
+            [board.is_square_attacked(row, col, color) for color in Color for row in range(8) for col in range(8)])
+
+def test_backend_names():
+    assert ChessBoard('mailbox').backend == 'mailbox'
+    assert ChessBoard('bitboard').backend == 'bitboard'
+    assert type(ChessBoard('bitboard')) is BitboardChessBoard
+    assert BitboardChessBoard().backend == 'bitboard'
+
+@pytest.mark.parametrize('name, fen', [(name, fen) for name, fen, _ in PERFT_POSITIONS])
+def test_backends_agree_on_attacks(name, fen):
+    # The bitboard backend answers attack queries from its piece sets rather
+    # than keeping the mailbox attack maps, so check the two after each move
+    mailbox = ChessBoard.from_fen(fen, 'mailbox')
+    bitboard = ChessBoard.from_fen(fen, 'bitboard')
+    assert attack_state(bitboard) == attack_state(mailbox)
+    for move in mailbox.generate_legal_moves():
+        mailbox.push(move)
+        bitboard.push(move)
+        assert attack_state(bitboard) == attack_state(mailbox)
+        assert bitboard.copy().to_fen() == mailbox.to_fen()
+        mailbox.pop()
+        bitboard.pop()
+    assert attack_state(bitboard) == attack_state(mailbox)
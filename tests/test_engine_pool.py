@@ -0,0 +1,166 @@
+import os
+import signal
+import subprocess
+import sys
+
+import pytest
+
+import engine_pool
+from engine_pool import EngineError, EnginePool, UCIEngine
+
+FAKE_UCI = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_uci.py')
+
+@pytest.fixture(scope='module')
+def engine_path(tmp_path_factory):
+    # UCIEngine runs its path with no arguments, so wrap the script
+    path = tmp_path_factory.mktemp('engine') / 'fake-engine'
+    path.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_UCI}" "$@"\n')
+    path.chmod(0o755)
+    return str(path)
+
+@pytest.fixture
+def processes(monkeypatch):
+    # Every engine process started during the test
+    started = []
+    popen = subprocess.Popen
+
+    def record(*args, **kwargs):
+        process = popen(*args, **kwargs)
+        started.append(process)
+        return process
+    monkeypatch.setattr(engine_pool.subprocess, 'Popen', record)
+    return started
+
+def test_analyse(engine_path):
+    engine = UCIEngine(engine_path)
+    try:
+        assert engine.name == 'Fake UCI'
+        engine.set_fen_position('rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1')
+        assert engine.analyse(4) == ('e2e4', 'e7e5', {'type': 'cp', 'value': 14})
+        # Scores come back from White's point of view
+        engine.set_fen_position('rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1')
+        assert engine.get_evaluation(3) == {'type': 'cp', 'value': -13}
+    finally:
+        engine.quit()
+    assert not engine.is_alive()
+
+def test_stop_ends_infinite_search(engine_path):
+    engine = UCIEngine(engine_path)
+    try:
+        depths = []
+
+        def on_info(info):
+            depths.append(info['depth'])
+            if len(depths) == 5:
+                engine.stop()
+        best, _, _ = engine.go('go infinite', on_info)
+        assert best == 'e2e4'
+        assert 5 <= len(depths) < 50
+    finally:
+        engine.quit()
+
+@pytest.mark.parametrize('mode', ['hang', 'no-ready'])
+def test_failed_handshake_reaps_process(engine_path, processes, monkeypatch, mode):
+    monkeypatch.setenv('FAKE_UCI_MODE', mode)
+    with pytest.raises(EngineError):
+        UCIEngine(engine_path, timeout=0.3)
+    assert len(processes) == 1
+    assert processes[0].poll() is not None
+
+def test_missing_engine():
+    with pytest.raises(EngineError):
+        UCIEngine('/nonexistent/engine')
+
+def test_checkout_and_checkin(engine_path):
+    with EnginePool(engine_path, size=2) as pool:
+        first = pool.checkout()
+        second = pool.checkout()
+        assert first is not second
+        with pytest.raises(EngineError):
+            pool.checkout(timeout=0.1)
+        pool.checkin(first)
+        assert pool.checkout(timeout=1) is first
+        pool.checkin(first)
+        pool.checkin(second)
+
+        with pool.engine() as engine:
+            assert engine.analyse(2)[0] == 'e2e4'
+        results = [pool.submit(lambda engine, depth: engine.analyse(depth)[0], 3) for _ in range(6)]
+        assert [future.result(timeout=10) for future in results] == ['e2e4'] * 6
+        assert pool.restarts == 0
+
+def test_crash_during_search_restarts(engine_path, monkeypatch):
+    monkeypatch.setenv('FAKE_UCI_MODE', 'crash')
+    with EnginePool(engine_path, size=1) as pool:
+        with pytest.raises(EngineError):
+            with pool.engine() as engine:
+                engine.analyse(2)
+        assert not engine.is_alive()
+        assert pool.restarts == 1
+        replacement = pool.checkout(timeout=1)
+        assert replacement is not engine and replacement.is_alive()
+        pool.checkin(replacement)
+
+def test_dead_idle_engine_restarts_on_checkout(engine_path):
+    with EnginePool(engine_path, size=1) as pool:
+        engine = pool.checkout()
+        pool.checkin(engine)
+        engine._process.kill()
+        engine._process.wait()
+        replacement = pool.checkout(timeout=1)
+        assert replacement is not engine and replacement.ping(1)
+        assert pool.restarts == 1
+        pool.checkin(replacement)
+
+def test_health_check_restarts_unresponsive_engine(engine_path):
+    with EnginePool(engine_path, size=2, health_timeout=0.3) as pool:
+        assert pool.health_check() == 0
+        stuck = pool.checkout()
+        pool.checkin(stuck)
+        os.kill(stuck._process.pid, signal.SIGSTOP)
+        try:
+            assert pool.health_check() == 1
+        finally:
+            if stuck.is_alive():
+                os.kill(stuck._process.pid, signal.SIGCONT)
+        assert not stuck.is_alive()
+        engines = [pool.checkout(timeout=1) for _ in range(2)]
+        assert stuck not in engines
+        for engine in engines:
+            pool.checkin(engine)
+
+def test_close(engine_path, processes):
+    pool = EnginePool(engine_path, size=2)
+    engine = pool.checkout()
+    # Shuts down checked-out engines too; handing one back is harmless
+    pool.close()
+    assert len(processes) == 2
+    assert all(process.poll() is not None for process in processes)
+    with pytest.raises(EngineError):
+        pool.checkout(timeout=0.1)
+    pool.checkin(engine)
+
+def test_go_deadline(engine_path):
+    with EnginePool(engine_path, size=1) as pool:
+        with pytest.raises(EngineError, match='timed out'):
+            with pool.engine() as engine:
+                engine.go('go infinite', timeout=0.2)
+        # Still searching, so it was replaced rather than pooled
+        assert pool.restarts == 1
+        with pool.engine() as engine:
+            assert engine.go('go depth 2', timeout=5)[0] == 'e2e4'
+
+def test_exception_in_on_info_replaces_engine(engine_path):
+    def on_info(info):
+        raise RuntimeError("callback failed")
+
+    with EnginePool(engine_path, size=1) as pool:
+        with pytest.raises(RuntimeError):
+            with pool.engine() as engine:
+                engine.go('go infinite', on_info)
+        assert pool.restarts == 1
+        # The new engine answers its own search, not the abandoned one
+        with pool.engine() as engine:
+            depths = []
+            engine.go('go depth 3', lambda info: depths.append(info['depth']))
+            assert depths == [1, 2, 3]
@@ -0,0 +1,52 @@
+import pytest
+
+from eval_cache import EvaluationCache
+
+FEN = 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1'
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / 'cache.json')
+    cache = EvaluationCache(path=path)
+    cache.put(FEN, 15, {'type': 'cp', 'value': 30, 'best': 'e7e5'})
+    cache.save()
+    # Move clocks are not part of the key
+    assert EvaluationCache(path=path).get(FEN.replace(' 0 1', ' 3 9'), 15) == \
+        {'type': 'cp', 'value': 30, 'best': 'e7e5'}
+
+@pytest.mark.parametrize('content', [
+    '[]',
+    '"cache"',
+    '{"entries": 3}',
+    '{"entries": [["a", 15]]}',
+    '{"entries": [["a", "15", {}]]}',
+    '{"entries": [["a", 15, {}], null]}',
+    '{"entries": ',
+])
+def test_bad_file_is_ignored(tmp_path, capsys, content):
+    path = tmp_path / 'cache.json'
+    path.write_text(content)
+    cache = EvaluationCache(path=str(path))
+    assert len(cache) == 0
+    assert 'Could not read evaluation cache' in capsys.readouterr().err
+
+def test_lru_eviction():
+    cache = EvaluationCache(max_entries=2)
+    for depth in (1, 2):
+        cache.put(FEN, depth, {'type': 'cp', 'value': depth})
+    cache.get(FEN, 1)
+    cache.put(FEN, 3, {'type': 'cp', 'value': 3})
+    assert cache.get(FEN, 2) is None
+    assert cache.get(FEN, 1) == {'type': 'cp', 'value': 1}
+    assert cache.get(FEN, 3) == {'type': 'cp', 'value': 3}
+
+def test_en_passant_square_only_counts_when_capturable():
+    # 1. e4 leaves e3 in the FEN, but no black pawn can take on it, so the
+    # same position reached without a double push finds the entry
+    cache = EvaluationCache()
+    cache.put(FEN.replace(' - ', ' e3 '), 10, {'type': 'cp', 'value': 30})
+    assert cache.get(FEN, 10) == {'type': 'cp', 'value': 30}
+
+    capturable = 'rnbqkbnr/ppp1pppp/8/8/3pP3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 3'
+    cache.put(capturable, 10, {'type': 'cp', 'value': 5})
+    assert cache.get(capturable.replace(' e3 ', ' - '), 10) is None
+    assert cache.get(capturable, 10) == {'type': 'cp', 'value': 5}
@@ -0,0 +1,29 @@
+import pytest
+
+from chess import ChessBoard, START_FEN
+
+@pytest.mark.parametrize('backend', ['mailbox', 'bitboard'])
+@pytest.mark.parametrize('fen', [
+    START_FEN,
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+    'rnbqkbnr/pp1ppppp/8/2p5/4P3/8/PPPP1PPP/RNBQKBNR w KQkq c6 0 2',
+    '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+])
+def test_round_trip(backend, fen):
+    assert ChessBoard.from_fen(fen, backend).to_fen() == fen
+
+@pytest.mark.parametrize('placement', [
+    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNRR',  # A ninth piece
+    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBN2',   # A digit past the h-file
+    'rnbqkbnr/pppppppp/8/8/8/p71/PPPPPPPP/RNBQKBNR', # Digits adding up to nine...
+    'rnbqkbnr/pppppppp/8/8/8/9/PPPPPPPP/RNBQKBNR',
+    'rnbqkbnr/pppppppp/8/8/8/7/PPPPPPPP/RNBQKBNR',   # ...or to seven
+])
+def test_rank_not_covering_eight_squares(placement):
+    with pytest.raises(ValueError, match='does not cover 8 squares'):
+        ChessBoard.from_fen(f'{placement} w KQkq - 0 1')
+
+def test_adjacent_digits():
+    # Adds up to eight, but no FEN writer produces it
+    with pytest.raises(ValueError, match='adjacent digits'):
+        ChessBoard.from_fen('rnbqkbnr/pppppppp/8/8/8/71/PPPPPPPP/RNBQKBNR w KQkq - 0 1')
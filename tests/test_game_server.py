@@ -0,0 +1,183 @@
+import asyncio
+import os
+import struct
+from contextlib import asynccontextmanager
+
+import pytest
+
+import game_server
+from engine_pool import EnginePool
+from game_server import (Client, EngineScheduler, GameServer, MAX_MESSAGE, WebSocketChannel, _frame,
+                         _xor_mask, connect)
+from search import BuiltinEngine
+
+@asynccontextmanager
+async def running(server: GameServer):
+    # The server on a free local port; yields the port
+    if server.scheduler is not None:
+        server.scheduler.start()
+    listener = await asyncio.start_server(server.handle_connection, '127.0.0.1', 0, limit=MAX_MESSAGE)
+    try:
+        yield listener.sockets[0].getsockname()[1]
+    finally:
+        listener.close()
+        if server.scheduler is not None:
+            server.scheduler.stop()
+
+async def client(port: int, websocket: bool = False) -> Client:
+    return Client(await connect('127.0.0.1', port, websocket))
+
+@pytest.fixture
+def pool():
+    pool = EnginePool('builtin', size=2, depth=1, engine_factory=lambda: BuiltinEngine(movetime=200))
+    yield pool
+    pool.close()
+
+@pytest.mark.parametrize('websocket', [False, True])
+def test_round_trip(pool, websocket):
+    async def play():
+        async with running(GameServer(EngineScheduler(pool, depth=1))) as port:
+            player = await client(port, websocket)
+            state = await player.request(op='new', engine='black')
+            assert state['played'] == [] and 'e2e4' in state['legal']
+            state = await player.request(op='move', game=state['game'], move='e4')
+            assert state['played'][0] == {'uci': 'e2e4', 'san': 'e4'}
+            assert len(state['played']) == 2  # And the engine's reply
+            assert ' w ' in state['fen']
+            stats = await player.request(op='close', game=state['game'])
+            assert stats['closed'] and stats['moves'] == 2
+            error = await player.request(op='teleport')
+            assert 'unknown op' in error['error']
+            await player.close()
+    asyncio.run(play())
+
+def test_games_belong_to_their_connection():
+    async def play():
+        async with running(GameServer(None)) as port:
+            owner, other = await client(port), await client(port)
+            game = (await owner.request(op='new'))['game']
+            for request in ({'op': 'move', 'move': 'e2e4'}, {'op': 'state'}, {'op': 'close'}, {'op': 'stats'}):
+                assert (await other.request(game=game, **request))['error'] == f"no game {game}"
+            assert (await owner.request(op='move', game=game, move='e2e4'))['played'][0]['san'] == 'e4'
+            await owner.close()
+            await other.close()
+    asyncio.run(play())
+
+class FakePool:
+    size = 1
+    depth = 1
+
+def test_scheduler_serves_owners_round_robin():
+    async def run():
+        scheduler = EngineScheduler(FakePool())
+        searches = [asyncio.create_task(scheduler.search(owner, f"{owner}{i}"))
+                    for owner, count in (('a', 3), ('b', 1), ('c', 2)) for i in range(count)]
+        await asyncio.sleep(0)
+        assert scheduler.pending == 6
+        order = []
+        for _ in range(6):
+            fen, future, _ = await scheduler._next()
+            order.append(fen)
+            future.set_result((None, {}))
+        await asyncio.gather(*searches)
+        return order
+    assert asyncio.run(run()) == ['a0', 'b0', 'c0', 'a1', 'c1', 'a2']
+
+def test_search_waits_once_max_pending_is_reached():
+    async def run():
+        scheduler = EngineScheduler(FakePool(), max_pending=2)
+        searches = [asyncio.create_task(scheduler.search(owner, owner)) for owner in 'abc']
+        await asyncio.sleep(0.01)
+        assert scheduler.pending == 2
+        assert 'c' not in scheduler._queues
+        fen, future, _ = await scheduler._next()
+        future.set_result((None, {}))
+        await asyncio.sleep(0.01)
+        assert scheduler.pending == 2 and 'c' in scheduler._queues
+        for _ in range(2):
+            fen, future, _ = await scheduler._next()
+            future.set_result((None, {}))
+        await asyncio.gather(*searches)
+    asyncio.run(run())
+
+def frame(opcode: int, payload: bytes, fin: bool = True, masked: bool = True) -> bytes:
+    # Client frames built by hand, so tests can break the rules
+    head = struct.pack('!BB', (0x80 if fin else 0) | opcode, (0x80 if masked else 0) | len(payload))
+    if not masked:
+        return head + payload
+    mask = os.urandom(4)
+    return head + mask + _xor_mask(payload, mask)
+
+async def rejected(port: int, data: bytes) -> bool:
+    # Whether the server answers `data` by closing the connection
+    channel = await connect('127.0.0.1', port, websocket=True)
+    channel.writer.write(data)
+    try:
+        return await asyncio.wait_for(channel.recv(), 5) is None
+    finally:
+        channel.writer.close()
+
+def test_websocket_rejects_unmasked_frames():
+    async def run():
+        async with running(GameServer(None)) as port:
+            assert await rejected(port, frame(0x1, b'{"op": "new"}', masked=False))
+            assert not await rejected(port, frame(0x1, b'{"op": "new"}'))
+    asyncio.run(run())
+
+def test_websocket_limits_fragmented_messages(monkeypatch):
+    monkeypatch.setattr(game_server, 'MAX_MESSAGE', 100)
+
+    async def run():
+        async with running(GameServer(None)) as port:
+            # Each fragment is small; together they are too much
+            fragments = frame(0x1, b' ' * 60, fin=False) + frame(0x0, b' ' * 60, fin=False)
+            assert await rejected(port, fragments)
+            # A ping between fragments does not count towards the message
+            message = (frame(0x1, b'{"op":', fin=False) + frame(0x9, b'x' * 90) +
+                       frame(0x0, b' "nop"}' + b' ' * 50))
+            assert not await rejected(port, message)
+    asyncio.run(run())
+
+class RecordingWriter:
+    def __init__(self):
+        self.written = []
+
+    def write(self, data: bytes):
+        self.written.append(data)
+
+    def is_closing(self) -> bool:
+        return False
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+@pytest.mark.parametrize('control, reply', [(0x9, 0xA), (0x8, 0x8)])
+def test_control_frames_follow_buffered_responses(control, reply):
+    async def run():
+        reader = asyncio.StreamReader()
+        writer = RecordingWriter()
+        channel = WebSocketChannel(reader, writer)
+        await channel.send('response')  # Buffered until the loop comes round
+        reader.feed_data(frame(control, b''))
+        reader.feed_eof()
+        await channel.recv()
+        data = b''.join(writer.written)
+        response = _frame(0x1, b'response', False)
+        assert data.startswith(response)
+        assert data[len(response)] & 0x0F == reply
+    asyncio.run(run())
+
+def test_games_per_connection_are_capped():
+    async def play():
+        async with running(GameServer(None, max_games=5, max_games_per_connection=2)) as port:
+            greedy, other = await client(port), await client(port)
+            for _ in range(2):
+                assert 'game' in await greedy.request(op='new')
+            assert 'too many games' in (await greedy.request(op='new'))['error']
+            assert 'game' in await other.request(op='new')
+            await greedy.close()
+            await other.close()
+    asyncio.run(play())
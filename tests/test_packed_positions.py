@@ -0,0 +1,85 @@
+import pytest
+
+from chess import ChessBoard, START_FEN
+from packed_positions import RECORD_SIZE, PositionFile, PositionWriter, encode, encode_fen
+
+POSITIONS = [
+    (START_FEN, None, None),
+    ('rnbqkbnr/pp1ppppp/8/2p5/4P3/8/PPPP1PPP/RNBQKBNR w KQkq c6 0 2', {'type': 'cp', 'value': 35}, '1-0'),
+    ('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R b Kq - 12 40', {'type': 'mate', 'value': -3}, '0-1'),
+    ('8/8/8/8/8/8/8/K1k5 w - - 99 300', {'type': 'cp', 'value': 0}, '1/2-1/2'),
+]
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / 'positions.bin')
+    with PositionWriter(path) as writer:
+        for fen, evaluation, result in POSITIONS[:2]:
+            writer.write(ChessBoard.from_fen(fen), evaluation, result)
+        for fen, evaluation, result in POSITIONS[2:]:
+            writer.write_fen(fen, evaluation, result)
+        assert writer.count == len(POSITIONS)
+    return path
+
+def test_round_trip(path):
+    with PositionFile(path) as positions:
+        assert len(positions) == len(POSITIONS)
+        for index, (fen, evaluation, result) in enumerate(POSITIONS):
+            assert positions.fen(index) == fen
+            assert positions[index].evaluation == evaluation
+            assert positions[index].result == result
+            assert positions.board(index).to_fen() == fen
+        assert [position.fen() for position in positions] == [fen for fen, _, _ in POSITIONS]
+
+def test_board_and_text_encodings_agree():
+    for fen, evaluation, result in POSITIONS:
+        assert encode(ChessBoard.from_fen(fen), evaluation, result) == encode_fen(fen, evaluation, result)
+
+def test_append_and_copy(path, tmp_path):
+    copy = str(tmp_path / 'copy.bin')
+    with PositionFile(path) as positions, PositionWriter(copy) as writer:
+        writer.write_packed(positions.raw(-1))
+    with PositionWriter(copy, append=True) as writer:
+        writer.write_fen(START_FEN)
+    with PositionFile(copy) as positions:
+        assert [position.fen() for position in positions] == [POSITIONS[-1][0], START_FEN]
+
+@pytest.mark.parametrize('index', [-5, 4, 100])
+def test_index_out_of_range(path, index):
+    with PositionFile(path) as positions:
+        with pytest.raises(IndexError):
+            positions[index]
+        with pytest.raises(IndexError):
+            positions.raw(index)
+
+def test_raw_negative_index(path):
+    with PositionFile(path) as positions:
+        assert positions.raw(-1) == positions.raw(len(positions) - 1)
+        assert len(positions.raw(0)) == RECORD_SIZE
+
+def test_bad_files(tmp_path):
+    bad = tmp_path / 'bad.bin'
+    bad.write_bytes(b'NOTCHESS' + bytes(8))
+    with pytest.raises(ValueError, match='not a position file'):
+        PositionFile(str(bad))
+    short = tmp_path / 'short.bin'
+    short.write_bytes(b'CHESS')
+    with pytest.raises(ValueError, match='too short'):
+        PositionFile(str(short))
+
+def test_truncated_file_cannot_be_appended_to(path):
+    with open(path, 'ab') as f:
+        f.write(bytes(RECORD_SIZE // 2))
+    with pytest.raises(ValueError, match='truncated'):
+        PositionWriter(path, append=True)
+    with PositionFile(path) as positions:
+        assert len(positions) == len(POSITIONS)  # The partial record is not counted
+
+def test_array(path):
+    pytest.importorskip('numpy')
+    with PositionFile(path) as positions:
+        records = positions.array()
+        assert len(records) == len(POSITIONS)
+        assert list(records['fullmove_number']) == [1, 2, 40, 300]
+        assert records['eval'][1] == 35
+        del records  # close() cannot unmap memory still in use
@@ -0,0 +1,100 @@
+import random
+
+import pytest
+
+from chess import ChessBoard, START_FEN
+from pgn_analysis import read_games
+from polyglot import ENTRY, OpeningBook, build_book, encode_move, main, polyglot_key, write_book
+
+PGN = '''[Event "a"]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 Nc6 1-0
+
+[Event "b"]
+[Result "1/2-1/2"]
+
+1. e4 c5 2. Nf3 1/2-1/2
+
+[Event "c"]
+[Result "0-1"]
+
+1. d4 d5 0-1
+'''
+
+# Keys from the Polyglot specification
+SPEC_KEYS = [
+    ([], 0x463b96181691fc9c),
+    (['e2e4'], 0x823c9b50fd114196),
+    (['e2e4', 'd7d5'], 0x0756b94461c50fb0),
+    (['e2e4', 'd7d5', 'e4e5'], 0x662fafb965db29d4),
+    (['e2e4', 'd7d5', 'e4e5', 'f7f5'], 0x22a48b5a8e47ff78),
+    (['e2e4', 'd7d5', 'e4e5', 'f7f5', 'e1e2'], 0x652a607ca3f242c1),
+    (['e2e4', 'd7d5', 'e4e5', 'f7f5', 'e1e2', 'e8f7'], 0x00fdd303c946bdd9),
+    (['a2a4', 'b7b5', 'h2h4', 'b5b4', 'c2c4'], 0x3c8123ea7b067637),
+    (['a2a4', 'b7b5', 'h2h4', 'b5b4', 'c2c4', 'b4c3', 'a1a3'], 0x5c3f9b829b279560),
+]
+
+def board_after(moves):
+    board = ChessBoard.from_fen(START_FEN, backend='bitboard')
+    for uci in moves:
+        board.push(next(m for m in board.generate_legal_moves() if m.uci() == uci))
+    return board
+
+@pytest.fixture
+def book_path(tmp_path):
+    path = str(tmp_path / 'book.bin')
+    write_book(path, build_book(read_games(PGN.splitlines(keepends=True)), plies=4))
+    return path
+
+@pytest.mark.parametrize('moves, key', SPEC_KEYS)
+def test_polyglot_key(moves, key):
+    assert polyglot_key(board_after(moves)) == key
+
+def test_build_and_probe(book_path):
+    def weights(moves):
+        return {entry.move.uci(): entry.weight for entry in book.entries(board_after(moves))}
+
+    with OpeningBook(book_path) as book:
+        # Two points for the winner's moves, one for a draw's, none for the loser's
+        assert weights([]) == {'e2e4': 3}
+        assert weights(['e2e4']) == {'c7c5': 1}
+        assert weights(['e2e4', 'e7e5']) == {'g1f3': 2}
+        assert weights(['d2d4']) == {'d7d5': 2}
+        assert board_after(['e2e4', 'c7c5']) in book
+        assert board_after(['a2a4']) not in book
+
+def test_choose(book_path):
+    with OpeningBook(book_path) as book:
+        rng = random.Random(1)
+        assert book.choose(board_after([]), rng).uci() == 'e2e4'
+        assert book.choose(board_after(['e2e4']), rng, best=True).uci() == 'c7c5'
+        assert book.choose(board_after(['h2h3'])) is None
+
+def test_choose_is_weighted(tmp_path):
+    board = board_after([])
+    key = polyglot_key(board)
+    weights = {}
+    for uci, weight in (('e2e4', 3), ('d2d4', 1), ('g1f3', 0)):
+        move = next(m for m in board.generate_legal_moves() if m.uci() == uci)
+        weights[key, encode_move(board, move)] = weight
+    path = str(tmp_path / 'weighted.bin')
+    with open(path, 'wb') as f:
+        for (entry_key, raw), weight in sorted(weights.items()):
+            f.write(ENTRY.pack(entry_key, raw, weight, 0))
+    with OpeningBook(path) as book:
+        rng = random.Random(7)
+        picks = [book.choose(board, rng).uci() for _ in range(2000)]
+        assert 'g1f3' not in picks
+        assert 0.7 < picks.count('e2e4') / len(picks) < 0.8
+
+def test_probe_with_only_zero_weights(tmp_path, capsys):
+    board = board_after([])
+    move = next(m for m in board.generate_legal_moves() if m.uci() == 'e2e4')
+    path = str(tmp_path / 'zero.bin')
+    with open(path, 'wb') as f:
+        f.write(ENTRY.pack(polyglot_key(board), encode_move(board, move), 0, 0))
+    assert main(['probe', path]) == 0
+    assert '0.0%' in capsys.readouterr().out
+    with OpeningBook(path) as book:
+        assert book.choose(board) is None
@@ -0,0 +1,33 @@
+import threading
+import time
+
+from chess import START_FEN
+from search import BuiltinEngine
+
+def test_stop_before_go_ends_the_search():
+    engine = BuiltinEngine(movetime=None)
+    engine.set_fen_position(START_FEN)
+    engine.stop()  # E.g. a cancel between checkout and the go command
+    start = time.perf_counter()
+    best, _, info = engine.go('go infinite')
+    assert time.perf_counter() - start < 1
+    assert best is not None and info['depth'] == 0
+
+def test_earlier_stop_does_not_abort_next_search():
+    engine = BuiltinEngine(movetime=None)
+    engine.set_fen_position(START_FEN)
+    assert engine.go('go depth 2')[2]['depth'] == 2
+    engine.stop()  # Too late for the search it was meant for
+    engine.set_fen_position(START_FEN, ['e2e4'])
+    assert engine.go('go depth 3')[2]['depth'] == 3
+
+def test_stop_during_search():
+    engine = BuiltinEngine(movetime=None)
+    engine.set_fen_position(START_FEN)
+    timer = threading.Timer(0.2, engine.stop)
+    timer.start()
+    try:
+        best, _, _ = engine.go('go infinite')
+    finally:
+        timer.cancel()
+    assert best is not None
@@ -0,0 +1,286 @@
+"""Headless engine-vs-engine matches played across a process pool.
+
+Each worker process runs one engine per side and plays whole games on
+ChessBoard, which decides when a game is over (mate, stalemate, insufficient
+material, threefold repetition, fifty-move rule, or the --max-plies cap).
+The two sides swap colours every game. With --book, opening moves come from
+a Polyglot book until the game leaves it, so no engine time goes on known
+theory. Finished games are written as PGN, and the match ends with a
+summary giving the score, the Elo difference and games per second.
+
+    python tournament.py --engine stockfish --games 200 --workers 8 \\
+        --skill-a 20 --skill-b 10 --movetime-a 50 --movetime-b 50 --book book.bin -o match.pgn
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, TextIO, Tuple
+import argparse
+import datetime
+import math
+import os
+import random
+import sys
+import time
+
+from chess import ChessBoard, Color, GameStatus
+from engine_pool import EngineError, UCIEngine
+from polyglot import OpeningBook
+
+class EngineSettings(NamedTuple):
+    name: str
+    path: str
+    skill_level: Optional[int] = None
+    depth: Optional[int] = None
+    movetime: Optional[int] = None  # Milliseconds per move; overrides depth
+    hash_mb: int = 16
+
+    def start(self) -> UCIEngine:
+        return UCIEngine(self.path, hash_mb=self.hash_mb, depth=self.depth or 10,
+                         skill_level=self.skill_level)
+
+class GameRecord(NamedTuple):
+    round: int
+    white: str
+    black: str
+    result: str  # '1-0', '0-1', '1/2-1/2', or '*' if the game could not finish
+    termination: str
+    moves: List[str]  # SAN
+
+# One engine per side in each worker process, started on its first game
+_engines: Dict[str, UCIEngine] = {}
+
+# Opening books in each worker process, opened on first use
+_books: Dict[str, OpeningBook] = {}
+
+def _book(path: str) -> OpeningBook:
+    if path not in _books:
+        _books[path] = OpeningBook(path)
+    return _books[path]
+
+def _engine(settings: EngineSettings) -> UCIEngine:
+    engine = _engines.get(settings.name)
+    if engine is None or not engine.is_alive():
+        if engine is not None:
+            engine.quit()
+        engine = _engines[settings.name] = settings.start()
+    return engine
+
+TERMINATIONS = {
+    GameStatus.CHECKMATE: 'checkmate',
+    GameStatus.STALEMATE: 'stalemate',
+    GameStatus.INSUFFICIENT_MATERIAL: 'insufficient material',
+    GameStatus.FIFTY_MOVES: 'fifty-move rule',
+    GameStatus.REPETITION: 'threefold repetition',
+}
+
+def _game_over(board: ChessBoard, max_plies: int) -> Optional[Tuple[str, str]]:
+    # (result, termination) once the game has ended, else None
+    status = board.status()
+    if status == GameStatus.CHECKMATE:
+        return ('0-1' if board.current_player == Color.WHITE else '1-0'), TERMINATIONS[status]
+    if status.is_draw:
+        return '1/2-1/2', TERMINATIONS[status]
+    if len(board.move_stack) >= max_plies:
+        return '1/2-1/2', 'adjudicated (move limit)'
+    return None
+
+def play_game(round_number: int, white: EngineSettings, black: EngineSettings,
+              opening_plies: int = 0, max_plies: int = 400, seed: int = 0,
+              book_path: Optional[str] = None) -> GameRecord:
+    # Runs inside a worker process
+    board = ChessBoard('bitboard')
+    moves = []
+    # The engines get the position after the last capture or pawn move plus
+    # the moves since: all the history a repetition can reach back into,
+    # without resending the whole game every move
+    base_fen, uci_moves = board.to_fen(), []
+    rng = random.Random(seed * 1_000_003 + round_number)
+    book = _book(book_path) if book_path else None
+    try:
+        for settings in (white, black):
+            engine = _engine(settings)
+            engine.new_game()
+            engine.ping(engine.timeout)
+
+        while True:
+            over = _game_over(board, max_plies)
+            if over:
+                return GameRecord(round_number, white.name, black.name, *over, moves)
+
+            legal_moves = board.generate_legal_moves()
+            move = None
+            if len(moves) < opening_plies:
+                # Random opening moves so repeated pairings do not replay one game
+                move = rng.choice(legal_moves)
+            elif book is not None:
+                move = book.choose(board, rng)
+                if move is None:
+                    book = None  # Out of the book for good
+            if move is None:
+                settings = white if board.current_player == Color.WHITE else black
+                engine = _engine(settings)
+                engine.set_fen_position(base_fen, uci_moves)
+                best = engine.get_best_move(depth=settings.depth, movetime=settings.movetime)
+                move = next((m for m in legal_moves if m.uci() == best), None)
+                if move is None:
+                    result = '0-1' if board.current_player == Color.WHITE else '1-0'
+                    return GameRecord(round_number, white.name, black.name, result,
+                                      f"{settings.name} played illegal move {best!r}", moves)
+            moves.append(board.san(move))
+            uci_moves.append(move.uci())
+            board.push(move)
+            if board.halfmove_clock == 0:
+                base_fen, uci_moves = board.to_fen(), []
+    except EngineError as e:
+        # The engine is restarted on the next game; this one is void
+        return GameRecord(round_number, white.name, black.name, '*', f"engine error: {e}", moves)
+
+def format_pgn(game: GameRecord, event: str = 'Engine match', date: Optional[str] = None) -> str:
+    date = date or datetime.date.today().strftime('%Y.%m.%d')
+    headers = [('Event', event), ('Site', '?'), ('Date', date), ('Round', str(game.round)),
+               ('White', game.white), ('Black', game.black), ('Result', game.result),
+               ('Termination', game.termination), ('PlyCount', str(len(game.moves)))]
+    lines = [f'[{name} "{value}"]' for name, value in headers]
+    lines.append('')
+
+    # Movetext wrapped at 80 columns
+    tokens = [f"{i // 2 + 1}. {san}" if i % 2 == 0 else san for i, san in enumerate(game.moves)]
+    tokens.append(game.result)
+    line = ''
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > 80:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return '\n'.join(lines) + '\n\n'
+
+def elo_difference(score: float) -> float:
+    # Rating gap implied by a score fraction; infinite at 0% or 100%
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return -400 * math.log10(1 / score - 1)
+
+class MatchStats:
+    def __init__(self, name_a: str, name_b: str):
+        self.name_a = name_a
+        self.name_b = name_b
+        self.wins = self.losses = self.draws = self.unfinished = 0
+        self.terminations: Dict[str, int] = {}
+
+    def add(self, game: GameRecord):
+        self.terminations[game.termination] = self.terminations.get(game.termination, 0) + 1
+        if game.result == '*':
+            self.unfinished += 1
+        elif game.result == '1/2-1/2':
+            self.draws += 1
+        elif (game.result == '1-0') == (game.white == self.name_a):
+            self.wins += 1
+        else:
+            self.losses += 1
+
+    @property
+    def games(self) -> int:
+        return self.wins + self.losses + self.draws
+
+    @property
+    def score(self) -> float:
+        # Points for side A out of the finished games
+        return (self.wins + 0.5 * self.draws) / self.games if self.games else 0.5
+
+    def report(self, elapsed: float) -> str:
+        elo = elo_difference(self.score)
+        elo_text = f"{elo:+.0f}" if math.isfinite(elo) else ('+inf' if elo > 0 else '-inf')
+        lines = [
+            f"{self.name_a} vs {self.name_b}: +{self.wins} -{self.losses} ={self.draws}"
+            + (f" ({self.unfinished} unfinished)" if self.unfinished else ''),
+            f"Score {self.wins + 0.5 * self.draws:g}/{self.games} ({100 * self.score:.1f}%), "
+            f"Elo difference {elo_text}",
+            f"{self.games + self.unfinished} games in {elapsed:.1f}s "
+            f"({(self.games + self.unfinished) / elapsed:.2f} games/s)",
+        ]
+        for termination, count in sorted(self.terminations.items(), key=lambda item: -item[1]):
+            lines.append(f"  {termination}: {count}")
+        return '\n'.join(lines)
+
+def run_match(side_a: EngineSettings, side_b: EngineSettings, games: int, workers: int,
+              out: TextIO, opening_plies: int = 0, max_plies: int = 400, seed: int = 0,
+              event: str = 'Engine match', book_path: Optional[str] = None) -> MatchStats:
+    # Games are written in round order; a few per worker are kept queued so
+    # no process waits while memory stays bounded for long matches
+    stats = MatchStats(side_a.name, side_b.name)
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for round_number in range(1, games + 1):
+            white, black = (side_a, side_b) if round_number % 2 else (side_b, side_a)
+            if len(pending) >= 2 * workers:
+                _record(pending.popleft().result(), stats, out, event)
+            pending.append(executor.submit(play_game, round_number, white, black,
+                                           opening_plies, max_plies, seed, book_path))
+        while pending:
+            _record(pending.popleft().result(), stats, out, event)
+    return stats
+
+def _record(game: GameRecord, stats: MatchStats, out: TextIO, event: str):
+    stats.add(game)
+    out.write(format_pgn(game, event))
+    out.flush()
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Play engine-vs-engine games in parallel")
+    parser.add_argument('--engine', default=os.environ.get('STOCKFISH_PATH', 'stockfish'),
+                        help="UCI engine for both sides (default: $STOCKFISH_PATH or 'stockfish')")
+    for side in ('a', 'b'):
+        group = parser.add_argument_group(f"side {side.upper()}")
+        group.add_argument(f'--engine-{side}', help="UCI engine for this side (default: --engine)")
+        group.add_argument(f'--name-{side}', help="name in the PGN and results")
+        group.add_argument(f'--skill-{side}', type=int, help="Skill Level option (0-20)")
+        group.add_argument(f'--depth-{side}', type=int, help="search depth per move")
+        group.add_argument(f'--movetime-{side}', type=int, help="milliseconds per move (overrides depth)")
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="games played in parallel (two engine processes each)")
+    parser.add_argument('--hash', type=int, default=16, help="hash size per engine in MB")
+    parser.add_argument('--opening-plies', type=int, default=0,
+                        help="random moves played before the engines take over")
+    parser.add_argument('--book', metavar='PATH',
+                        help="Polyglot opening book; its moves are played while the game is in it")
+    parser.add_argument('--max-plies', type=int, default=400, help="adjudicate a draw after this many plies")
+    parser.add_argument('--seed', type=int, default=0, help="seed for the random openings")
+    parser.add_argument('--event', default='Engine match')
+    parser.add_argument('-o', '--output', help="PGN output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    sides = []
+    for side in ('a', 'b'):
+        path = getattr(args, f'engine_{side}') or args.engine
+        depth = getattr(args, f'depth_{side}')
+        movetime = getattr(args, f'movetime_{side}')
+        skill = getattr(args, f'skill_{side}')
+        name = getattr(args, f'name_{side}')
+        if not name:
+            # Default names must differ, or the results could not tell the sides apart
+            name = f"{os.path.basename(path)} {side.upper()}"
+            name += f" skill {skill}" if skill is not None else ''
+        if depth is None and movetime is None:
+            depth = 10
+        sides.append(EngineSettings(name, path, skill, depth, movetime, args.hash))
+    if sides[0].name == sides[1].name:
+        parser.error("the two sides need different names")
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    start = time.perf_counter()
+    try:
+        stats = run_match(sides[0], sides[1], args.games, args.workers, out,
+                          args.opening_plies, args.max_plies, args.seed, args.event, args.book)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(stats.report(time.perf_counter() - start), file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())